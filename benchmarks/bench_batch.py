@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare the vectorised batch API against a Python loop over the scalar
+calculator functions.
+
+Usage: python -m benchmarks.bench_batch [--size N] [--repeat R]
+"""
+
+import argparse
+import random
+import timeit
+
+from codespace_learning import batch, calculator
+
+BINARY = ["add", "subtract", "multiply", "divide", "modulo", "power", "percentage"]
+
+
+def scalar_loop(func, *columns):
+    """Call ``func`` element by element, recording errors like the batch API."""
+    values, errors = [], []
+    for args in zip(*columns):
+        try:
+            values.append(func(*args))
+            errors.append(False)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            values.append(float("nan"))
+            errors.append(True)
+    return values, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    a = [rng.uniform(-1000, 1000) for _ in range(args.size)]
+    b = [rng.uniform(-10, 10) for _ in range(args.size)]
+    exponents = [rng.randint(-3, 3) for _ in range(args.size)]
+
+    import numpy as np
+
+    a_arr, b_arr, exp_arr = np.array(a), np.array(b), np.array(exponents, float)
+
+    print(f"{'operation':<12}{'scalar loop':>14}{'batch':>12}{'speedup':>10}")
+    for name in BINARY + ["sqrt"]:
+        scalar_func, batch_func = getattr(calculator, name), getattr(batch, name)
+        if name == "sqrt":
+            scalar_args, batch_args = (a,), (a_arr,)
+        elif name == "power":
+            scalar_args, batch_args = (b, exponents), (b_arr, exp_arr)
+        else:
+            scalar_args, batch_args = (a, b), (a_arr, b_arr)
+        scalar = min(
+            timeit.repeat(
+                lambda: scalar_loop(scalar_func, *scalar_args),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        vectorised = min(
+            timeit.repeat(lambda: batch_func(*batch_args), number=1, repeat=args.repeat)
+        )
+        print(
+            f"{name:<12}{scalar * 1000:>11.1f} ms{vectorised * 1000:>9.2f} ms"
+            f"{scalar / vectorised:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Compare calculator.factorial against the original one-at-a-time loop.
+
+The loop becomes very slow beyond 10^5, so it is only timed up to
+``--loop-max``. The "warm" column shows a call for ``n + n // 100`` after
+``n!`` has been cached as a checkpoint.
+
+Usage: python -m benchmarks.bench_factorial [--max-exp 6] [--loop-max 100000]
+"""
+
+import argparse
+import time
+
+from codespace_learning import calculator
+
+
+def loop_factorial(n: int) -> int:
+    """The original implementation of calculator.factorial."""
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-exp", type=int, default=6)
+    parser.add_argument("--loop-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'n':>10}{'loop':>12}{'cold':>12}{'warm':>12}{'speedup':>10}")
+    for exp in range(3, args.max_exp + 1):
+        n = 10**exp
+        calculator.clear_factorial_cache()
+        loop = timed(loop_factorial, n) if n <= args.loop_max else None
+        cold = timed(calculator.factorial, n)
+        warm = timed(calculator.factorial, n + n // 100)
+        loop_text = f"{loop:>10.3f} s" if loop is not None else f"{'-':>12}"
+        speedup = f"{loop / cold:>9.1f}x" if loop is not None else f"{'-':>10}"
+        print(f"{n:>10}{loop_text}{cold:>10.3f} s{warm:>10.3f} s{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare keyset and OFFSET pagination of the calculation history.
+
+Fills a calculations table with ``--rows`` rows (10 million by default; an
+existing table with enough rows is reused) and times fetching page N of
+``--limit`` rows both ways. With the ``(created_at, id)`` index a keyset page
+costs the same at any depth, while OFFSET has to step over every earlier row.
+
+Usage: python -m benchmarks.bench_history [--rows 10000000] [--url sqlite:///...]
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+
+from codespace_learning.api.history import encode_cursor, history_query
+from codespace_learning.models.calculation import Calculation
+
+OPERATIONS = ["add", "subtract", "multiply", "divide", "power", "sqrt"]
+CHUNK = 50_000
+
+
+def populate(engine, rows: int) -> None:
+    table = Calculation.__table__
+    table.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        existing = conn.scalar(select(func.count()).select_from(table))
+    if existing >= rows:
+        return
+    start = datetime(2024, 1, 1)
+    begin = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(existing, rows, CHUNK):
+            conn.execute(
+                insert(table),
+                [
+                    {
+                        "operation": OPERATIONS[i % len(OPERATIONS)],
+                        "operand1": float(i),
+                        "operand2": 1.0,
+                        "result": float(i + 1),
+                        # Several rows share a timestamp, so ids break ties.
+                        "created_at": start + timedelta(milliseconds=i // 3),
+                    }
+                    for i in range(offset, min(offset + CHUNK, rows))
+                ],
+            )
+    print(f"inserted {rows - existing} rows in {time.perf_counter() - begin:.1f} s")
+
+
+def timed(conn, query, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query).all()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--operation", default=None)
+    parser.add_argument("--url", default="sqlite:////tmp/bench_history.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    populate(engine, args.rows)
+
+    matching = args.rows // len(OPERATIONS) if args.operation else args.rows
+    pages = [1, 10, 1_000, 100_000]
+    pages = [page for page in pages if page * args.limit <= matching]
+    pages.append(matching // args.limit)
+
+    print(f"{'page':>10}{'keyset':>14}{'offset':>14}")
+    with engine.connect() as conn:
+        for page in pages:
+            offset = (page - 1) * args.limit
+            offset_query = history_query(args.limit, operation=args.operation).offset(
+                offset
+            )
+            cursor = None
+            if offset:
+                # The cursor a client would hold after reading page - 1.
+                last = conn.execute(
+                    history_query(1, operation=args.operation).offset(offset - 1)
+                ).one()
+                cursor = encode_cursor(last.created_at, last.id)
+            keyset_query = history_query(args.limit, cursor, args.operation)
+            assert [row.id for row in conn.execute(keyset_query)] == [
+                row.id for row in conn.execute(offset_query)
+            ]
+            keyset = timed(conn, keyset_query, 20)
+            offset_time = timed(conn, offset_query, 3)
+            print(f"{page:>10}{keyset * 1000:>11.3f} ms{offset_time * 1000:>11.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
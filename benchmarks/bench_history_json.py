@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare the ORM and Core read paths of the history endpoint.
+
+The ORM path is what ``GET /calculator/history`` used to do: load
+``Calculation`` instances, validate each into ``CalculationResponse``
+(``from_attributes``) and encode the result with the standard library. The
+Core path selects the response columns as plain rows, zips them into dicts
+and encodes them with :func:`codespace_learning.api.responses.dumps` (orjson
+when installed). Times are the median per page, from query to response bytes.
+
+Usage: python -m benchmarks.bench_history_json [--rows 100000] [--repeat 20]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from benchmarks.bench_history import populate
+from codespace_learning.api import responses
+from codespace_learning.api.history import history_query, history_records
+from codespace_learning.models.calculation import Calculation
+from codespace_learning.models.schemas import CalculationResponse
+
+PAGES = [50, 200, 1000]
+
+_adapter = TypeAdapter(List[CalculationResponse])
+
+
+def orm_page(session: Session, limit: int) -> bytes:
+    query = (
+        select(Calculation)
+        .order_by(Calculation.created_at.desc(), Calculation.id.desc())
+        .limit(limit)
+    )
+    calculations = session.scalars(query).all()
+    items = _adapter.validate_python(calculations, from_attributes=True)
+    content = _adapter.dump_python(items, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def core_page(session: Session, limit: int) -> bytes:
+    rows = session.execute(history_query(limit)).all()
+    return responses.dumps(history_records(rows))
+
+
+def timed(func, engine, limit: int, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            func(session, limit)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--url", default="sqlite:////tmp/bench_history.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    populate(engine, args.rows)
+    encoder = "orjson" if responses._orjson is not None else "json"
+    print(f"{'page':>6}{'orm + model':>14}{'core + ' + encoder:>16}{'speedup':>10}")
+    for limit in PAGES:
+        orm = timed(orm_page, engine, limit, args.repeat)
+        core = timed(core_page, engine, limit, args.repeat)
+        print(
+            f"{limit:>6}{orm * 1000:>11.2f} ms{core * 1000:>13.2f} ms"
+            f"{orm / core:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
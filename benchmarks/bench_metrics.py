@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of recording metrics.
+
+Times a single ``Histogram.observe`` and an operation timer, then sends
+``POST /calculator/add`` requests to the simple app in process (through
+httpx's ASGI transport, so no sockets are involved) with metrics enabled and
+disabled, in alternating rounds. Reports the median time per request of each
+mode and the difference; with the middleware and the ``/metrics`` route in
+place, this is the overhead of leaving metrics on.
+
+Usage: python -m benchmarks.bench_metrics [--requests 2000] [--rounds 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import timeit
+
+import httpx
+
+from codespace_learning.app_simple import app
+from codespace_learning.metrics import Histogram, metrics
+
+PAYLOAD = {"operation": "add", "operand1": 2, "operand2": 3}
+
+
+def per_call(statement, number: int = 200_000) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number
+
+
+async def per_request(client: httpx.AsyncClient, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.post("/calculator/add", json=PAYLOAD)
+    return (time.perf_counter() - start) / requests
+
+
+async def compare(requests: int, rounds: int) -> None:
+    transport = httpx.ASGITransport(app)
+    times = {True: [], False: []}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await per_request(client, 200)  # warm up
+        for _ in range(rounds):
+            for enabled in (True, False):
+                metrics.enabled = enabled
+                times[enabled].append(await per_request(client, requests))
+    metrics.enabled = True
+    on = statistics.median(times[True])
+    off = statistics.median(times[False])
+    print(f"request, metrics off: {off * 1e6:8.1f} µs")
+    print(f"request, metrics on:  {on * 1e6:8.1f} µs")
+    print(f"overhead:             {(on - off) * 1e6:8.1f} µs ({(on / off - 1):+.1%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "Benchmark.", ("route", "status"))
+    observe = per_call(lambda: histogram.observe(0.003, "/calculator/add", "200"))
+    print(f"Histogram.observe:    {observe * 1e9:8.0f} ns")
+
+    def timed_block():
+        with metrics.operation("add", "compute"):
+            pass
+
+    print(f"operation timer:      {per_call(timed_block) * 1e9:8.0f} ns")
+    asyncio.run(compare(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Overload test: a burst of clients against app_simple with and without the
+concurrency limiter.
+
+Starts app_simple under uvicorn twice, with ``CALCULATOR_LIMITER_ENABLED``
+off and on. Each time ``--clients`` clients send requests back to back for
+``--duration`` seconds: one in ``--heavy-every`` is the median of
+``--numbers`` numbers (a heavy route), the rest are additions. A separate
+probe polls ``/health``. Prints, per kind of request, how many succeeded,
+were shed (503) or timed out on the client (``--timeout``) and the p50/p99
+latency of the successful ones.
+
+Usage: python -m benchmarks.bench_overload [--clients 200] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def start_server(port: int, limiter: str) -> subprocess.Popen:
+    env = dict(os.environ, CALCULATOR_LIMITER_ENABLED=limiter)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "codespace_learning.app_simple:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> dict:
+    rng = random.Random(0)
+    numbers = [rng.uniform(0, 1000) for _ in range(args.numbers)]
+    outcomes = defaultdict(lambda: defaultdict(int))
+    latencies = defaultdict(list)
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.clients + 1)
+
+    # Encoded once: the client shares the machine with the server.
+    median_body = json.dumps({"operation": "median", "numbers": numbers}).encode()
+    headers = {"content-type": "application/json"}
+
+    async def send(client, kind: str, method: str, url: str, body=None) -> None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, content=body, headers=headers)
+        except httpx.TimeoutException:
+            outcomes[kind]["timeout"] += 1
+            return
+        except httpx.TransportError:
+            outcomes[kind]["error"] += 1
+            return
+        if response.status_code == 503:
+            outcomes[kind]["shed"] += 1
+        elif response.status_code < 400:
+            outcomes[kind]["ok"] += 1
+            latencies[kind].append(time.perf_counter() - start)
+        else:
+            outcomes[kind]["error"] += 1
+
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=args.timeout, limits=limits
+    ) as client:
+
+        async def user(index: int) -> None:
+            i = index
+            while time.perf_counter() < deadline:
+                if i % args.heavy_every == 0:
+                    await send(
+                        client, "median", "POST", "/calculator/median", median_body
+                    )
+                else:
+                    body = b'{"operation": "add", "operand1": %d, "operand2": 1}' % i
+                    await send(client, "add", "POST", "/calculator/add", body)
+                i += 1
+
+        async def probe() -> None:
+            while time.perf_counter() < deadline:
+                await send(client, "health", "GET", "/health")
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(probe(), *(user(i) for i in range(args.clients)))
+    return {kind: (outcomes[kind], latencies[kind]) for kind in outcomes}
+
+
+def report(label: str, results: dict) -> None:
+    print(label)
+    for kind, (outcome, latency) in sorted(results.items()):
+        counts = "  ".join(
+            f"{name} {outcome[name]:5d}" for name in ("ok", "shed", "timeout", "error")
+        )
+        if len(latency) >= 2:
+            quantiles = statistics.quantiles(latency, n=100)
+            timing = f"p50 {quantiles[49] * 1000:8.1f} ms  p99 {quantiles[98] * 1000:8.1f} ms"
+        else:
+            timing = ""
+        print(f"  {kind:<7} {counts}   {timing}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--heavy-every", type=int, default=4)
+    parser.add_argument("--numbers", type=int, default=20_000)
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    for label, limiter in (("limiter off", "false"), ("limiter on", "true")):
+        server = start_server(args.port, limiter)
+        try:
+            results = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+        report(label, results)
+
+
+if __name__ == "__main__":
+    main()
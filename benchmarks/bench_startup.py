@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Measure how quickly the API starts.
+
+Two numbers, each the median over fresh processes:
+
+- import: time to ``import codespace_learning.app``, as paid by every worker
+  before it can be started;
+- first request: time from launching ``uvicorn`` until ``/health`` answers,
+  ``/health/ready`` returns 200 and a first ``POST /calculator/add`` succeeds,
+  against an empty SQLite database (schema created at startup) and an
+  existing one with ``CALCULATOR_CREATE_SCHEMA=off``.
+
+Usage: python -m benchmarks.bench_startup [--repeat 7] [--port 8765]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+
+IMPORT_CODE = (
+    "import time; start = time.perf_counter(); import codespace_learning.app; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_CODE], capture_output=True, text=True, check=True
+    )
+    return float(output.stdout)
+
+
+def status(url: str, payload: Optional[dict] = None) -> Optional[int]:
+    data = None if payload is None else json.dumps(payload).encode()
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def wait_for(url: str, start: float, payload: Optional[dict] = None) -> float:
+    while True:
+        code = status(url, payload)
+        if code == 200:
+            return time.perf_counter() - start
+        if code == 404:
+            return float("nan")
+        if time.perf_counter() - start > 60:
+            raise TimeoutError(f"{url} not available after 60s")
+        time.sleep(0.01)
+
+
+def first_request(port: int, env: Dict[str, str]) -> Dict[str, float]:
+    base = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "codespace_learning.app:app",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+    ]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, env=env)
+    try:
+        return {
+            "health": wait_for(base + "/health", start),
+            "ready": wait_for(base + "/health/ready", start),
+            "add": wait_for(
+                base + "/calculator/add",
+                start,
+                {"operation": "add", "operand1": 1, "operand2": 2},
+            ),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.repeat)]
+    print(f"import codespace_learning.app: {statistics.median(imports) * 1000:.0f} ms")
+
+    print(f"{'schema at startup':<20}{'/health':>10}{'ready':>10}{'first add':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "startup.db")
+        for create_schema in ("on", "off"):
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{database}",
+                CALCULATOR_CREATE_SCHEMA=create_schema,
+            )
+            runs = []
+            for _ in range(args.repeat):
+                if create_schema == "on" and os.path.exists(database):
+                    os.remove(database)
+                runs.append(first_request(args.port, env))
+            times = {
+                key: statistics.median(run[key] for run in runs) * 1000
+                for key in runs[0]
+            }
+            print(
+                f"{create_schema:<20}{times['health']:>7.0f} ms"
+                f"{times['ready']:>7.0f} ms{times['add']:>9.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
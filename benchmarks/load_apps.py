@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+In-process load test of app.py and app_simple.py.
+
+Each app runs through its lifespan (so app.py creates its schema and warms
+its pool) and is driven through httpx's ASGI transport by ``concurrency``
+clients on the same event loop, sending ``requests`` requests in total.
+There are no sockets or server processes, so the numbers measure the cost of
+the app itself and compare well between runs on one machine, but they are
+not the throughput of a deployed server.
+
+app.py uses ``--database-url``, by default a fresh SQLite file in a temporary
+directory; pass a PostgreSQL URL to test against a real server. With SQLite,
+concurrent writes queue for the database lock, which dominates app.py's p99.
+Scenarios:
+
+- ``add``: ``POST /calculator/add`` with varying operands
+- ``mixed``: add, sqrt, power, a 200-number median and a history page
+
+Usage: python -m benchmarks.load_apps [--concurrency 8] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import statistics
+import tempfile
+import time
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+APPS = ("app", "app_simple")
+
+Request = Tuple[str, str, Any]
+
+
+def _add(i: int) -> Request:
+    return "POST", "/calculator/add", {"operation": "add", "operand1": i, "operand2": 1}
+
+
+def _mixed() -> Callable[[int], Request]:
+    rng = random.Random(0)
+    numbers = [rng.uniform(0, 1000) for _ in range(200)]
+    kinds = cycle(
+        [
+            _add,
+            lambda i: (
+                "POST",
+                "/calculator/sqrt",
+                {"operation": "sqrt", "operand": i},
+            ),
+            lambda i: (
+                "POST",
+                "/calculator/power",
+                {"operation": "power", "operand1": 2, "operand2": i % 64},
+            ),
+            lambda i: (
+                "POST",
+                "/calculator/median",
+                {"operation": "median", "numbers": numbers},
+            ),
+            lambda i: ("GET", "/calculator/history?limit=20", None),
+        ]
+    )
+    return lambda i: next(kinds)(i)
+
+
+SCENARIOS: Dict[str, Callable[[], Callable[[int], Request]]] = {
+    "add": lambda: _add,
+    "mixed": _mixed,
+}
+
+
+def load_app(name: str, database_url: str):
+    """Import ``codespace_learning.<name>`` with ``DATABASE_URL`` set."""
+    os.environ["DATABASE_URL"] = database_url
+    return importlib.import_module(f"codespace_learning.{name}")
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int], Request],
+    concurrency: int,
+    requests: int,
+) -> Tuple[List[float], int, float]:
+    latencies: List[float] = []
+    errors = 0
+    issued = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in issued:
+            method, url, body = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def _run_app(
+    module, scenarios: List[str], concurrency: int, requests: int
+) -> Dict[str, Dict[str, Any]]:
+    app = module.app
+    results = {}
+    async with app.router.lifespan_context(app):
+        while hasattr(module, "is_ready") and not module.is_ready():
+            await asyncio.sleep(0.01)
+        transport = httpx.ASGITransport(app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load"
+        ) as client:
+            for scenario in scenarios:
+                make_request = SCENARIOS[scenario]()
+                await _drive(client, make_request, concurrency, min(requests, 200))
+                latencies, errors, elapsed = await _drive(
+                    client, make_request, concurrency, requests
+                )
+                quantiles = statistics.quantiles(latencies, n=100)
+                prefix = f"load/{module.__name__.rsplit('.', 1)[1]}/{scenario}"
+                results[f"{prefix}/throughput"] = {
+                    "value": len(latencies) / elapsed,
+                    "unit": "req/s",
+                    "better": "higher",
+                }
+                for label, value in (("p50", quantiles[49]), ("p99", quantiles[98])):
+                    results[f"{prefix}/{label}"] = {
+                        "value": value,
+                        "unit": "s",
+                        "better": "lower",
+                    }
+                results[f"{prefix}/errors"] = {
+                    "value": errors,
+                    "unit": "requests",
+                    "better": "lower",
+                }
+    return results
+
+
+def run(
+    apps=APPS,
+    scenarios=tuple(SCENARIOS),
+    concurrency: int = 8,
+    requests: int = 2000,
+    database_url: str = "",
+) -> Dict[str, Dict[str, Any]]:
+    """Load test each app with each scenario and return results by name."""
+    with tempfile.TemporaryDirectory() as directory:
+        url = database_url or f"sqlite:///{directory}/load.db"
+        results = {}
+        for name in apps:
+            module = load_app(name, url)
+            results.update(
+                asyncio.run(_run_app(module, list(scenarios), concurrency, requests))
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--app", choices=APPS, action="append")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url", default="")
+    args = parser.parse_args()
+
+    results = run(
+        args.app or APPS,
+        args.scenario or tuple(SCENARIOS),
+        args.concurrency,
+        args.requests,
+        args.database_url,
+    )
+    for name, result in results.items():
+        if result["unit"] == "s":
+            text = f"{result['value'] * 1000:.2f} ms"
+        else:
+            text = f"{result['value']:.0f} {result['unit']}"
+        print(f"{name:<40}{text:>18}")
+
+
+if __name__ == "__main__":
+    main()
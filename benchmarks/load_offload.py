@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test: /calculator/add latency while large factorials run concurrently.
+
+Starts app_simple under uvicorn twice, first with every operation running
+inline on the event loop (offload threshold = inf) and then with the default
+cost-aware executor, and prints p50/p99 latency of the cheap requests for both.
+
+Factorials above ~1500 have more than 4300 digits and cannot be encoded as
+JSON, so the heavy requests fail with a server error; the CPU time they
+burn before that is what this test is about.
+
+Usage: python -m benchmarks.load_offload [--requests 300] [--factorial 60000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def start_server(port: int, threshold: str) -> subprocess.Popen:
+    env = dict(os.environ, CALCULATOR_OFFLOAD_THRESHOLD=threshold)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "codespace_learning.app_simple:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=0.5)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> list:
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+
+        async def cheap_requests() -> None:
+            for i in range(args.requests):
+                start = time.perf_counter()
+                await client.post(
+                    "/calculator/add",
+                    json={"operation": "add", "operand1": i, "operand2": 1},
+                )
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        async def heavy_requests(offset: int) -> None:
+            # Descending operands so no smaller factorial checkpoint is reused.
+            for i in range(args.heavy):
+                operand = args.factorial - 2 * i - offset
+                # A fresh connection per request: the server drops or stalls
+                # keep-alive connections after the encoding error.
+                async with httpx.AsyncClient(base_url=base_url, timeout=60) as own:
+                    try:
+                        await own.post(
+                            "/calculator/factorial",
+                            json={"operation": "factorial", "operand": operand},
+                        )
+                    except httpx.HTTPError:
+                        pass
+
+        await asyncio.gather(
+            *(cheap_requests() for _ in range(args.concurrency)),
+            *(heavy_requests(offset) for offset in range(2)),
+        )
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<10} add p50 {quantiles[49] * 1000:7.2f} ms   "
+        f"p99 {quantiles[98] * 1000:7.2f} ms   max {max(latencies) * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--heavy", type=int, default=20)
+    parser.add_argument("--factorial", type=int, default=60_000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for label, threshold in (("inline", "inf"), ("offloaded", "100000")):
+        server = start_server(args.port, threshold)
+        try:
+            latencies = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+        report(label, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for every function in codespace_learning.calculator.
+
+Each function is timed over several input sizes: small and float operands,
+big integers of a thousand and a hundred thousand digits, and lists of 10 to
+100,000 numbers. Times are the median seconds per call over five runs of
+enough calls to last ``min_time``. Factorials above the checkpoint size are
+timed cold, with the checkpoint cache cleared before every call.
+
+Usage: python -m benchmarks.micro_calculator [--quick]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from codespace_learning import calculator
+
+
+class Case(NamedTuple):
+    function: str
+    size: str
+    args: Tuple[Any, ...]
+    cold: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"calculator/{self.function}/{self.size}"
+
+
+def _numbers(n: int) -> List[float]:
+    rng = random.Random(n)
+    return [rng.uniform(-1e6, 1e6) for _ in range(n)]
+
+
+_BIG = 10**1000 + 7
+_HUGE = 10**100_000 + 7
+
+_ARITHMETIC_SIZES = [
+    ("small", (7, 3)),
+    ("float", (1.5, 2.25)),
+    ("1k-digits", (_BIG, _BIG // 7)),
+    ("100k-digits", (_HUGE, _HUGE // 7)),
+]
+
+
+def cases() -> List[Case]:
+    """Return the benchmark cases, in a stable order."""
+    result = []
+    for function in ("add", "subtract", "multiply"):
+        result += [Case(function, size, args) for size, args in _ARITHMETIC_SIZES]
+    result += [
+        Case("divide", "small", (7, 3)),
+        Case("divide", "float", (1.5, 2.25)),
+        Case("divide", "300-digits", (10**300 + 7, 10**299 + 3)),
+        Case("modulo", "small", (7, 3)),
+        Case("modulo", "1k-digits", (_BIG, 10**500 + 3)),
+        Case("modulo", "100k-digits", (_HUGE, 10**50_000 + 3)),
+        Case("power", "float", (1.0001, 2.5)),
+        Case("power", "exp-10", (3, 10)),
+        Case("power", "exp-1k", (3, 1000)),
+        Case("power", "exp-100k", (3, 100_000)),
+        Case("sqrt", "small", (16,)),
+        Case("sqrt", "float", (2.0,)),
+        Case("sqrt", "300-digits", (10**300,)),
+        Case("factorial", "100", (100,)),
+        Case("factorial", "10k", (10_000,), cold=True),
+        Case("factorial", "100k", (100_000,), cold=True),
+        Case("percentage", "small", (25, 200)),
+        Case("percentage", "float", (2.5, 7.25)),
+    ]
+    for n, size in ((10, "n-10"), (1000, "n-1k"), (100_000, "n-100k")):
+        numbers = _numbers(n)
+        result += [
+            Case("calculate_average", size, (numbers,)),
+            Case("calculate_median", size, (numbers,)),
+            Case("calculate_percentiles", size, (numbers, [25, 50, 75, 99])),
+        ]
+    return result
+
+
+def time_per_call(
+    func: Callable[..., Any], args: Tuple[Any, ...], min_time: float
+) -> float:
+    """Median seconds per call of ``func(*args)`` over five timed runs."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+    runs = [elapsed / number]
+    for _ in range(4):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        runs.append((time.perf_counter() - start) / number)
+    return statistics.median(runs)
+
+
+def time_cold(func: Callable[..., Any], args: Tuple[Any, ...], repeat: int) -> float:
+    """Median seconds of ``func(*args)`` with the factorial cache cleared."""
+    runs = []
+    for _ in range(repeat):
+        calculator.clear_factorial_cache()
+        start = time.perf_counter()
+        func(*args)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def run(quick: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Time every case and return results keyed by case name."""
+    min_time = 0.02 if quick else 0.2
+    results = {}
+    for case in cases():
+        func = getattr(calculator, case.function)
+        if case.cold:
+            seconds = time_cold(func, case.args, 3 if quick else 7)
+        else:
+            seconds = time_per_call(func, case.args, min_time)
+        results[case.name] = {"value": seconds, "unit": "s", "better": "lower"}
+    calculator.clear_factorial_cache()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="shorter timing runs")
+    args = parser.parse_args()
+
+    for name, result in run(args.quick).items():
+        print(f"{name:<48}{result['value'] * 1e6:>14.3f} µs")
+
+
+if __name__ == "__main__":
+    main()
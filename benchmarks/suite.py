@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: run the benchmarks, save JSON, compare with a baseline.
+
+``run`` times every calculator function (:mod:`benchmarks.micro_calculator`)
+and load tests both apps (:mod:`benchmarks.load_apps`), then writes a JSON
+file holding the environment and one entry per measurement::
+
+    {"meta": {...}, "results": {"calculator/add/small": {"value": 1.1e-07,
+     "unit": "s", "better": "lower"}, ...}}
+
+``compare`` reports the change of every measurement present in both files
+and exits with status 1 when one got worse by more than its threshold:
+``--threshold`` sets the default (a fraction, 0.10 = 10% slower or 10% less
+throughput) and ``--threshold PATTERN=FRACTION`` sets it for names matching
+a shell-style pattern; the last matching pattern wins. ``run --baseline``
+runs and compares in one go.
+
+Usage:
+    python -m benchmarks.suite run [--quick] [--only micro|load] [--output FILE]
+    python -m benchmarks.suite compare BASELINE CURRENT \\
+        [--threshold 0.10] [--threshold 'load/*=0.25']
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_OUTPUT = Path("benchmarks/results/latest.json")
+
+Thresholds = Tuple[float, List[Tuple[str, float]]]
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float
+    current: float
+    # How much worse the current value is, as a fraction; negative is better.
+    change: float
+    threshold: float
+
+    @property
+    def regressed(self) -> bool:
+        return self.change > self.threshold
+
+
+def _commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def run(
+    only: Optional[str] = None,
+    quick: bool = False,
+    concurrency: int = 8,
+    requests: Optional[int] = None,
+    database_url: str = "",
+) -> Dict[str, Any]:
+    """Run the selected benchmarks and return the results document."""
+    from benchmarks import load_apps, micro_calculator
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if only in (None, "micro"):
+        results.update(micro_calculator.run(quick))
+    if only in (None, "load"):
+        if requests is None:
+            requests = 300 if quick else 2000
+        results.update(
+            load_apps.run(
+                concurrency=concurrency,
+                requests=requests,
+                database_url=database_url,
+            )
+        )
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+            "concurrency": concurrency,
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+def parse_thresholds(values: Sequence[str], default: float = 0.10) -> Thresholds:
+    """Split ``--threshold`` values into the default and per-pattern limits.
+
+    Raises
+    ------
+    ValueError
+        If a value is neither a number nor ``PATTERN=NUMBER``.
+    """
+    patterns = []
+    for value in values:
+        pattern, sep, limit = value.rpartition("=")
+        if sep:
+            patterns.append((pattern, float(limit)))
+        else:
+            default = float(limit)
+    return default, patterns
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], thresholds: Thresholds
+) -> List[Comparison]:
+    """Compare the measurements present in both results documents."""
+    default, patterns = thresholds
+    comparisons = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        old, new = before["value"], result["value"]
+        if result["better"] == "higher":
+            old, new = new, old
+        if old == 0:
+            change = 0.0 if new == 0 else float("inf")
+        else:
+            change = new / old - 1
+        threshold = default
+        for pattern, limit in patterns:
+            if fnmatchcase(name, pattern):
+                threshold = limit
+        comparisons.append(
+            Comparison(name, before["value"], result["value"], change, threshold)
+        )
+    return comparisons
+
+
+def report(comparisons: List[Comparison], current: Dict[str, Any]) -> int:
+    """Print the comparison table and return the number of regressions."""
+    print(f"{'benchmark':<48}{'baseline':>14}{'current':>14}{'change':>10}")
+    for item in comparisons:
+        flag = "  REGRESSION" if item.regressed else ""
+        print(
+            f"{item.name:<48}{item.baseline:>14.6g}{item.current:>14.6g}"
+            f"{item.change:>+10.1%}{flag}"
+        )
+    compared = {item.name for item in comparisons}
+    for name in current["results"]:
+        if name not in compared:
+            print(f"{name:<48}{'(new)':>14}")
+    regressions = sum(item.regressed for item in comparisons)
+    print(f"{len(comparisons)} compared, {regressions} regressed")
+    return regressions
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and save JSON")
+    run_parser.add_argument("--only", choices=("micro", "load"))
+    run_parser.add_argument("--quick", action="store_true")
+    run_parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int)
+    run_parser.add_argument("--database-url", default="")
+    run_parser.add_argument("--baseline", help="compare with this results file")
+
+    compare_parser = commands.add_parser("compare", help="compare two results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument(
+            "--threshold",
+            action="append",
+            default=[],
+            metavar="[PATTERN=]FRACTION",
+            help="allowed slowdown, default 0.10; repeatable",
+        )
+    args = parser.parse_args()
+    try:
+        thresholds = parse_thresholds(args.threshold)
+    except ValueError as e:
+        parser.error(f"invalid --threshold: {e}")
+
+    if args.command == "run":
+        current = run(
+            args.only, args.quick, args.concurrency, args.requests, args.database_url
+        )
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Wrote {len(current['results'])} results to {args.output}")
+        if args.baseline is None:
+            return
+        baseline = _load(args.baseline)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    if report(compare(baseline, current, thresholds), current):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Cost-based admission control for calculator calls.
+
+A single ``factorial(10**7)`` or ``power(10, 10**9)`` pins a core for
+minutes and can build a result of hundreds of megabytes. Before anything is
+computed, the estimated cost of a call (see
+:func:`codespace_learning.executor.estimate_cost`; roughly the bits of a
+big-integer result, or a per-number weight for lists: 0.2 for an average, 2
+for a median) is checked against two budgets:
+
+- the per-request limit: a call above it is rejected with
+  :class:`CostLimitExceeded`, a ``ValueError`` the endpoints report as 400;
+- the worker budget: the total cost of expensive calls running in this
+  process. A call that does not fit waits until running calls finish, for at
+  most ``max_wait`` seconds, and is then rejected with :class:`Overloaded`,
+  reported as 503 with a ``Retry-After`` header.
+
+Cheap calls, which the executor runs inline, only face the per-request limit
+and never wait.
+
+Environment variables:
+
+- ``CALCULATOR_MAX_COST``: per-request limit (default 5,000,000: about 1 s
+  for ``factorial(300000)`` or a 5-million-bit ``power``; list summaries
+  stay well below that, the median of 2.5 million numbers or the average of
+  25 million take about 0.2 s); ``inf`` disables it
+- ``CALCULATOR_WORKER_BUDGET``: cost of expensive calls allowed in flight
+  per worker process (default twice ``CALCULATOR_MAX_COST``)
+- ``CALCULATOR_ADMISSION_WAIT``: seconds a call waits for the worker budget
+  (default 5; 0 rejects at once)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from math import ceil
+from threading import Lock
+from time import monotonic
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+class CostLimitExceeded(ValueError):
+    """The estimated cost of a call is above the per-request limit."""
+
+
+class Overloaded(Exception):
+    """The worker budget did not free up in time; retry after ``retry_after`` s."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdmissionController:
+    """Per-request cost limit and per-worker budget for expensive calls."""
+
+    def __init__(
+        self,
+        max_cost: float = 5_000_000,
+        worker_budget: Optional[float] = None,
+        max_wait: float = 5.0,
+    ) -> None:
+        if worker_budget is None:
+            worker_budget = 2 * max_cost
+        if worker_budget < max_cost:
+            raise ValueError("The worker budget must be at least the request limit")
+        self.max_cost = max_cost
+        self.worker_budget = worker_budget
+        self.max_wait = max_wait
+        self.in_flight = 0.0
+        self.admitted = 0
+        self.deferred = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> AdmissionController:
+        """Build a controller from ``CALCULATOR_MAX_COST`` and related variables."""
+        budget = os.getenv("CALCULATOR_WORKER_BUDGET")
+        return cls(
+            max_cost=float(os.getenv("CALCULATOR_MAX_COST", "5000000")),
+            worker_budget=float(budget) if budget else None,
+            max_wait=float(os.getenv("CALCULATOR_ADMISSION_WAIT", "5")),
+        )
+
+    def check(
+        self, operation: str, cost: float, limit: Optional[float] = None
+    ) -> float:
+        """Return ``cost`` if it is within ``limit`` (default: the request limit).
+
+        Raises
+        ------
+        CostLimitExceeded
+            If ``cost`` is above the limit.
+        """
+        if limit is None:
+            limit = self.max_cost
+        if cost > limit:
+            with self._lock:
+                self.rejected += 1
+            raise CostLimitExceeded(
+                f"{operation} is too expensive: estimated cost {cost:.3g} "
+                f"exceeds the limit of {limit:.3g}"
+            )
+        return cost
+
+    @asynccontextmanager
+    async def reserve(self, operation: str, cost: float) -> AsyncIterator[None]:
+        """Hold ``cost`` of the worker budget while the block runs.
+
+        Waits up to ``max_wait`` seconds for running calls to free the budget.
+
+        Raises
+        ------
+        Overloaded
+            If the budget is still short after ``max_wait`` seconds.
+        """
+        await self._acquire(operation, cost)
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+    async def _acquire(self, operation: str, cost: float) -> None:
+        deadline = None
+        while True:
+            with self._lock:
+                if self.in_flight + cost <= self.worker_budget:
+                    self.in_flight += cost
+                    self.admitted += 1
+                    return
+                if deadline is None:
+                    deadline = monotonic() + self.max_wait
+                    self.deferred += 1
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.overloaded += 1
+                    raise Overloaded(
+                        f"Too much work in progress to run {operation} now, "
+                        "try again later",
+                        retry_after=max(1, ceil(self.max_wait)),
+                    )
+                loop = asyncio.get_running_loop()
+                entry = (loop, loop.create_future())
+                self._waiters.append(entry)
+            try:
+                await asyncio.wait_for(asyncio.shield(entry[1]), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if entry in self._waiters:
+                        self._waiters.remove(entry)
+
+    def _release(self, cost: float) -> None:
+        with self._lock:
+            self.in_flight -= cost
+            waiters, self._waiters = self._waiters, []
+        # Waiters may belong to other event loops (one per worker thread).
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the budgets, the cost in flight and the decision counters."""
+        with self._lock:
+            return {
+                "max_cost": self.max_cost,
+                "worker_budget": self.worker_budget,
+                "max_wait": self.max_wait,
+                "in_flight_cost": self.in_flight,
+                "admitted": self.admitted,
+                "deferred": self.deferred,
+                "rejected": self.rejected,
+                "overloaded": self.overloaded,
+            }
+
+
+# Shared admission controller used by the executor and the endpoints.
+admission_controller = AdmissionController.from_env()
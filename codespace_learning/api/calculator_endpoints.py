@@ -1,209 +1,629 @@
 """Calculator API endpoints."""
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database.connection import get_db
+from ..database.connection import async_engine, get_db
+from ..database.retention import read_archived
+from ..database.reuse import result_reuse
+from ..database.rollups import operation_summary, rollup_recorder, throughput
+from ..database.writer import calculation_writer
 from ..models.calculation import Calculation
 from ..models.schemas import (
     BasicOperationRequest,
     SingleOperandRequest,
     PercentageRequest,
     ListOperationRequest,
+    ExpressionRequest,
+    BatchRequest,
+    BatchItemResult,
+    BatchResponse,
     CalculationResponse,
+    StreamMedianResponse,
+    OperationSummary,
+    ThroughputPoint,
     ErrorResponse,
 )
-from .. import calculator
+from .. import calculator, expression
+from ..admission import admission_controller
+from ..cache import ResultCache, result_cache
+from ..executor import operation_executor
+from ..metrics import metrics
+from ..operands import decode_operands, operands_bytes, pack_operands
+from ..operations import OPERATIONS, execute_operation
+from .export import ExportEncoder, export_query, stream_export
+from .history import (
+    HISTORY_COLUMNS,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    history_query,
+    history_records,
+)
+from .errors import calculation_error, storable_result
+from .responses import FastJSONResponse
+from .streaming import median_operation, stream_average, stream_sketch
 
-router = APIRouter(prefix="/calculator", tags=["Calculator"])
+router = APIRouter(
+    prefix="/calculator", tags=["Calculator"], default_response_class=FastJSONResponse
+)
 
 
-def save_calculation(
-    db: Session,
+async def save_calculation(
+    db: AsyncSession,
     operation: str,
     result: float,
     operand1: float = None,
     operand2: float = None,
     operands_list: str = None,
+    operands_blob: bytes = None,
+    result_key: str = None,
 ) -> Calculation:
-    """Save calculation to database."""
+    """Save calculation to database.
+
+    With write-behind enabled the row is handed to the background writer
+    instead of being committed here. The time taken is recorded as the
+    operation's ``db`` phase.
+
+    Raises
+    ------
+    ValueError
+        If the result is not a finite real number that fits in a float.
+    """
+    storable_result(result)
     db_calculation = Calculation(
         operation=operation,
         operand1=operand1,
         operand2=operand2,
         operands_list=operands_list,
+        operands_blob=operands_blob,
         result=result,
+        result_key=result_key,
     )
-    db.add(db_calculation)
-    db.commit()
-    db.refresh(db_calculation)
+    with metrics.operation(operation, "db"):
+        if calculation_writer.enabled:
+            return await calculation_writer.submit(db_calculation)
+        entries = [(operation, None, result)]
+        db.add(db_calculation)
+        await rollup_recorder.in_transaction(db, entries)
+        await db.commit()
+        await db.refresh(db_calculation)
+        await rollup_recorder.after_commit(entries)
     return db_calculation
 
 
+async def compute_and_save(
+    db: AsyncSession,
+    operation: str,
+    func: Callable[..., Any],
+    *args: Any,
+    cache: Optional[ResultCache] = None,
+    **columns: Any,
+) -> Calculation:
+    """Compute ``func(*args)`` on the operation executor and save it.
+
+    With result reuse enabled, a stored calculation of the same operation and
+    arguments is used instead of computing it again.
+    """
+    key = result_reuse.key(operation, args)
+    stored = await result_reuse.lookup(db, key)
+    if stored is not None:
+        if result_reuse.collapse:
+            return await result_reuse.record_hit(db, stored)
+        # The key stays with the first row; this one is plain history.
+        return await save_calculation(db, operation, stored.result, **columns)
+    with metrics.operation(operation, "compute"):
+        result = await operation_executor.run(func, *args, cache=cache)
+        storable_result(result)
+    try:
+        return await save_calculation(
+            db, operation, result, result_key=key, **columns
+        )
+    except IntegrityError:
+        if key is None:
+            raise
+        # A concurrent request stored the same calculation first.
+        await db.rollback()
+        return await compute_and_save(
+            db, operation, func, *args, cache=cache, **columns
+        )
+
+
 @router.post("/add", response_model=CalculationResponse)
-async def add_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def add_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Add two numbers."""
     try:
-        result = calculator.add(request.operand1, request.operand2)
-        calculation = save_calculation(
-            db, "add", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "add",
+            calculator.add,
+            request.operand1,
+            request.operand2,
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/subtract", response_model=CalculationResponse)
-async def subtract_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def subtract_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Subtract two numbers."""
     try:
-        result = calculator.subtract(request.operand1, request.operand2)
-        calculation = save_calculation(
-            db, "subtract", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "subtract",
+            calculator.subtract,
+            request.operand1,
+            request.operand2,
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/multiply", response_model=CalculationResponse)
-async def multiply_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def multiply_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Multiply two numbers."""
     try:
-        result = calculator.multiply(request.operand1, request.operand2)
-        calculation = save_calculation(
-            db, "multiply", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "multiply",
+            calculator.multiply,
+            request.operand1,
+            request.operand2,
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/divide", response_model=CalculationResponse)
-async def divide_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def divide_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Divide two numbers."""
     try:
-        result = calculator.divide(request.operand1, request.operand2)
-        calculation = save_calculation(
-            db, "divide", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "divide",
+            calculator.divide,
+            request.operand1,
+            request.operand2,
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/power", response_model=CalculationResponse)
-async def power_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def power_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Calculate base raised to power."""
     try:
-        result = calculator.power(request.operand1, request.operand2)
-        calculation = save_calculation(
-            db, "power", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "power",
+            calculator.power,
+            request.operand1,
+            request.operand2,
+            cache=result_cache,
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/modulo", response_model=CalculationResponse)
-async def modulo_numbers(request: BasicOperationRequest, db: Session = Depends(get_db)):
+async def modulo_numbers(request: BasicOperationRequest, db: AsyncSession = Depends(get_db)):
     """Calculate modulo operation."""
     try:
-        result = calculator.modulo(int(request.operand1), int(request.operand2))
-        calculation = save_calculation(
-            db, "modulo", result, request.operand1, request.operand2
+        calculation = await compute_and_save(
+            db,
+            "modulo",
+            calculator.modulo,
+            int(request.operand1),
+            int(request.operand2),
+            operand1=request.operand1,
+            operand2=request.operand2,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/sqrt", response_model=CalculationResponse)
-async def sqrt_number(request: SingleOperandRequest, db: Session = Depends(get_db)):
+async def sqrt_number(request: SingleOperandRequest, db: AsyncSession = Depends(get_db)):
     """Calculate square root."""
     try:
-        result = calculator.sqrt(request.operand)
-        calculation = save_calculation(db, "sqrt", result, request.operand)
+        calculation = await compute_and_save(
+            db,
+            "sqrt",
+            calculator.sqrt,
+            request.operand,
+            cache=result_cache,
+            operand1=request.operand,
+        )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/factorial", response_model=CalculationResponse)
-async def factorial_number(request: SingleOperandRequest, db: Session = Depends(get_db)):
+async def factorial_number(request: SingleOperandRequest, db: AsyncSession = Depends(get_db)):
     """Calculate factorial."""
     try:
-        result = calculator.factorial(int(request.operand))
-        calculation = save_calculation(db, "factorial", result, request.operand)
+        calculation = await compute_and_save(
+            db,
+            "factorial",
+            calculator.factorial,
+            int(request.operand),
+            cache=result_cache,
+            operand1=request.operand,
+        )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/percentage", response_model=CalculationResponse)
 async def percentage_calculation(
-    request: PercentageRequest, db: Session = Depends(get_db)
+    request: PercentageRequest, db: AsyncSession = Depends(get_db)
 ):
     """Calculate percentage."""
     try:
-        result = calculator.percentage(request.part, request.whole)
-        calculation = save_calculation(
-            db, "percentage", result, request.part, request.whole
+        calculation = await compute_and_save(
+            db,
+            "percentage",
+            calculator.percentage,
+            request.part,
+            request.whole,
+            cache=result_cache,
+            operand1=request.part,
+            operand2=request.whole,
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/average", response_model=CalculationResponse)
 async def average_calculation(
-    request: ListOperationRequest, db: Session = Depends(get_db)
+    request: ListOperationRequest, db: AsyncSession = Depends(get_db)
 ):
     """Calculate average."""
     try:
-        result = calculator.calculate_average(request.numbers)
-        calculation = save_calculation(
-            db, "average", result, operands_list=str(request.numbers)
+        calculation = await compute_and_save(
+            db,
+            "average",
+            calculator.calculate_average,
+            request.numbers,
+            operands_blob=pack_operands(request.numbers),
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
 
 
 @router.post("/median", response_model=CalculationResponse)
 async def median_calculation(
-    request: ListOperationRequest, db: Session = Depends(get_db)
+    request: ListOperationRequest, db: AsyncSession = Depends(get_db)
 ):
     """Calculate median."""
     try:
-        result = calculator.calculate_median(request.numbers)
-        calculation = save_calculation(
-            db, "median", result, operands_list=str(request.numbers)
+        calculation = await compute_and_save(
+            db,
+            "median",
+            calculator.calculate_median,
+            request.numbers,
+            operands_blob=pack_operands(request.numbers),
         )
         return calculation
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise calculation_error(e)
+
+
+@router.post("/average/stream", response_model=CalculationResponse)
+async def average_stream_calculation(request: Request, db: AsyncSession = Depends(get_db)):
+    """Calculate the average of a streamed list of numbers.
+
+    The body is read incrementally as NDJSON, CSV or a plain JSON array, so
+    memory use does not grow with the number of values. The numbers
+    themselves are not stored.
+    """
+    try:
+        stats = await stream_average(request.stream())
+        calculation = await save_calculation(db, "average", stats.mean)
+        return calculation
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/median/stream", response_model=StreamMedianResponse)
+async def median_stream_calculation(
+    request: Request,
+    k: int = Query(200, ge=8, le=10_000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Calculate an approximate median of a streamed list of numbers.
+
+    Uses a quantile sketch with accuracy parameter ``k`` (rank error of
+    roughly ``1.7 / k``); streams shorter than ``k`` values are exact.
+    Approximate results are stored as ``median_approx``.
+    """
+    try:
+        sketch = await stream_sketch(request.stream(), k=k)
+        calculation = await save_calculation(
+            db, median_operation(sketch), sketch.median
+        )
+        response = CalculationResponse.model_validate(calculation).model_dump()
+        return {**response, "count": sketch.count, "approximate": not sketch.exact}
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/evaluate", response_model=CalculationResponse)
+async def evaluate_expression(
+    request: ExpressionRequest, db: AsyncSession = Depends(get_db)
+):
+    """Evaluate an arithmetic expression and store it as a single calculation."""
+    try:
+        with metrics.operation("evaluate", "compute"):
+            result = await operation_executor.run(
+                expression.evaluate,
+                request.expression,
+                request.variables,
+                cost=expression.evaluation_cost(request.expression),
+            )
+            storable_result(result)
+        calculation = await save_calculation(
+            db,
+            "evaluate",
+            result,
+            operands_list=json.dumps(
+                {"expression": request.expression, "variables": request.variables}
+            ),
+        )
+        return calculation
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch_calculation(request: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """Run many operations and store them with one bulk insert.
+
+    Items that fail validation or computation are reported individually and
+    are not stored; the rest of the batch still succeeds. Expensive items
+    run on the operation executor. The whole batch shares the per-request
+    cost limit: an item that would take the estimated cost of the batch over
+    it fails without running.
+    """
+    results: List[BatchItemResult] = []
+    pending = []
+    created_at = datetime.utcnow()
+    remaining = admission_controller.max_cost
+    for index, payload in enumerate(request.operations):
+        name = payload.get("operation")
+        try:
+            label = name if isinstance(name, str) and name in OPERATIONS else "unknown"
+            with metrics.operation(label, "compute"):
+                operation, item, result = await execute_operation(
+                    payload, max_cost=remaining
+                )
+                storable_result(result)
+        except Exception as e:
+            results.append(
+                BatchItemResult(
+                    index=index,
+                    operation=name if isinstance(name, str) else None,
+                    error=str(e),
+                )
+            )
+            continue
+        remaining -= operation.cost(item)
+        row = Calculation(
+            operation=operation.name,
+            result=result,
+            created_at=created_at,
+            **operation.operands(item),
+        )
+        pending.append((index, row))
+        results.append(BatchItemResult(index=index, operation=operation.name))
+
+    if pending:
+        rows = [row for _, row in pending]
+        entries = []
+        try:
+            if calculation_writer.enabled:
+                await calculation_writer.submit_many(rows)
+            else:
+                db.add_all(rows)
+                await db.flush()
+                entries = [(row.operation, row.created_at, row.result) for row in rows]
+                await rollup_recorder.in_transaction(db, entries)
+            for index, row in pending:
+                results[index].calculation = CalculationResponse.model_validate(row)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Failed to store batch: {e}")
+        await rollup_recorder.after_commit(entries)
+
+    return BatchResponse(
+        results=results,
+        succeeded=len(pending),
+        failed=len(results) - len(pending),
+    )
+
+
+@router.get("/analytics/operations", response_model=List[OperationSummary])
+async def analytics_operations(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Request count and mean result per operation.
+
+    Read from the per-minute rollups, so the cost depends on the time range
+    rather than on the size of the history.
+    """
+    await rollup_recorder.flush()
+    return await operation_summary(db, since, until)
+
+
+@router.get("/analytics/throughput", response_model=List[ThroughputPoint])
+async def analytics_throughput(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    interval: int = Query(1, ge=1, le=1440),
+    operation: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Requests per ``interval`` minutes, for the last hour by default."""
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(hours=1)
+    await rollup_recorder.flush()
+    return await throughput(db, since, until, interval, operation)
+
+
+@router.get("/executor/stats")
+async def executor_stats():
+    """Worker pool configuration, queue depth and call counters."""
+    return operation_executor.stats()
+
+
+@router.get("/writer/stats")
+async def writer_stats():
+    """Write-behind queue length and counters."""
+    return calculation_writer.stats()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss counters and usage."""
+    return result_cache.stats()
 
 
 @router.get("/history", response_model=List[CalculationResponse])
 async def get_calculation_history(
-    limit: int = 50, db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    operation: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get calculation history, newest first.
+
+    Filter by ``operation`` and by time (``since`` inclusive, ``until``
+    exclusive). When more rows match, the ``X-Next-Cursor`` response header
+    holds the ``cursor`` to pass for the next page. With ``include_archived``
+    the history continues into calculations moved out by the retention job.
+    """
+    try:
+        query = history_query(limit + 1, cursor, operation, since, until)
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = (await db.execute(query)).all()
+    if include_archived and len(rows) <= limit:
+        archived = await asyncio.to_thread(
+            read_archived, limit + 1, before, operation, since, until
+        )
+        stored = {row.id for row in rows}
+        rows = sorted(
+            [*rows, *(c for c in archived if c.id not in stored)],
+            key=lambda row: (row.created_at, row.id),
+            reverse=True,
+        )[: limit + 1]
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return FastJSONResponse(history_records(rows), headers=headers)
+
+
+@router.get("/history/export")
+async def export_calculation_history(
+    format: str = Query("csv", pattern="^(csv|ndjson|arrow)$"),
+    operation: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
 ):
-    """Get calculation history."""
-    calculations = (
-        db.query(Calculation)
-        .order_by(Calculation.created_at.desc())
-        .limit(limit)
-        .all()
+    """Stream the whole calculation history, oldest first.
+
+    Rows are read through a server-side cursor and sent batch by batch, so
+    exports of any size run in constant memory.
+    """
+    try:
+        encoder = ExportEncoder(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_export(async_engine, encoder, export_query(operation, since, until)),
+        media_type=encoder.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="calculations.{format}"'
+        },
     )
-    return calculations
 
 
 @router.get("/history/{calculation_id}", response_model=CalculationResponse)
-async def get_calculation(calculation_id: int, db: Session = Depends(get_db)):
+async def get_calculation(calculation_id: int, db: AsyncSession = Depends(get_db)):
     """Get specific calculation by ID."""
-    calculation = db.query(Calculation).filter(Calculation.id == calculation_id).first()
+    row = (
+        await db.execute(
+            select(*HISTORY_COLUMNS).where(Calculation.id == calculation_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Calculation not found")
+    return FastJSONResponse(history_records([row])[0])
+
+
+@router.get("/history/{calculation_id}/operands")
+async def get_calculation_operands(
+    calculation_id: int,
+    format: str = Query("json", pattern="^(json|binary)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get the list operands of an average or median calculation.
+
+    ``format=binary`` returns the numbers as raw little-endian float64 values
+    (``application/octet-stream``) straight from storage.
+    """
+    calculation = await db.get(Calculation, calculation_id)
     if not calculation:
         raise HTTPException(status_code=404, detail="Calculation not found")
-    return calculation
\ No newline at end of file
+    blob = calculation.operands_blob
+    if blob is None and calculation.operation in ("average", "median"):
+        # Rows stored before operands were packed keep them as text.
+        if calculation.operands_list:
+            blob = pack_operands(json.loads(calculation.operands_list), None)
+    if blob is None:
+        raise HTTPException(
+            status_code=404, detail="Calculation has no list operands"
+        )
+    if format == "binary":
+        return Response(
+            content=bytes(operands_bytes(blob)),
+            media_type="application/octet-stream",
+        )
+    operands = decode_operands(blob).tolist()
+    return {"id": calculation.id, "count": len(operands), "operands": operands}
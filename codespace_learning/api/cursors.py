@@ -0,0 +1,37 @@
+"""Opaque cursors for keyset pagination of the calculation history.
+
+Kept free of database imports so the in-memory history backend can use them
+where SQLAlchemy or a database driver is unavailable.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+# Response header carrying the cursor of the next page.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, calculation_id: int) -> str:
+    """Encode the sort key of a history row as an opaque cursor."""
+    payload = json.dumps([created_at.isoformat(), calculation_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Raises
+    ------
+    ValueError
+        If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, calculation_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(calculation_id, int):
+            raise TypeError
+        return datetime.fromisoformat(created_at), calculation_id
+    except (TypeError, ValueError):
+        raise ValueError("Invalid history cursor") from None
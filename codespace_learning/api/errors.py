@@ -0,0 +1,68 @@
+"""
+HTTP errors for failed calculations.
+
+Endpoints catch every error raised by a calculation and report it through
+:func:`calculation_error`: a worker too busy to admit the call
+(:class:`~codespace_learning.admission.Overloaded`) is a temporary condition
+and becomes ``503 Service Unavailable`` with a ``Retry-After`` header; any
+other error, including a call over the cost limit, is the client's and
+becomes ``400 Bad Request``.
+
+Results are passed through :func:`finite_result` before they are stored or
+serialized: JSON cannot hold ``inf`` or ``nan`` (orjson would write
+``null``), so an overflowing result is reported as a 400 as well. The
+database history stores results in a float column, so its endpoints use
+:func:`storable_result`, which also rejects integers beyond the float range
+and complex results.
+"""
+
+from math import isfinite
+from typing import Any
+
+from fastapi import HTTPException
+
+from ..admission import Overloaded
+from ..calculator import InvalidResult
+
+
+def calculation_error(error: Exception) -> HTTPException:
+    """Return the ``HTTPException`` reporting ``error``."""
+    if isinstance(error, Overloaded):
+        return HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={"Retry-After": str(error.retry_after)},
+        )
+    return HTTPException(status_code=400, detail=str(error))
+
+
+def finite_result(result: Any) -> Any:
+    """Return ``result``, rejecting infinite and NaN floats.
+
+    Raises
+    ------
+    InvalidResult
+        If ``result`` is a float that is not finite.
+    """
+    if isinstance(result, float) and not isfinite(result):
+        raise InvalidResult(f"Result is not a finite number: {result}")
+    return result
+
+
+def storable_result(result: Any) -> Any:
+    """Return ``result`` if the history's float column can hold it.
+
+    Raises
+    ------
+    InvalidResult
+        If ``result`` is not a real number, does not fit in a float or is
+        not finite.
+    """
+    try:
+        value = float(result)
+    except OverflowError:
+        raise InvalidResult("Result is too large to store as a float") from None
+    except TypeError:
+        raise InvalidResult(f"Result is not a real number: {result}") from None
+    finite_result(value)
+    return result
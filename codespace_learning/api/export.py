@@ -0,0 +1,236 @@
+"""
+Streaming export of the calculation history.
+
+Rows are read through a server-side cursor ``FETCH_SIZE`` at a time, with
+plain Core selects instead of ORM objects, and each batch is encoded and sent
+before the next one is fetched. Memory use stays flat however many rows are
+exported, and the first bytes go out as soon as the first batch is read.
+
+Formats:
+
+- ``csv``: one header line, then one line per calculation
+- ``ndjson``: one JSON object per line
+- ``arrow``: an Arrow IPC stream with one record batch per fetch (requires
+  the ``arrow`` extra)
+
+List operands are decoded from their packed blob into ``operands``; CSV holds
+them as a JSON array. The same export is available from the command line::
+
+    export-calculations --format ndjson --output history.ndjson
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import Select, select
+
+from ..models.calculation import Calculation
+from ..operands import decode_operands
+from .history import history_filters
+
+try:
+    import pyarrow as _pa
+except ImportError:  # pragma: no cover - pyarrow is an optional extra
+    _pa = None
+
+EXPORT_FORMATS = ("csv", "ndjson", "arrow")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXPORT_COLUMNS = (
+    "id",
+    "operation",
+    "operand1",
+    "operand2",
+    "operands_list",
+    "operands",
+    "result",
+    "created_at",
+    "hit_count",
+)
+
+# Rows fetched from the database, and encoded, per batch.
+FETCH_SIZE = 5_000
+
+_table = Calculation.__table__
+_selected = [
+    _table.c[name] if name != "operands" else _table.c.operands_blob
+    for name in EXPORT_COLUMNS
+]
+
+
+def export_query(
+    operation: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Select:
+    """Build the export query, oldest calculation first.
+
+    Filters work like :func:`codespace_learning.api.history.history_query`.
+    """
+    return (
+        select(*_selected)
+        .where(*history_filters(operation, since, until))
+        .order_by(_table.c.id)
+    )
+
+
+def _records(rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    records = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        blob = record["operands"]
+        record["operands"] = None if blob is None else decode_operands(blob).tolist()
+        records.append(record)
+    return records
+
+
+class ExportEncoder:
+    """Turns batches of export rows into bytes of one format."""
+
+    def __init__(self, format: str) -> None:
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format!r}")
+        if format == "arrow" and _pa is None:
+            raise ValueError(
+                "Arrow export requires pyarrow (install the 'arrow' extra)"
+            )
+        self.format = format
+        self.media_type = MEDIA_TYPES[format]
+        self._sink = io.BytesIO()
+        self._writer = None
+        if format == "arrow":
+            self._schema = _pa.schema(
+                [
+                    ("id", _pa.int64()),
+                    ("operation", _pa.string()),
+                    ("operand1", _pa.float64()),
+                    ("operand2", _pa.float64()),
+                    ("operands_list", _pa.string()),
+                    ("operands", _pa.list_(_pa.float64())),
+                    ("result", _pa.float64()),
+                    ("created_at", _pa.timestamp("us")),
+                    ("hit_count", _pa.int64()),
+                ]
+            )
+
+    def header(self) -> bytes:
+        """Return the bytes starting the export."""
+        if self.format == "csv":
+            return (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+        if self.format == "arrow":
+            self._writer = _pa.ipc.new_stream(self._sink, self._schema)
+            return self._drain()
+        return b""
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        """Return the bytes of one batch of rows from :func:`export_query`."""
+        records = _records(rows)
+        if self.format == "arrow":
+            self._writer.write_batch(
+                _pa.RecordBatch.from_pylist(records, schema=self._schema)
+            )
+            return self._drain()
+        if self.format == "ndjson":
+            lines = []
+            for record in records:
+                if record["created_at"] is not None:
+                    record["created_at"] = record["created_at"].isoformat()
+                lines.append(json.dumps(record, separators=(",", ":")))
+            return ("\n".join(lines) + "\n").encode()
+        text = io.StringIO()
+        writer = csv.writer(text)
+        for record in records:
+            if record["operands"] is not None:
+                record["operands"] = json.dumps(record["operands"])
+            if record["created_at"] is not None:
+                record["created_at"] = record["created_at"].isoformat()
+            writer.writerow(record.values())
+        return text.getvalue().encode()
+
+    def footer(self) -> bytes:
+        """Return the bytes ending the export."""
+        if self.format == "arrow":
+            self._writer.close()
+            return self._drain()
+        return b""
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+
+async def stream_export(
+    engine, encoder: ExportEncoder, query: Select, fetch_size: int = FETCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Yield the encoded export of ``query`` from an async ``engine``.
+
+    Uses its own connection, so the stream outlives the request's session.
+    """
+    yield encoder.header()
+    async with engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=fetch_size))
+        async for rows in result.partitions():
+            yield encoder.encode(rows)
+    yield encoder.footer()
+
+
+def write_export(
+    engine, encoder: ExportEncoder, query: Select, output, fetch_size: int = FETCH_SIZE
+) -> int:
+    """Write the export of ``query`` to a binary file with a sync ``engine``.
+
+    Returns the number of rows written.
+    """
+    count = 0
+    output.write(encoder.header())
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=fetch_size
+        ).execute(query)
+        for rows in result.partitions():
+            output.write(encoder.encode(rows))
+            count += len(rows)
+    output.write(encoder.footer())
+    return count
+
+
+def main() -> None:
+    """Export the calculation history as CSV, NDJSON or Arrow."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--output", help="file to write (default: standard output)")
+    parser.add_argument("--operation")
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    try:
+        encoder = ExportEncoder(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    query = export_query(args.operation, args.since, args.until)
+
+    from ..database.connection import engine
+
+    if args.output is None:
+        count = write_export(engine, encoder, query, sys.stdout.buffer)
+    else:
+        with open(args.output, "wb") as output:
+            count = write_export(engine, encoder, query, output)
+    print(f"Exported {count} calculations", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
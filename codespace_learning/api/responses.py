@@ -0,0 +1,59 @@
+"""
+Fast JSON responses.
+
+:class:`FastJSONResponse` is the default response class of the calculator
+router. It encodes with ``orjson`` when installed (the ``fast`` extra), which
+writes bytes directly and handles ``datetime`` natively, and falls back to the
+standard library encoder otherwise. Endpoints returning large lists build
+plain dicts from Core rows and return this response themselves, skipping the
+validation of every item through the response model.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - orjson is an optional extra
+    _orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode ``content`` as compact UTF-8 JSON.
+
+    Raises
+    ------
+    TypeError
+        If ``content`` holds a value JSON cannot represent.
+    """
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(content)
+        except TypeError:
+            # orjson rejects integers beyond 64 bits, such as large factorials.
+            pass
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_default,
+    ).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """``application/json`` response encoded with :func:`dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
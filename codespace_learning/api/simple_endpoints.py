@@ -0,0 +1,343 @@
+"""Calculator API endpoints without a database.
+
+Used by ``app_simple`` and by ``app`` when the database components cannot be
+loaded. Calculations are recorded in the shared
+:data:`codespace_learning.history_backends.history_backend` (an in-memory
+ring buffer unless configured otherwise) and served from ``/history``.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from .. import calculator, expression
+from ..cache import result_cache
+from ..executor import operation_executor
+from ..history_backends import history_backend
+from ..models.schemas import (
+    BasicOperationRequest,
+    ExpressionRequest,
+    ListOperationRequest,
+    PercentageRequest,
+    SingleOperandRequest,
+)
+from .cursors import NEXT_CURSOR_HEADER
+from .errors import calculation_error, finite_result
+from .responses import FastJSONResponse
+from .streaming import median_operation, stream_average, stream_sketch
+
+router = APIRouter(
+    prefix="/calculator", tags=["Calculator"], default_response_class=FastJSONResponse
+)
+
+
+async def record(response: Dict[str, Any], **columns: Any) -> Dict[str, Any]:
+    """Store a calculation in the history and add its ``id`` and ``created_at``.
+
+    ``columns`` are the operand columns of the history record. Results the
+    history cannot hold (integers beyond the float range) are returned
+    without being stored.
+
+    Raises
+    ------
+    ValueError
+        If the result is not a finite number.
+    """
+    finite_result(response["result"])
+    try:
+        calculation = await history_backend.add(
+            response["operation"], response["result"], **columns
+        )
+    except ValueError:
+        return response
+    return {
+        "id": calculation["id"],
+        **response,
+        "created_at": calculation["created_at"],
+    }
+
+
+@router.post("/add")
+async def add_numbers(request: BasicOperationRequest):
+    """Add two numbers."""
+    try:
+        result = calculator.add(request.operand1, request.operand2)
+        return await record(
+            {
+                "operation": "add",
+                "operand1": request.operand1,
+                "operand2": request.operand2,
+                "result": result,
+            },
+            operand1=request.operand1,
+            operand2=request.operand2,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/subtract")
+async def subtract_numbers(request: BasicOperationRequest):
+    """Subtract two numbers."""
+    try:
+        result = calculator.subtract(request.operand1, request.operand2)
+        return await record(
+            {
+                "operation": "subtract",
+                "operand1": request.operand1,
+                "operand2": request.operand2,
+                "result": result,
+            },
+            operand1=request.operand1,
+            operand2=request.operand2,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/multiply")
+async def multiply_numbers(request: BasicOperationRequest):
+    """Multiply two numbers."""
+    try:
+        result = calculator.multiply(request.operand1, request.operand2)
+        return await record(
+            {
+                "operation": "multiply",
+                "operand1": request.operand1,
+                "operand2": request.operand2,
+                "result": result,
+            },
+            operand1=request.operand1,
+            operand2=request.operand2,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/divide")
+async def divide_numbers(request: BasicOperationRequest):
+    """Divide two numbers."""
+    try:
+        result = calculator.divide(request.operand1, request.operand2)
+        return await record(
+            {
+                "operation": "divide",
+                "operand1": request.operand1,
+                "operand2": request.operand2,
+                "result": result,
+            },
+            operand1=request.operand1,
+            operand2=request.operand2,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/power")
+async def power_numbers(request: BasicOperationRequest):
+    """Calculate base raised to power."""
+    try:
+        result = await operation_executor.run(
+            calculator.power, request.operand1, request.operand2, cache=result_cache
+        )
+        return await record(
+            {
+                "operation": "power",
+                "operand1": request.operand1,
+                "operand2": request.operand2,
+                "result": result,
+            },
+            operand1=request.operand1,
+            operand2=request.operand2,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/sqrt")
+async def sqrt_number(request: SingleOperandRequest):
+    """Calculate square root."""
+    try:
+        result = result_cache.call(calculator.sqrt, request.operand)
+        return await record(
+            {"operation": "sqrt", "operand": request.operand, "result": result},
+            operand1=request.operand,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/factorial")
+async def factorial_number(request: SingleOperandRequest):
+    """Calculate factorial."""
+    try:
+        result = await operation_executor.run(
+            calculator.factorial, int(request.operand), cache=result_cache
+        )
+        return await record(
+            {"operation": "factorial", "operand": request.operand, "result": result},
+            operand1=request.operand,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/percentage")
+async def percentage_calculation(request: PercentageRequest):
+    """Calculate percentage."""
+    try:
+        result = result_cache.call(calculator.percentage, request.part, request.whole)
+        return await record(
+            {
+                "operation": "percentage",
+                "part": request.part,
+                "whole": request.whole,
+                "result": result,
+            },
+            operand1=request.part,
+            operand2=request.whole,
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/average")
+async def average_calculation(request: ListOperationRequest):
+    """Calculate average.
+
+    The numbers themselves are not kept in the history.
+    """
+    try:
+        result = await operation_executor.run(
+            calculator.calculate_average, request.numbers
+        )
+        return await record(
+            {"operation": "average", "numbers": request.numbers, "result": result}
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/median")
+async def median_calculation(request: ListOperationRequest):
+    """Calculate median.
+
+    The numbers themselves are not kept in the history.
+    """
+    try:
+        result = await operation_executor.run(
+            calculator.calculate_median, request.numbers
+        )
+        return await record(
+            {"operation": "median", "numbers": request.numbers, "result": result}
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/average/stream")
+async def average_stream_calculation(request: Request):
+    """Calculate the average of a streamed list of numbers (NDJSON, CSV, JSON)."""
+    try:
+        stats = await stream_average(request.stream())
+        return await record(
+            {"operation": "average", "count": stats.count, "result": stats.mean}
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/median/stream")
+async def median_stream_calculation(
+    request: Request, k: int = Query(200, ge=8, le=10_000)
+):
+    """Calculate an approximate median of a streamed list of numbers."""
+    try:
+        sketch = await stream_sketch(request.stream(), k=k)
+        return await record(
+            {
+                "operation": median_operation(sketch),
+                "count": sketch.count,
+                "approximate": not sketch.exact,
+                "result": sketch.median,
+            }
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.post("/evaluate")
+async def evaluate_expression(request: ExpressionRequest):
+    """Evaluate an arithmetic expression."""
+    try:
+        result = await operation_executor.run(
+            expression.evaluate,
+            request.expression,
+            request.variables,
+            cost=expression.evaluation_cost(request.expression),
+        )
+        return await record(
+            {
+                "operation": "evaluate",
+                "expression": request.expression,
+                "variables": request.variables,
+                "result": result,
+            },
+            operands_list=json.dumps(
+                {"expression": request.expression, "variables": request.variables}
+            ),
+        )
+    except Exception as e:
+        raise calculation_error(e)
+
+
+@router.get("/executor/stats")
+async def executor_stats():
+    """Worker pool configuration, queue depth and call counters."""
+    return operation_executor.stats()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss counters and usage."""
+    return result_cache.stats()
+
+
+@router.get("/history/stats")
+async def history_stats():
+    """History backend configuration and counters."""
+    return history_backend.stats()
+
+
+@router.get("/history")
+async def get_calculation_history(
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    operation: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Get recent calculation history, newest first.
+
+    Takes the same parameters as the database-backed endpoint; the
+    ``X-Next-Cursor`` response header holds the cursor of the next page.
+    """
+    try:
+        calculations, next_cursor = await history_backend.page(
+            limit, cursor, operation, since, until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return FastJSONResponse(calculations, headers=headers)
+
+
+@router.get("/history/{calculation_id}")
+async def get_calculation(calculation_id: int):
+    """Get specific calculation by ID."""
+    calculation = await history_backend.get(calculation_id)
+    if calculation is None:
+        raise HTTPException(status_code=404, detail="Calculation not found")
+    return calculation
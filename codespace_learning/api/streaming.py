@@ -0,0 +1,102 @@
+"""Incremental parsing of large number streams from request bodies."""
+
+from math import isfinite
+from typing import AsyncIterator, List
+
+from ..stats import QuantileSketch, RunningStats
+
+# Numbers handed to the accumulators per chunk.
+CHUNK_SIZE = 8192
+# A single number longer than this is rejected.
+MAX_TOKEN_BYTES = 64
+# Brackets and commas are treated like whitespace, so NDJSON (one number or
+# array per line), CSV and a bare JSON array are all accepted.
+_SEPARATORS = bytes.maketrans(b"[],", b"   ")
+# Operation name for streamed medians taken from a compacted sketch, so they
+# are never mixed up with exact medians in the history and analytics.
+APPROXIMATE_MEDIAN = "median_approx"
+
+
+async def iter_number_chunks(
+    body: AsyncIterator[bytes], chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[List[float]]:
+    """Parse numbers from a byte stream, yielding lists of up to ``chunk_size``.
+
+    Only one partial number is carried between network chunks, so memory use
+    is bounded by ``chunk_size`` rather than by the size of the body.
+
+    Raises
+    ------
+    ValueError
+        If the stream contains something that is not a finite number.
+    """
+    pending = b""
+    values: List[float] = []
+    async for data in body:
+        if not data:
+            continue
+        text = pending + data.translate(_SEPARATORS)
+        tokens = text.split()
+        pending = b""
+        if tokens and not text[-1:].isspace():
+            pending = tokens.pop()
+            if len(pending) > MAX_TOKEN_BYTES:
+                raise ValueError("Invalid number in stream: value too long")
+        for token in tokens:
+            values.append(_parse_number(token))
+            if len(values) >= chunk_size:
+                yield values
+                values = []
+    if pending:
+        values.append(_parse_number(pending))
+    if values:
+        yield values
+
+
+def _parse_number(token: bytes) -> float:
+    try:
+        value = float(token)
+    except ValueError:
+        raise ValueError(
+            f"Invalid number in stream: {token[:MAX_TOKEN_BYTES].decode(errors='replace')}"
+        ) from None
+    if not isfinite(value):
+        raise ValueError("Invalid number in stream: numbers must be finite")
+    return value
+
+
+async def stream_average(body: AsyncIterator[bytes]) -> RunningStats:
+    """Accumulate count/mean/variance over a number stream.
+
+    Raises
+    ------
+    ValueError
+        If the stream is empty or malformed.
+    """
+    stats = RunningStats()
+    async for chunk in iter_number_chunks(body):
+        stats.update(chunk)
+    if stats.count == 0:
+        raise ValueError("Cannot calculate average of empty list")
+    return stats
+
+
+async def stream_sketch(body: AsyncIterator[bytes], k: int = 200) -> QuantileSketch:
+    """Build a quantile sketch over a number stream.
+
+    Raises
+    ------
+    ValueError
+        If the stream is empty or malformed.
+    """
+    sketch = QuantileSketch(k=k)
+    async for chunk in iter_number_chunks(body):
+        sketch.update(chunk)
+    if sketch.count == 0:
+        raise ValueError("Cannot calculate median of empty list")
+    return sketch
+
+
+def median_operation(sketch: QuantileSketch) -> str:
+    """Return the operation name to record ``sketch.median`` under."""
+    return "median" if sketch.exact else APPROXIMATE_MEDIAN
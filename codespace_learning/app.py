@@ -1,38 +1,173 @@
-"""FastAPI application for Calculator API."""
+"""FastAPI application for Calculator API.
 
-from fastapi import FastAPI, HTTPException
+Importing this module only builds the FastAPI app: the calculator router,
+SQLAlchemy and the database engine are loaded by :func:`load_routes` in the
+background when the server starts (or on the first request, when the app runs
+without lifespan events), followed by schema creation and pool warm-up. The
+server accepts connections straight away; ``/health/ready`` returns 200 once
+all of this is done.
+
+Environment variables:
+
+- ``CALCULATOR_CREATE_SCHEMA``: create missing tables at startup (default
+  true). Switch it off when the schema is created out of band, e.g. with the
+  ``create-schema`` command once per deploy.
+- ``DB_POOL_WARM``: connections opened before the API reports ready; see
+  :func:`codespace_learning.database.connection.warm_pool`
+
+Requests in flight are limited by :mod:`codespace_learning.limiter`, which
+also keeps database sessions from piling up under a burst.
+"""
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from threading import Lock
+import asyncio
 import logging
+import os
+
+from .limiter import ConcurrencyLimitMiddleware
+from .metrics import CONTENT_TYPE, MetricsMiddleware, metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Try to import database components, but don't fail if they're not available
+CREATE_SCHEMA = os.getenv("CALCULATOR_CREATE_SCHEMA", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+# Retry delays of the background database preparation, in seconds.
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+
+# Answered without waiting for the endpoints to load.
+HEALTH_PATHS = ("/health", "/health/ready")
+
+# Set by load_routes(): whether the database-backed endpoints are in use.
 database_available = False
-try:
-    from .database.connection import engine, Base
-    from .api.calculator_endpoints import router as calculator_router
-    database_available = True
-    logger.info("Database components loaded successfully")
-except Exception as e:
-    logger.warning(f"Database components not available: {e}")
-    logger.info("Running in database-free mode")
+routes_loaded = False
+database_ready = False
+_routes_lock = Lock()
+
+
+def load_routes() -> None:
+    """Include the calculator endpoints in the app, once.
+
+    The database-backed router is used when its components import; otherwise
+    the API runs in database-free mode with the simple endpoints.
+    """
+    global database_available, routes_loaded
+    if routes_loaded:
+        return
+    with _routes_lock:
+        if routes_loaded:
+            return
+        try:
+            from .api.calculator_endpoints import router
+
+            database_available = True
+            logger.info("Database-enabled calculator endpoints loaded")
+        except Exception as e:
+            logger.warning(f"Database components not available: {e}")
+            from .api.simple_endpoints import router
+
+            logger.info("Database-free calculator endpoints loaded")
+        app.include_router(router)
+        # Builds the request models of every route (and the OpenAPI schema)
+        # now rather than on the first request.
+        app.openapi()
+        routes_loaded = True
+
+
+async def prepare_database() -> None:
+    """Create the schema if enabled and warm the connection pool.
+
+    Retries with exponential backoff until the database is reachable, then
+    marks the API ready.
+    """
+    global database_ready
+    from .database.connection import async_engine, warm_pool
+    from .database.schema import create_schema
+
+    delay = RETRY_DELAY
+    while True:
+        try:
+            if CREATE_SCHEMA:
+                async with async_engine.begin() as conn:
+                    await conn.run_sync(create_schema)
+                logger.info("Database tables created successfully")
+            await warm_pool(async_engine)
+            break
+        except Exception as e:
+            logger.warning(f"Database not ready, retrying in {delay:g}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+    database_ready = True
+    logger.info("Connection pool warm, ready for traffic")
+
+
+def is_ready() -> bool:
+    """Whether the endpoints are loaded and, if used, the database is warm."""
+    return routes_loaded and (database_ready or not database_available)
+
+
+async def startup() -> None:
+    """Load the endpoints off the event loop, then prepare the database."""
+    await asyncio.to_thread(load_routes)
+    if database_available:
+        await prepare_database()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
-    if database_available:
-        try:
-            # Create database tables
-            Base.metadata.create_all(bind=engine)
-            logger.info("Database tables created successfully")
-        except Exception as e:
-            logger.warning(f"Failed to create database tables: {e}")
-            logger.info("Continuing without database features")
+    # The server accepts connections while this runs; /health/ready reports
+    # when it is done.
+    preparation = asyncio.create_task(startup())
     yield
+    preparation.cancel()
+    try:
+        await preparation
+    except asyncio.CancelledError:
+        pass
+    from .executor import operation_executor
+
+    operation_executor.shutdown()
+    if database_available:
+        from .database.connection import async_engine
+        from .database.rollups import rollup_recorder
+        from .database.writer import calculation_writer
+
+        # Drain queued history rows and rollups before the engine goes away.
+        await calculation_writer.close()
+        await rollup_recorder.flush()
+        await async_engine.dispose()
+
+
+class LoadRoutesMiddleware:
+    """Load the endpoints before the first request, with or without lifespan.
+
+    Requests arriving while the endpoints load wait for them in a thread, so
+    ``/health`` keeps answering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not routes_loaded
+            and scope["type"] in ("http", "websocket")
+            and scope["path"] not in HEALTH_PATHS
+        ):
+            await asyncio.to_thread(load_routes)
+        await self.app(scope, receive, send)
 
 
 app = FastAPI(
@@ -42,24 +177,18 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(LoadRoutesMiddleware)
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Include database router only if available
-if database_available:
-    app.include_router(calculator_router)
-    logger.info("Database-enabled calculator endpoints loaded")
-else:
-    # Import and include simple endpoints instead
-    from .api.simple_endpoints import router as simple_router
-    app.include_router(simple_router)
-    logger.info("Database-free calculator endpoints loaded")
-
 
 @app.get("/")
 async def root():
@@ -81,7 +210,27 @@ async def health_check():
     return {"status": "healthy", "message": "Calculator API is running"}
 
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness check: 503 until the connection pool is warm."""
+    content = {
+        "status": "ready" if is_ready() else "starting",
+        "database": (
+            ("ready" if database_ready else "warming")
+            if database_available
+            else "disabled"
+        ),
+    }
+    return JSONResponse(content, status_code=200 if is_ready() else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Request, operation and connection pool metrics in Prometheus format."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
 def start_server():
     """Start the FastAPI server."""
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
@@ -1,32 +1,42 @@
 """FastAPI application for Calculator API (without database)."""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Union
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+from typing import Union
 
-from .models.schemas import (
-    BasicOperationRequest,
-    SingleOperandRequest,
-    PercentageRequest,
-    ListOperationRequest,
-    ErrorResponse,
-)
-from . import calculator
+from .executor import operation_executor
+from .api.simple_endpoints import router as calculator_router
+from .limiter import ConcurrencyLimitMiddleware
+from .metrics import CONTENT_TYPE, MetricsMiddleware, metrics
 
 Number = Union[int, float]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan handler."""
+    yield
+    operation_executor.shutdown()
+
+
 app = FastAPI(
     title="Calculator API (Simple)",
     description="A calculator API without database for local development",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+app.add_middleware(ConcurrencyLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Simple response model without database
@@ -47,7 +57,7 @@ async def root():
             "docs": "/docs",
             "openapi": "/openapi.json",
         },
-        "note": "Running without database - calculations are not stored"
+        "note": "Running without database - recent calculations are kept in memory"
     }
 
 @app.get("/health")
@@ -55,141 +65,12 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "message": "Calculator API is running (simple mode)"}
 
-@app.post("/calculator/add")
-async def add_numbers(request: BasicOperationRequest):
-    """Add two numbers."""
-    try:
-        result = calculator.add(request.operand1, request.operand2)
-        return {
-            "operation": "add",
-            "operand1": request.operand1,
-            "operand2": request.operand2,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/subtract")
-async def subtract_numbers(request: BasicOperationRequest):
-    """Subtract two numbers."""
-    try:
-        result = calculator.subtract(request.operand1, request.operand2)
-        return {
-            "operation": "subtract",
-            "operand1": request.operand1,
-            "operand2": request.operand2,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/multiply")
-async def multiply_numbers(request: BasicOperationRequest):
-    """Multiply two numbers."""
-    try:
-        result = calculator.multiply(request.operand1, request.operand2)
-        return {
-            "operation": "multiply",
-            "operand1": request.operand1,
-            "operand2": request.operand2,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/divide")
-async def divide_numbers(request: BasicOperationRequest):
-    """Divide two numbers."""
-    try:
-        result = calculator.divide(request.operand1, request.operand2)
-        return {
-            "operation": "divide",
-            "operand1": request.operand1,
-            "operand2": request.operand2,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/power")
-async def power_numbers(request: BasicOperationRequest):
-    """Calculate base raised to power."""
-    try:
-        result = calculator.power(request.operand1, request.operand2)
-        return {
-            "operation": "power",
-            "operand1": request.operand1,
-            "operand2": request.operand2,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/sqrt")
-async def sqrt_number(request: SingleOperandRequest):
-    """Calculate square root."""
-    try:
-        result = calculator.sqrt(request.operand)
-        return {
-            "operation": "sqrt",
-            "operand": request.operand,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/factorial")
-async def factorial_number(request: SingleOperandRequest):
-    """Calculate factorial."""
-    try:
-        result = calculator.factorial(int(request.operand))
-        return {
-            "operation": "factorial",
-            "operand": request.operand,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/percentage")
-async def percentage_calculation(request: PercentageRequest):
-    """Calculate percentage."""
-    try:
-        result = calculator.percentage(request.part, request.whole)
-        return {
-            "operation": "percentage",
-            "part": request.part,
-            "whole": request.whole,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-@app.post("/calculator/average")
-async def average_calculation(request: ListOperationRequest):
-    """Calculate average."""
-    try:
-        result = calculator.calculate_average(request.numbers)
-        return {
-            "operation": "average",
-            "numbers": request.numbers,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Request latency metrics in Prometheus format."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
 
-@app.post("/calculator/median")
-async def median_calculation(request: ListOperationRequest):
-    """Calculate median."""
-    try:
-        result = calculator.calculate_median(request.numbers)
-        return {
-            "operation": "median",
-            "numbers": request.numbers,
-            "result": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+app.include_router(calculator_router)
 
 def start_server():
     """Start the simple FastAPI server."""
@@ -0,0 +1,152 @@
+"""
+Vectorised batch versions of the functions in :mod:`codespace_learning.calculator`.
+
+Each function accepts NumPy arrays, Python sequences or any object exposing
+the buffer protocol (``array.array``, ``memoryview``, ``bytes`` of packed
+doubles via ``numpy.frombuffer`` ...) and returns a :class:`BatchResult`.
+Instead of raising ``ValueError`` on the first bad element, invalid elements
+are flagged in ``BatchResult.errors`` and their value is set to ``nan``.
+
+Operands are broadcast against each other, so ``divide(values, 2)`` works as
+expected. All arithmetic is carried out in float64; results match the scalar
+functions element for element for inputs that are exactly representable as
+doubles (integers up to 2**53).
+
+NumPy is an optional dependency (``pip install codespace-learning[fast]``).
+"""
+
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None  # type: ignore[assignment]
+
+__all__ = [
+    "BatchResult",
+    "add",
+    "subtract",
+    "multiply",
+    "divide",
+    "modulo",
+    "power",
+    "sqrt",
+    "percentage",
+]
+
+
+class BatchResult(NamedTuple):
+    """Result of a batch operation.
+
+    ``values`` holds the computed float64 results and ``errors`` is a boolean
+    mask of the same shape that is ``True`` wherever the scalar function would
+    have raised (``values`` is ``nan`` at those positions).
+    """
+
+    values: Any
+    errors: Any
+
+
+def _as_array(values: Any) -> Any:
+    """Convert ``values`` to a float64 ndarray without copying when possible."""
+    if np is None:
+        raise ImportError(
+            "codespace_learning.batch requires numpy; "
+            "install it with `pip install codespace-learning[fast]`"
+        )
+    return np.asarray(values, dtype=np.float64)
+
+
+def _operands(a: Any, b: Any) -> tuple[Any, Any]:
+    a_arr, b_arr = _as_array(a), _as_array(b)
+    return np.broadcast_arrays(a_arr, b_arr)
+
+
+def _no_errors(values: Any) -> BatchResult:
+    return BatchResult(values, np.zeros(values.shape, dtype=bool))
+
+
+def _masked(values: Any, errors: Any) -> BatchResult:
+    if errors.any():
+        values = np.where(errors, np.nan, values)
+    return BatchResult(values, errors)
+
+
+def add(a: Any, b: Any) -> BatchResult:
+    """Element-wise :func:`calculator.add`."""
+    a_arr, b_arr = _operands(a, b)
+    with np.errstate(over="ignore", invalid="ignore"):
+        return _no_errors(np.add(a_arr, b_arr))
+
+
+def subtract(a: Any, b: Any) -> BatchResult:
+    """Element-wise :func:`calculator.subtract`."""
+    a_arr, b_arr = _operands(a, b)
+    with np.errstate(over="ignore", invalid="ignore"):
+        return _no_errors(np.subtract(a_arr, b_arr))
+
+
+def multiply(a: Any, b: Any) -> BatchResult:
+    """Element-wise :func:`calculator.multiply`."""
+    a_arr, b_arr = _operands(a, b)
+    with np.errstate(over="ignore", invalid="ignore"):
+        return _no_errors(np.multiply(a_arr, b_arr))
+
+
+def divide(a: Any, b: Any) -> BatchResult:
+    """Element-wise :func:`calculator.divide`; zero divisors are flagged."""
+    a_arr, b_arr = _operands(a, b)
+    errors = b_arr == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.true_divide(a_arr, b_arr)
+    return _masked(values, errors)
+
+
+def modulo(a: Any, b: Any) -> BatchResult:
+    """Element-wise :func:`calculator.modulo`; zero divisors are flagged.
+
+    ``numpy.mod`` follows Python's sign convention (the result takes the sign
+    of the divisor), so results match ``a % b``.
+    """
+    a_arr, b_arr = _operands(a, b)
+    errors = b_arr == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.mod(a_arr, b_arr)
+    return _masked(values, errors)
+
+
+def power(base: Any, exponent: Any) -> BatchResult:
+    """Element-wise :func:`calculator.power`.
+
+    Flags the elements for which the scalar version cannot produce a finite
+    real result: ``0`` raised to a negative exponent (``ZeroDivisionError``),
+    a negative base raised to a fractional exponent (a complex number) and
+    finite operands whose result overflows float64 (``OverflowError``).
+    """
+    base_arr, exp_arr = _operands(base, exponent)
+    with np.errstate(all="ignore"):
+        values = np.power(base_arr, exp_arr)
+        errors = (base_arr == 0) & (exp_arr < 0)
+        errors |= (base_arr < 0) & (np.floor(exp_arr) != exp_arr)
+        errors |= np.isinf(values) & np.isfinite(base_arr) & np.isfinite(exp_arr)
+    return _masked(values, errors)
+
+
+def sqrt(n: Any) -> BatchResult:
+    """Element-wise :func:`calculator.sqrt`; negative inputs are flagged."""
+    n_arr = _as_array(n)
+    errors = n_arr < 0.0
+    with np.errstate(invalid="ignore"):
+        values = np.sqrt(n_arr)
+    return _masked(values, errors)
+
+
+def percentage(part: Any, whole: Any) -> BatchResult:
+    """Element-wise :func:`calculator.percentage`; zero wholes are flagged."""
+    part_arr, whole_arr = _operands(part, whole)
+    errors = whole_arr == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = part_arr / whole_arr * 100.0
+    return _masked(values, errors)
@@ -0,0 +1,163 @@
+"""
+Opt-in result cache for the pure calculator functions.
+
+Every function in :mod:`codespace_learning.calculator` is pure, so repeated
+inputs (dashboards asking for the same ``power`` or ``factorial`` over and over)
+can be answered from memory. Entries are evicted least-recently-used first,
+expire after a time-to-live, and the cache stays under a memory budget since a
+single factorial result can be megabytes large.
+
+The shared :data:`result_cache` is disabled unless ``CALCULATOR_CACHE_ENABLED``
+is set; when disabled, :meth:`ResultCache.call` simply calls the function.
+
+Environment variables:
+
+- ``CALCULATOR_CACHE_ENABLED``: ``1``/``true`` to enable the shared cache
+- ``CALCULATOR_CACHE_MAX_ENTRIES``: maximum number of entries (default 4096)
+- ``CALCULATOR_CACHE_TTL``: seconds before an entry expires (default 300)
+- ``CALCULATOR_CACHE_MAX_BYTES``: memory budget in bytes (default 64 MiB)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+
+class ResultCache:
+    """Thread-safe LRU cache with TTL expiry and a memory budget."""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl: float = 300.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        enabled: bool = True,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> ResultCache:
+        """Build a cache configured from ``CALCULATOR_CACHE_*`` variables."""
+        return cls(
+            max_entries=int(os.getenv("CALCULATOR_CACHE_MAX_ENTRIES", "4096")),
+            ttl=float(os.getenv("CALCULATOR_CACHE_TTL", "300")),
+            max_bytes=int(os.getenv("CALCULATOR_CACHE_MAX_BYTES", str(64 * 1024**2))),
+            enabled=os.getenv("CALCULATOR_CACHE_ENABLED", "").lower() in _TRUE_VALUES,
+        )
+
+    @staticmethod
+    def make_key(func: Callable[..., Any], args: Tuple[Any, ...]) -> Hashable:
+        """Build a cache key; argument types are included so that ``2`` and
+        ``2.0`` (which hash equal but give ``int``/``float`` results) differ."""
+        return (func.__module__, func.__qualname__) + tuple(
+            (type(arg), arg) for arg in args
+        )
+
+    def call(self, func: Callable[..., T], *args: Any) -> T:
+        """Return ``func(*args)``, served from the cache when possible.
+
+        Exceptions raised by ``func`` propagate and are never cached.
+        """
+        if not self.enabled:
+            return func(*args)
+        found, value = self.lookup(func, args)
+        if found:
+            return value
+        value = func(*args)
+        self.store(func, args, value)
+        return value
+
+    def lookup(
+        self, func: Callable[..., Any], args: Tuple[Any, ...]
+    ) -> Tuple[bool, Any]:
+        """Return ``(True, value)`` on a hit and ``(False, None)`` on a miss."""
+        if not self.enabled:
+            return False, None
+        key = self.make_key(func, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry.value
+                self._remove(key)
+            self.misses += 1
+        return False, None
+
+    def store(
+        self, func: Callable[..., Any], args: Tuple[Any, ...], value: Any
+    ) -> None:
+        """Cache ``value`` as the result of ``func(*args)``."""
+        if self.enabled:
+            key = self.make_key(func, args)
+            self._store(key, value, time.monotonic() + self.ttl)
+
+    def _store(self, key: Hashable, value: Any, expires_at: float) -> None:
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+# Shared cache used by the API endpoints.
+result_cache = ResultCache.from_env()
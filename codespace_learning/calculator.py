@@ -8,12 +8,52 @@ handling and type hints.
 
 from __future__ import annotations
 
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from math import ceil as _ceil
+from math import factorial as _factorial
+from math import floor as _floor
 from math import sqrt as _sqrt
+from threading import Lock
 from typing import Sequence, Union
 
+try:
+    import numpy as _np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    _np = None
+
 Number = Union[int, float]
 
 
+class DivisionByZero(ValueError):
+    """A division, modulo or percentage by zero."""
+
+
+class InvalidOperand(ValueError):
+    """An operand outside the domain of the operation."""
+
+
+class InvalidResult(ValueError):
+    """A result that is not a finite real number or is too large to store."""
+
+
+# Lists at least this long use selection (numpy.partition) instead of a sort.
+_SELECTION_THRESHOLD = 100_000
+
+# Factorials of at least this size are kept as checkpoints for later calls.
+_FACTORIAL_CHECKPOINT_MIN = 1_000
+# Upper bound on the memory held by cached factorial checkpoints (bytes).
+_FACTORIAL_CACHE_BYTES = 64 * 1024 * 1024
+# Resume from a checkpoint ``m!`` only when ``n - m`` is at most ``n`` divided
+# by this value; for larger gaps computing ``n!`` from scratch is faster.
+_FACTORIAL_MAX_GAP_DIVISOR = 4
+
+_factorial_lock = Lock()
+_factorial_checkpoints: "OrderedDict[int, int]" = OrderedDict()
+_factorial_keys: list[int] = []
+_factorial_cache_bytes = 0
+
+
 def add(a: Number, b: Number) -> Number:
     """Add two numbers."""
     return a + b
@@ -38,7 +78,7 @@ def divide(a: Number, b: Number) -> Number:
         If ``b`` is zero.
     """
     if b == 0:
-        raise ValueError("Cannot divide by zero")
+        raise DivisionByZero("Cannot divide by zero")
     return a / b
 
 
@@ -51,7 +91,7 @@ def modulo(a: int, b: int) -> int:
         If ``b`` is zero.
     """
     if b == 0:
-        raise ValueError("Cannot modulo by zero")
+        raise DivisionByZero("Cannot modulo by zero")
     return a % b
 
 
@@ -71,31 +111,100 @@ def sqrt(n: Number) -> float:
     # Explicit float cast ensures support for both int and float while
     # allowing comparison
     if float(n) < 0.0:
-        raise ValueError("Cannot take square root of a negative number")
+        raise InvalidOperand("Cannot take square root of a negative number")
     n_float = float(n)
     if n_float < 0.0:
-        raise ValueError("Cannot take square root of a negative number")
+        raise InvalidOperand("Cannot take square root of a negative number")
     return float(_sqrt(n_float))
 
 
 def factorial(n: int) -> int:
     """Return n! for a non-negative integer ``n``.
 
+    Uses :func:`math.factorial` (divide-and-conquer over the odd parts of the
+    product) and keeps a bounded LRU cache of large results. When a cached
+    ``m!`` with ``m`` slightly below ``n`` exists, only ``(m+1)...n`` is
+    computed, by binary splitting, and multiplied onto it.
+
     Raises
     ------
     ValueError
         If ``n`` is negative or not an integer.
     """
     if not isinstance(n, int):
-        raise ValueError("factorial() only accepts integers")
+        raise InvalidOperand("factorial() only accepts integers")
     if n < 0:
-        raise ValueError("factorial() not defined for negative values")
-    result = 1
-    for i in range(2, n + 1):
-        result *= i
+        raise InvalidOperand("factorial() not defined for negative values")
+    if n < _FACTORIAL_CHECKPOINT_MIN:
+        return _factorial(n)
+
+    checkpoint = _nearest_factorial_checkpoint(n)
+    if checkpoint is None:
+        result = _factorial(n)
+    else:
+        m, m_factorial = checkpoint
+        result = m_factorial * _range_product(m + 1, n + 1)
+    _store_factorial_checkpoint(n, result)
     return result
 
 
+def _range_product(lo: int, hi: int) -> int:
+    """Return the product of the integers in ``[lo, hi)`` by binary splitting.
+
+    Splitting keeps both multiplicands of similar size, which lets CPython use
+    Karatsuba multiplication instead of repeatedly multiplying a huge integer
+    by a small one.
+    """
+    if hi - lo <= 32:
+        result = 1
+        for i in range(lo, hi):
+            result *= i
+        return result
+    mid = (lo + hi) // 2
+    return _range_product(lo, mid) * _range_product(mid, hi)
+
+
+def _nearest_factorial_checkpoint(n: int) -> tuple[int, int] | None:
+    """Return the largest cached ``(m, m!)`` with ``m <= n`` close enough to ``n``."""
+    with _factorial_lock:
+        index = bisect_right(_factorial_keys, n)
+        if index == 0:
+            return None
+        m = _factorial_keys[index - 1]
+        if n - m > n // _FACTORIAL_MAX_GAP_DIVISOR:
+            return None
+        _factorial_checkpoints.move_to_end(m)
+        return m, _factorial_checkpoints[m]
+
+
+def _store_factorial_checkpoint(n: int, value: int) -> None:
+    """Cache ``n! == value``, evicting least recently used checkpoints."""
+    global _factorial_cache_bytes
+    size = (value.bit_length() + 7) // 8
+    if size > _FACTORIAL_CACHE_BYTES:
+        return
+    with _factorial_lock:
+        if n in _factorial_checkpoints:
+            _factorial_checkpoints.move_to_end(n)
+            return
+        _factorial_checkpoints[n] = value
+        insort(_factorial_keys, n)
+        _factorial_cache_bytes += size
+        while _factorial_cache_bytes > _FACTORIAL_CACHE_BYTES:
+            old_n, old_value = _factorial_checkpoints.popitem(last=False)
+            _factorial_keys.remove(old_n)
+            _factorial_cache_bytes -= (old_value.bit_length() + 7) // 8
+
+
+def clear_factorial_cache() -> None:
+    """Drop every cached factorial checkpoint."""
+    global _factorial_cache_bytes
+    with _factorial_lock:
+        _factorial_checkpoints.clear()
+        _factorial_keys.clear()
+        _factorial_cache_bytes = 0
+
+
 def percentage(part: Number, whole: Number) -> float:
     """Return ``part`` as a percentage of ``whole``.
 
@@ -107,7 +216,7 @@ def percentage(part: Number, whole: Number) -> float:
         If ``whole`` is zero.
     """
     if whole == 0:
-        raise ValueError("Cannot compute percentage with a zero whole")
+        raise DivisionByZero("Cannot compute percentage with a zero whole")
     return float(part) / float(whole) * 100.0
 
 
@@ -120,7 +229,7 @@ def calculate_average(numbers: Sequence[Number]) -> float:
         If the list is empty.
     """
     if not numbers:
-        raise ValueError("Cannot calculate average of empty list")
+        raise InvalidOperand("Cannot calculate average of empty list")
     return sum(numbers) / len(numbers)
 
 
@@ -133,10 +242,56 @@ def calculate_median(numbers: Sequence[Number]) -> float:
         If the list is empty.
     """
     if not numbers:
-        raise ValueError("Cannot calculate median of empty list")
-    sorted_nums = sorted(float(n) for n in numbers)
-    n = len(sorted_nums)
+        raise InvalidOperand("Cannot calculate median of empty list")
+    n = len(numbers)
     mid = n // 2
     if n % 2 == 1:
-        return sorted_nums[mid]
-    return (sorted_nums[mid - 1] + sorted_nums[mid]) / 2.0
+        return _order_statistics(numbers, [mid])[0]
+    lower, upper = _order_statistics(numbers, [mid - 1, mid])
+    return (lower + upper) / 2.0
+
+
+def calculate_percentiles(
+    numbers: Sequence[Number], percentiles: Sequence[Number]
+) -> list[float]:
+    """Return the requested percentiles (0-100) of ``numbers``.
+
+    Values between two data points are linearly interpolated, matching
+    ``numpy.percentile``'s default method. All percentiles are found in a
+    single selection pass.
+
+    Example: calculate_percentiles([1, 2, 3, 4], [50, 100]) -> [2.5, 4.0]
+
+    Raises
+    ------
+    ValueError
+        If the list is empty or a percentile is outside ``[0, 100]``.
+    """
+    if not numbers:
+        raise InvalidOperand("Cannot calculate percentiles of empty list")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise InvalidOperand("Percentiles must be between 0 and 100")
+    last = len(numbers) - 1
+    positions = [p / 100.0 * last for p in percentiles]
+    ranks = sorted({k for pos in positions for k in (_floor(pos), _ceil(pos))})
+    values = dict(zip(ranks, _order_statistics(numbers, ranks)))
+    results = []
+    for pos in positions:
+        lower, upper = values[_floor(pos)], values[_ceil(pos)]
+        results.append(lower + (upper - lower) * (pos - _floor(pos)))
+    return results
+
+
+def _order_statistics(numbers: Sequence[Number], ranks: list[int]) -> list[float]:
+    """Return the values at sorted positions ``ranks`` of ``numbers``.
+
+    Large inputs are partitioned around the requested ranks with
+    ``numpy.partition`` (introselect, O(n)) instead of being fully sorted.
+    Smaller inputs, or any input when numpy is unavailable, are sorted as-is
+    without building an intermediate list of floats.
+    """
+    if _np is not None and len(numbers) >= _SELECTION_THRESHOLD:
+        partitioned = _np.partition(_np.asarray(numbers, dtype=_np.float64), ranks)
+        return [float(partitioned[k]) for k in ranks]
+    ordered = sorted(numbers)
+    return [float(ordered[k]) for k in ranks]
@@ -0,0 +1,372 @@
+"""
+Bulk import of calculation workloads into the history.
+
+Reads a file of operations, one JSON object per line in the format of a
+``POST /calculator/batch`` item (``{"operation": "add", "operand1": 1,
+"operand2": 2}``), optionally with the ``created_at`` time to store. Lines are
+computed with :mod:`codespace_learning.calculator` in a pool of worker
+processes, ``chunk_size`` lines per task, and the results are inserted in one
+transaction per chunk together with their analytics rollups::
+
+    import-calculations workload.ndjson --workers 4 --errors rejected.ndjson
+
+Progress is saved to a checkpoint file (``<input>.checkpoint`` by default)
+after every chunk, so an interrupted import continues where it stopped when
+run again; the chunk in flight is neither lost nor stored twice. Lines that
+fail validation or computation are counted, and written to ``--errors`` when
+given, but do not stop the import. The checkpoint also records the size of
+the errors file, which is cut back to it on resume so lines computed again
+are not reported twice.
+
+On SQLite, row IDs are reserved as described in
+:class:`codespace_learning.database.writer.IdAllocator`, so do not import into
+a database the API is writing to at the same time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Float, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..models.calculation import Calculation
+from ..operations import run_operation
+from .rollups import apply_rollups, rollup_recorder
+from .writer import IdAllocator
+
+# Input lines computed and inserted per task and transaction.
+CHUNK_SIZE = 5_000
+
+_table = Calculation.__table__
+_columns = [column for column in _table.columns if column.key != "id"]
+_float_columns = {column.key for column in _columns if isinstance(column.type, Float)}
+
+Rejected = Tuple[int, str]
+
+
+def compute_chunk(
+    lines: List[bytes], first_line: int
+) -> Tuple[List[Dict[str, Any]], List[Rejected]]:
+    """Compute the operations on ``lines`` (numbered from ``first_line``).
+
+    Returns the rows to insert, without IDs, and the ``(line, error)`` of each
+    line that could not be computed. Runs in a worker process.
+    """
+    rows: List[Dict[str, Any]] = []
+    rejected: List[Rejected] = []
+    now = datetime.utcnow()
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            payload = json.loads(line)
+            if not isinstance(payload, dict):
+                raise ValueError("Expected a JSON object")
+            operation, request, result = run_operation(payload)
+            created_at = payload.get("created_at")
+            row = {column.key: None for column in _columns}
+            row.update(
+                operation=operation.name,
+                result=result,
+                created_at=(datetime.fromisoformat(created_at) if created_at else now),
+                hit_count=1,
+                **operation.operands(request),
+            )
+            for key in _float_columns:
+                if row[key] is not None:
+                    try:
+                        row[key] = float(row[key])
+                    except OverflowError:
+                        raise ValueError(f"{key} is too large to store") from None
+        except Exception as e:
+            rejected.append((number, str(e)))
+            continue
+        rows.append(row)
+    return rows, rejected
+
+
+class Checkpoint:
+    """Import progress, saved as JSON next to the input file.
+
+    ``offset`` and ``line`` locate the first input line not yet imported.
+    ``errors_offset`` is the size of the errors file once the rejected lines
+    before ``line`` were written. ``pending`` describes the chunk being
+    inserted: its end and the ID of its first row, which tells on resume
+    whether its transaction committed.
+    """
+
+    def __init__(self, path: Path, input_path: Path) -> None:
+        self.path = path
+        self.input = str(input_path.resolve())
+        self.offset = 0
+        self.line = 1
+        self.imported = 0
+        self.rejected = 0
+        self.complete = False
+        self.errors_offset: Optional[int] = None
+        self.pending: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, path: Path, input_path: Path) -> Checkpoint:
+        """Read the checkpoint at ``path``, or start a new one.
+
+        Raises
+        ------
+        ValueError
+            If the checkpoint belongs to a different input file.
+        """
+        checkpoint = cls(path, input_path)
+        if path.exists():
+            state = json.loads(path.read_text())
+            if state["input"] != checkpoint.input:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to {state['input']}; "
+                    "remove it or pass another checkpoint file"
+                )
+            for key in ("offset", "line", "imported", "rejected", "complete"):
+                setattr(checkpoint, key, state[key])
+            checkpoint.errors_offset = state.get("errors_offset")
+            checkpoint.pending = state.get("pending")
+        return checkpoint
+
+    def save(self) -> None:
+        """Atomically replace the checkpoint file."""
+        state = {
+            "input": self.input,
+            "offset": self.offset,
+            "line": self.line,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "complete": self.complete,
+            "errors_offset": self.errors_offset,
+            "pending": self.pending,
+        }
+        partial = self.path.with_name(self.path.name + ".partial")
+        with open(partial, "w") as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        partial.replace(self.path)
+
+    def commit_pending(self) -> None:
+        """Record the pending chunk as imported."""
+        self.offset = self.pending["offset"]
+        self.line = self.pending["line"]
+        self.imported += self.pending["rows"]
+        self.rejected += self.pending["rejected"]
+        self.errors_offset = self.pending.get("errors_offset")
+        self.pending = None
+
+
+def _read_chunks(
+    path: Path, offset: int, line: int, chunk_size: int
+) -> Iterator[Tuple[List[bytes], int, int]]:
+    """Yield ``(lines, first line number, end offset)`` from ``offset`` on."""
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while True:
+            lines = []
+            for _ in range(chunk_size):
+                data = file.readline()
+                if not data:
+                    break
+                lines.append(data)
+            if not lines:
+                return
+            yield lines, line, file.tell()
+            line += len(lines)
+
+
+async def _committed(engine: AsyncEngine, row_id: int) -> bool:
+    async with engine.connect() as conn:
+        found = await conn.scalar(select(_table.c.id).where(_table.c.id == row_id))
+    return found is not None
+
+
+async def import_file(
+    engine: AsyncEngine,
+    path: Path,
+    checkpoint: Checkpoint,
+    executor: Optional[Executor] = None,
+    chunk_size: int = CHUNK_SIZE,
+    prefetch: int = 2,
+    errors=None,
+    progress: Optional[Callable[[Checkpoint], None]] = None,
+) -> Checkpoint:
+    """Import ``path`` from the position saved in ``checkpoint``.
+
+    Chunks are computed on ``executor`` (the loop's default thread pool when
+    ``None``), up to ``prefetch`` of them ahead of the one being inserted.
+    Rejected lines are written to the text file ``errors`` as JSON objects
+    when given, after cutting off any written after the checkpoint;
+    ``progress`` is called after every chunk.
+    """
+    if checkpoint.pending is not None:
+        if await _committed(engine, checkpoint.pending["first_id"]):
+            checkpoint.commit_pending()
+        else:
+            checkpoint.pending = None
+        checkpoint.save()
+    if checkpoint.complete:
+        return checkpoint
+    if errors is not None:
+        end = errors.seek(0, os.SEEK_END)
+        if checkpoint.errors_offset is None:
+            checkpoint.errors_offset = end
+            checkpoint.save()
+        elif end > checkpoint.errors_offset:
+            # Rejections of lines after the checkpoint are written again.
+            errors.truncate(checkpoint.errors_offset)
+
+    loop = asyncio.get_running_loop()
+    ids = IdAllocator(engine, _table, chunk_size)
+    chunks = _read_chunks(path, checkpoint.offset, checkpoint.line, chunk_size)
+    running: Deque[Tuple[asyncio.Future, int, int]] = deque()
+
+    def submit() -> bool:
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        lines, first_line, end = chunk
+        future = loop.run_in_executor(executor, compute_chunk, lines, first_line)
+        running.append((future, first_line + len(lines), end))
+        return True
+
+    while len(running) <= prefetch and submit():
+        pass
+    while running:
+        future, next_line, end = running.popleft()
+        rows, rejected = await future
+        submit()
+        for row, row_id in zip(rows, await ids.allocate(len(rows))):
+            row["id"] = row_id
+        errors_offset = checkpoint.errors_offset
+        if errors is not None:
+            for number, error in rejected:
+                errors.write(json.dumps({"line": number, "error": error}) + "\n")
+            errors.flush()
+            errors_offset = errors.tell()
+        checkpoint.pending = {
+            "offset": end,
+            "line": next_line,
+            "rows": len(rows),
+            "rejected": len(rejected),
+            "first_id": rows[0]["id"] if rows else 0,
+            "errors_offset": errors_offset,
+        }
+        if rows:
+            checkpoint.save()
+            async with engine.begin() as conn:
+                await conn.execute(insert(_table), rows)
+                if rollup_recorder.enabled:
+                    # One upsert per chunk: imports have no hot-row problem.
+                    await apply_rollups(
+                        conn,
+                        (
+                            (row["operation"], row["created_at"], row["result"])
+                            for row in rows
+                        ),
+                    )
+        checkpoint.commit_pending()
+        checkpoint.save()
+        if progress is not None:
+            progress(checkpoint)
+    checkpoint.complete = True
+    checkpoint.save()
+    return checkpoint
+
+
+def main() -> None:
+    """Import a file of calculations into the history."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("input", type=Path, help="NDJSON file of batch items")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes (0 computes in threads of this process)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument(
+        "--checkpoint", type=Path, help="progress file (default: <input>.checkpoint)"
+    )
+    parser.add_argument("--errors", type=Path, help="append rejected lines here")
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore an existing checkpoint"
+    )
+    args = parser.parse_args()
+    if args.workers < 0 or args.chunk_size < 1:
+        parser.error("--workers must be >= 0 and --chunk-size >= 1")
+
+    checkpoint_path = args.checkpoint or args.input.with_name(
+        args.input.name + ".checkpoint"
+    )
+    if args.restart:
+        checkpoint_path.unlink(missing_ok=True)
+    try:
+        checkpoint = Checkpoint.load(checkpoint_path, args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    if checkpoint.complete:
+        print(f"{args.input} was already imported ({checkpoint.imported} rows)")
+        return
+
+    total = args.input.stat().st_size
+    started = time.monotonic()
+    first_imported = checkpoint.imported
+
+    def progress(checkpoint: Checkpoint) -> None:
+        elapsed = time.monotonic() - started
+        rate = (checkpoint.imported - first_imported) / elapsed if elapsed else 0
+        print(
+            f"\r{checkpoint.offset / max(total, 1):6.1%}  "
+            f"{checkpoint.imported} imported, {checkpoint.rejected} rejected, "
+            f"{rate:,.0f} rows/s",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    from .connection import async_engine
+
+    async def run() -> Checkpoint:
+        errors = open(args.errors, "a") if args.errors else None
+        executor = ProcessPoolExecutor(args.workers) if args.workers else None
+        try:
+            return await import_file(
+                async_engine,
+                args.input,
+                checkpoint,
+                executor,
+                args.chunk_size,
+                2 * max(args.workers, 1),
+                errors,
+                progress,
+            )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if errors is not None:
+                errors.close()
+            await async_engine.dispose()
+
+    result = asyncio.run(run())
+    print(
+        f"\nImported {result.imported} calculations, rejected {result.rejected}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
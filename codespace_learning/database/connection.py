@@ -1,22 +1,159 @@
-"""Database connection and session management."""
+"""Database connection and session management.
 
+The API endpoints use the async engine through :func:`get_db`, so waiting on
+the database never blocks the event loop. The sync engine is kept for schema
+creation and command-line scripts.
+
+Environment variables:
+
+- ``DATABASE_URL``: SQLAlchemy URL of the database
+- ``ASYNC_DATABASE_URL``: URL for the async engine; derived from
+  ``DATABASE_URL`` by default (``psycopg`` for PostgreSQL, ``aiosqlite`` for
+  SQLite)
+- ``DB_POOL_SIZE``: connections kept open per engine (default 5)
+- ``DB_MAX_OVERFLOW``: extra connections allowed under load (default 10)
+- ``DB_POOL_TIMEOUT``: seconds to wait for a free connection (default 30)
+- ``DB_POOL_RECYCLE``: seconds after which connections are replaced
+  (default -1, never)
+- ``DB_POOL_PRE_PING``: test connections before use (default true)
+- ``DB_POOL_WARM``: connections the API opens at startup (default
+  ``DB_POOL_SIZE``, or 1 for SQLite); see :func:`warm_pool`
+"""
+
+import asyncio
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, AsyncIterator, Dict, Type
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import Pool
+
+from ..metrics import metrics
+
+DATABASE_URL = os.getenv(
+    "DATABASE_URL", "postgresql+psycopg://postgres@localhost/calculator_db"
+)
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` with its driver replaced by an asyncio-capable one."""
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def pool_options(url: str) -> Dict[str, Any]:
+    """Connection pool settings from the ``DB_POOL_*`` environment variables.
+
+    SQLite uses SQLAlchemy's default pools, which don't take sizing options.
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower()
+        in ("1", "true", "yes", "on"),
+    }
+
+
+@lru_cache(maxsize=None)
+def _timed_pool_class(pool_class: Type[Pool]) -> Type[Pool]:
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                if metrics.enabled:
+                    metrics.pool_checkout.observe(perf_counter() - start)
 
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg://postgres@localhost/calculator_db")
+    TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{pool_class.__name__}"
+    return TimedPool
 
-engine = create_engine(DATABASE_URL)
+
+def instrument_pool(engine) -> None:
+    """Record connection checkout times of ``engine`` in the shared metrics.
+
+    The pool keeps its class (and its timing) when ``dispose()`` replaces it.
+    """
+    pool = engine.pool
+    pool.__class__ = _timed_pool_class(type(pool))
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL)
+)
+instrument_pool(async_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
+POOL_WARM = int(
+    os.getenv(
+        "DB_POOL_WARM",
+        pool_options(ASYNC_DATABASE_URL).get("pool_size", 1),
+    )
+)
+
+
+async def warm_pool(engine: AsyncEngine, connections: int = POOL_WARM) -> None:
+    """Open ``connections`` connections at once and return them to the pool.
+
+    Each one runs ``SELECT 1``, so the first requests find connected,
+    authenticated connections instead of paying for the handshake.
+
+    Raises
+    ------
+    Exception
+        The first connection error; connections already opened are returned.
+    """
+
+    async def checkout() -> AsyncConnection:
+        conn = await engine.connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    results = await asyncio.gather(
+        *(checkout() for _ in range(connections)), return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    if errors:
+        raise errors[0]
+
 
-def get_db():
+async def get_db() -> AsyncIterator[AsyncSession]:
     """Get database session."""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
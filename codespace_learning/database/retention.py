@@ -0,0 +1,236 @@
+"""
+Retention of the calculation history with local archival.
+
+The ``calculations`` table is treated as a rolling window of
+``CALCULATOR_RETENTION_DAYS`` days (default 30), one partition per UTC day.
+The retention job moves every day older than the window into a gzip-compressed
+NDJSON file under ``CALCULATOR_ARCHIVE_DIR`` (default ``archive``) and deletes
+its rows, so the table and its indexes stop growing with the age of the
+service::
+
+    archive-calculations --days 30
+
+Archive files are named ``calculations-YYYY-MM-DD.ndjson.gz``; rows of a day
+that arrive after it was archived go to ``calculations-YYYY-MM-DD.N.ndjson.gz``.
+A file is complete before the rows are deleted, so a failed run can leave a
+row both archived and in the table but never loses one; readers skip such
+duplicates. ``GET /calculator/history?include_archived=true`` reads the
+archives after the table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import LargeBinary, delete, func, select
+
+from ..models.calculation import Calculation
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv("CALCULATOR_RETENTION_DAYS", "30"))
+ARCHIVE_DIR = Path(os.getenv("CALCULATOR_ARCHIVE_DIR", "archive"))
+
+_FILE_PREFIX = "calculations-"
+_FILE_SUFFIX = ".ndjson.gz"
+# Rows fetched from the database per round-trip while archiving.
+_FETCH_SIZE = 10_000
+
+_table = Calculation.__table__
+_binary_columns = {
+    column.key for column in _table.columns if isinstance(column.type, LargeBinary)
+}
+# Columns added later (e.g. hit_count) are missing from older archives.
+_scalar_defaults = [
+    column
+    for column in _table.columns
+    if column.default is not None and column.default.is_scalar
+]
+
+
+def _encode(row: Any) -> str:
+    record: Dict[str, Any] = {}
+    for key, value in row._mapping.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif key in _binary_columns and value is not None:
+            value = base64.b64encode(value).decode()
+        record[key] = value
+    return json.dumps(record, separators=(",", ":"))
+
+
+def _decode(line: bytes) -> Calculation:
+    record = json.loads(line)
+    if record.get("created_at") is not None:
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+    for key in _binary_columns:
+        if record.get(key) is not None:
+            record[key] = base64.b64decode(record[key])
+    for column in _scalar_defaults:
+        if record.get(column.key) is None:
+            record[column.key] = column.default.arg
+    return Calculation(**record)
+
+
+def _day_files(archive_dir: Path, day: date) -> List[Path]:
+    pattern = f"{_FILE_PREFIX}{day.isoformat()}*{_FILE_SUFFIX}"
+    return sorted(archive_dir.glob(pattern))
+
+
+def archived_days(archive_dir: Optional[Path] = None) -> List[date]:
+    """Return the days with archive files, newest first."""
+    archive_dir = archive_dir or ARCHIVE_DIR
+    days = set()
+    for path in archive_dir.glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"):
+        try:
+            days.add(date.fromisoformat(path.name[len(_FILE_PREFIX) :][:10]))
+        except ValueError:
+            continue
+    return sorted(days, reverse=True)
+
+
+def archive_day(engine, day: date, archive_dir: Optional[Path] = None) -> int:
+    """Move the rows created on ``day`` into an archive file.
+
+    Uses a sync ``engine``. Returns the number of rows archived.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    start = datetime.combine(day, time.min)
+    window = (_table.c.created_at >= start) & (
+        _table.c.created_at < start + timedelta(days=1)
+    )
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    existing = _day_files(archive_dir, day)
+    name = f"{_FILE_PREFIX}{day.isoformat()}"
+    if existing:
+        name += f".{len(existing)}"
+    path = archive_dir / f"{name}{_FILE_SUFFIX}"
+    partial = path.with_name(path.name + ".partial")
+
+    count, last_id = 0, None
+    with engine.connect() as conn:
+        rows = conn.execution_options(
+            stream_results=True, yield_per=_FETCH_SIZE
+        ).execute(select(_table).where(window).order_by(_table.c.id))
+        with gzip.open(partial, "wt", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(_encode(row) + "\n")
+                count, last_id = count + 1, row.id
+        if count == 0:
+            partial.unlink()
+            return 0
+        with open(partial, "rb") as archive:
+            os.fsync(archive.fileno())
+        partial.replace(path)
+        # Rows inserted into this day while archiving stay for the next run.
+        conn.execute(delete(_table).where(window, _table.c.id <= last_id))
+        conn.commit()
+    logger.info(f"Archived {count} calculations from {day} to {path}")
+    return count
+
+
+def run_retention(
+    engine,
+    retention_days: int = RETENTION_DAYS,
+    archive_dir: Optional[Path] = None,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """Archive every day older than ``retention_days``.
+
+    Returns the number of archived rows per day (ISO date).
+
+    Raises
+    ------
+    ValueError
+        If ``retention_days`` is negative.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if retention_days < 0:
+        raise ValueError("Retention must be zero or more days")
+    cutoff = (now or datetime.utcnow()).date() - timedelta(days=retention_days)
+    with engine.connect() as conn:
+        oldest = conn.scalar(select(func.min(_table.c.created_at)))
+    archived: Dict[str, int] = {}
+    if oldest is None:
+        return archived
+    day = oldest.date()
+    while day < cutoff:
+        archived[day.isoformat()] = archive_day(engine, day, archive_dir)
+        day += timedelta(days=1)
+    return archived
+
+
+def _iter_day(archive_dir: Path, day: date) -> Iterator[Calculation]:
+    for path in _day_files(archive_dir, day):
+        with gzip.open(path, "rb") as archive:
+            for line in archive:
+                yield _decode(line)
+
+
+def read_archived(
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    operation: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    archive_dir: Optional[Path] = None,
+) -> List[Calculation]:
+    """Return up to ``limit`` archived calculations, newest first.
+
+    Filters work like :func:`codespace_learning.api.history.history_query`;
+    ``before`` is the ``(created_at, id)`` key rows must sort below. Whole days
+    are read, so this is meant for occasional access to old history.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    found: List[Calculation] = []
+    seen = set()
+    for day in archived_days(archive_dir):
+        day_start = datetime.combine(day, time.min)
+        if until is not None and day_start >= until:
+            continue
+        if since is not None and day_start + timedelta(days=1) <= since:
+            break
+        if before is not None and day_start > before[0]:
+            continue
+        for calculation in _iter_day(archive_dir, day):
+            key = (calculation.created_at, calculation.id)
+            if (
+                calculation.id in seen
+                or (operation is not None and calculation.operation != operation)
+                or (since is not None and calculation.created_at < since)
+                or (until is not None and calculation.created_at >= until)
+                or (before is not None and key >= before)
+            ):
+                continue
+            seen.add(calculation.id)
+            found.append(calculation)
+        if len(found) >= limit:
+            break
+    found.sort(key=lambda c: (c.created_at, c.id), reverse=True)
+    return found[:limit]
+
+
+def main() -> None:
+    """Archive calculations older than the retention window."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    from .connection import engine
+
+    archived = run_retention(engine, args.days, args.archive_dir)
+    total = sum(archived.values())
+    print(f"Archived {total} calculations from {len(archived)} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Content-addressed reuse of stored calculation results.
+
+Every calculation is already stored, so a repeated request can be answered
+from the ``calculations`` table instead of being computed again. Each stored
+row gets a ``result_key``: the SHA-256 of the operation name and its operands
+canonicalised to float64, so ``2`` and ``2.0`` are the same operand. A unique
+index on the key finds the earlier row in one lookup.
+
+Modes, set with ``CALCULATOR_REUSE``:
+
+- ``off`` (default): compute and store every request
+- ``lookup``: answer from the stored result when one exists, but still add a
+  history row for every request
+- ``collapse``: answer with the stored row itself and increment its
+  ``hit_count``, so repeated traffic no longer grows the table
+
+Both reuse modes add one indexed query per request, which pays off for
+``factorial``, ``power`` and large ``median`` inputs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from array import array
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.calculation import Calculation
+from ..operands import pack_operands
+from .rollups import rollup_recorder
+
+REUSE_MODES = ("off", "lookup", "collapse")
+
+# Integers above this may not survive the float64 round trip.
+_MAX_EXACT_INT = 2**53
+
+
+def _canonical(value: Any) -> bytes:
+    if isinstance(value, (list, tuple)):
+        try:
+            values = array("d", value)
+        except (TypeError, OverflowError):
+            # Nested lists or integers beyond the float range.
+            values = None
+        # Pack the whole list at once unless it may hold inexact integers.
+        if values is not None and (
+            not values or max(max(values), -min(values)) < _MAX_EXACT_INT
+        ):
+            return b"A%d:" % len(value) + pack_operands(values, compression=None)
+        return b"L%d:" % len(value) + b"".join(_canonical(item) for item in value)
+    if isinstance(value, int) and abs(value) > _MAX_EXACT_INT:
+        return b"I%d;" % value
+    return b"N" + pack_operands([value], compression=None)
+
+
+def result_key(operation: str, operands: Sequence[Any]) -> str:
+    """Return the hex SHA-256 identifying ``operation`` applied to ``operands``.
+
+    ``operands`` holds numbers or lists of numbers, in call order.
+    """
+    digest = hashlib.sha256(operation.encode())
+    digest.update(b"\0")
+    digest.update(_canonical(list(operands)))
+    return digest.hexdigest()
+
+
+class ResultReuse:
+    """Looks up and counts reuses of stored calculations."""
+
+    def __init__(self, mode: str = "off") -> None:
+        if mode not in REUSE_MODES:
+            raise ValueError(f"Unknown reuse mode: {mode!r}")
+        self.mode = mode
+
+    @classmethod
+    def from_env(cls) -> ResultReuse:
+        """Build from the ``CALCULATOR_REUSE`` environment variable."""
+        return cls(os.getenv("CALCULATOR_REUSE", "off").lower())
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def collapse(self) -> bool:
+        return self.mode == "collapse"
+
+    def key(self, operation: str, operands: Sequence[Any]) -> Optional[str]:
+        """Return the result key, or ``None`` when reuse is off."""
+        return result_key(operation, operands) if self.enabled else None
+
+    async def lookup(
+        self, db: AsyncSession, key: Optional[str]
+    ) -> Optional[Calculation]:
+        """Return the stored calculation with this key, if any."""
+        if key is None:
+            return None
+        return await db.scalar(select(Calculation).where(Calculation.result_key == key))
+
+    async def record_hit(
+        self, db: AsyncSession, calculation: Calculation
+    ) -> Calculation:
+        """Count one more request answered by ``calculation``."""
+        hit_count = await db.scalar(
+            update(Calculation)
+            .where(Calculation.id == calculation.id)
+            .values(hit_count=Calculation.hit_count + 1)
+            .returning(Calculation.hit_count)
+        )
+        entries = [(calculation.operation, None, calculation.result)]
+        await rollup_recorder.in_transaction(db, entries)
+        await db.commit()
+        await rollup_recorder.after_commit(entries)
+        calculation.hit_count = hit_count
+        return calculation
+
+
+# Shared reuse settings used by the API endpoints.
+result_reuse = ResultReuse.from_env()
@@ -0,0 +1,384 @@
+"""
+Incrementally maintained analytics rollups of the calculation history.
+
+Every stored calculation adds to one row of ``calculation_rollups`` keyed by
+operation and minute. Dashboard queries then read at most one row per
+operation and minute of the requested range, however many calculations are
+stored.
+
+The row of the current minute is hot: every request for that operation adds
+to it. ``CALCULATOR_ROLLUPS`` picks how writes reach it:
+
+- ``buffered`` (default): committed calculations are added up in memory and
+  upserted every ``CALCULATOR_ROLLUP_FLUSH_INTERVAL`` seconds (default 1), by
+  the first request after the interval and before every analytics query.
+  Counts not yet flushed are lost if the process dies.
+- ``sync``: upsert in the same transaction as the calculation, so the
+  rollups are always exact, at the price of row-lock contention under load
+- ``off``: no upserts; rebuild the rollups periodically instead::
+
+    python -m codespace_learning.database.rollups --since 2024-05-01T00:00
+
+Rebuilt rollups count the hits of a collapsed calculation (see
+:mod:`codespace_learning.database.reuse`) at the time of its first request.
+Archived days (see :mod:`codespace_learning.database.retention`) are no
+longer in the table, so a rebuild never goes back further than the day
+after the newest archive.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal_column, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from ..models.calculation import Calculation, CalculationRollup
+from .connection import async_engine
+from .retention import archived_days
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MODES = ("buffered", "sync", "off")
+
+_table = CalculationRollup.__table__
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Return the start of the minute containing ``moment``."""
+    return moment.replace(second=0, microsecond=0)
+
+
+def rollup_deltas(
+    entries: Iterable[Tuple[str, Optional[datetime], Any]]
+) -> List[Dict[str, Any]]:
+    """Aggregate ``(operation, created_at, result)`` entries per rollup row.
+
+    A missing ``created_at`` counts as now. Deltas are sorted by key, so
+    concurrent upserts lock rollup rows in the same order.
+    """
+    now = datetime.utcnow()
+    totals: Dict[Tuple[str, datetime], List[float]] = defaultdict(lambda: [0, 0.0])
+    for operation, created_at, result in entries:
+        total = totals[(operation, bucket_start(created_at or now))]
+        total[0] += 1
+        total[1] += float(result)
+    return [
+        {
+            "operation": operation,
+            "bucket_start": bucket,
+            "count": count,
+            "result_sum": result_sum,
+        }
+        for (operation, bucket), (count, result_sum) in sorted(totals.items())
+    ]
+
+
+async def apply_rollups(
+    conn, entries: Iterable[Tuple[str, Optional[datetime], Any]]
+) -> None:
+    """Add ``entries`` to the rollups within the caller's transaction.
+
+    ``conn`` is an ``AsyncSession`` or ``AsyncConnection``.
+    """
+    await _upsert(conn, rollup_deltas(entries))
+
+
+async def _upsert(conn, deltas: List[Dict[str, Any]]) -> None:
+    if not deltas:
+        return
+    bind = conn if isinstance(conn, AsyncConnection) else conn.get_bind()
+    dialect = bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        statement = module.insert(_table).values(deltas)
+        await conn.execute(
+            statement.on_conflict_do_update(
+                index_elements=[_table.c.operation, _table.c.bucket_start],
+                set_={
+                    "count": _table.c.count + statement.excluded.count,
+                    "result_sum": _table.c.result_sum + statement.excluded.result_sum,
+                },
+            )
+        )
+        return
+    for delta in deltas:
+        updated = await conn.execute(
+            update(_table)
+            .where(
+                _table.c.operation == delta["operation"],
+                _table.c.bucket_start == delta["bucket_start"],
+            )
+            .values(
+                count=_table.c.count + delta["count"],
+                result_sum=_table.c.result_sum + delta["result_sum"],
+            )
+        )
+        if updated.rowcount == 0:
+            await conn.execute(insert(_table).values(**delta))
+
+
+class RollupRecorder:
+    """Keeps the rollups up to date in the configured ``CALCULATOR_ROLLUPS`` mode.
+
+    Writers call :meth:`in_transaction` before committing a calculation and
+    :meth:`after_commit` once it is committed; each does nothing in the modes
+    it does not serve.
+    """
+
+    def __init__(
+        self, engine, mode: str = "buffered", flush_interval: float = 1.0
+    ) -> None:
+        if mode not in ROLLUP_MODES:
+            raise ValueError(f"Unknown rollup mode: {mode!r}")
+        self.engine = engine
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self._totals: Dict[Tuple[str, datetime], List[float]] = {}
+        self._last_flush = monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls, engine) -> RollupRecorder:
+        """Build from ``CALCULATOR_ROLLUPS`` and ``CALCULATOR_ROLLUP_FLUSH_INTERVAL``."""
+        return cls(
+            engine,
+            mode=os.getenv("CALCULATOR_ROLLUPS", "buffered").lower(),
+            flush_interval=float(os.getenv("CALCULATOR_ROLLUP_FLUSH_INTERVAL", "1")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    async def in_transaction(
+        self, conn, entries: Iterable[Tuple[str, Optional[datetime], Any]]
+    ) -> None:
+        """In ``sync`` mode, add ``entries`` within the caller's transaction."""
+        if self.mode == "sync":
+            await apply_rollups(conn, entries)
+
+    async def after_commit(
+        self, entries: Iterable[Tuple[str, Optional[datetime], Any]]
+    ) -> None:
+        """In ``buffered`` mode, add committed ``entries`` to the buffer.
+
+        Flushes the buffer when ``flush_interval`` has passed since the last
+        flush.
+        """
+        if self.mode != "buffered":
+            return
+        for delta in rollup_deltas(entries):
+            total = self._totals.setdefault(
+                (delta["operation"], delta["bucket_start"]), [0, 0.0]
+            )
+            total[0] += delta["count"]
+            total[1] += delta["result_sum"]
+        due = monotonic() - self._last_flush >= self.flush_interval
+        # A flush already running will be followed by the next due one.
+        if due and not self._flush_lock().locked():
+            await self.flush()
+
+    def _flush_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        return self._lock
+
+    async def flush(self) -> None:
+        """Upsert the buffered deltas in one transaction.
+
+        Waits for a flush already running, so the deltas buffered before the
+        call are committed when it returns. A failed flush is logged and its
+        deltas are kept for the next one.
+        """
+        async with self._flush_lock():
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._totals:
+            return
+        totals, self._totals = self._totals, {}
+        deltas = [
+            {
+                "operation": operation,
+                "bucket_start": bucket,
+                "count": count,
+                "result_sum": result_sum,
+            }
+            for (operation, bucket), (count, result_sum) in sorted(totals.items())
+        ]
+        try:
+            async with self.engine.begin() as conn:
+                await _upsert(conn, deltas)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(deltas)} rollup rows: {e}")
+            for key, (count, result_sum) in totals.items():
+                total = self._totals.setdefault(key, [0, 0.0])
+                total[0] += count
+                total[1] += result_sum
+        else:
+            self.flushes += 1
+        finally:
+            self._last_flush = monotonic()
+
+
+def _minute_expression(dialect: str):
+    created_at = Calculation.__table__.c.created_at
+    if dialect == "postgresql":
+        return func.date_trunc("minute", created_at)
+    if dialect == "sqlite":
+        # SQLAlchemy stores SQLite datetimes in this text format.
+        return func.strftime("%Y-%m-%d %H:%M:00.000000", created_at)
+    raise ValueError(f"Rebuilding rollups is not supported on {dialect}")
+
+
+def rebuild_start(
+    since: Optional[datetime] = None, archive_dir: Optional[Path] = None
+) -> Optional[datetime]:
+    """Return where a rebuild from ``since`` may start.
+
+    Buckets of archived days can only be counted from the rollups, so the
+    rebuild starts no earlier than the day after the newest archive.
+    """
+    days = archived_days(archive_dir)
+    if not days:
+        return since
+    start = datetime.combine(days[0] + timedelta(days=1), time.min)
+    if since is not None and since > start:
+        return since
+    return start
+
+
+def rebuild_rollups(
+    engine, since: Optional[datetime] = None, archive_dir: Optional[Path] = None
+) -> int:
+    """Recompute the rollups from ``calculations`` with a sync ``engine``.
+
+    Only buckets from ``since`` on are rebuilt when given. Buckets up to the
+    newest day in ``archive_dir`` are always kept, see :func:`rebuild_start`.
+    Returns the number of rollup rows written.
+
+    Raises
+    ------
+    ValueError
+        If the database is neither PostgreSQL nor SQLite.
+    """
+    calculations = Calculation.__table__
+    minute = _minute_expression(engine.dialect.name)
+    query = select(
+        calculations.c.operation,
+        minute.label("bucket_start"),
+        func.sum(calculations.c.hit_count).label("count"),
+        func.coalesce(
+            func.sum(calculations.c.result * calculations.c.hit_count), 0.0
+        ).label("result_sum"),
+    ).where(calculations.c.operation.is_not(None))
+    clear = delete(_table)
+    since = rebuild_start(since, archive_dir)
+    if since is not None:
+        since = bucket_start(since)
+        query = query.where(calculations.c.created_at >= since)
+        clear = clear.where(_table.c.bucket_start >= since)
+    query = query.group_by(calculations.c.operation, literal_column("bucket_start"))
+    with engine.begin() as conn:
+        conn.execute(clear)
+        result = conn.execute(
+            insert(_table).from_select(
+                ["operation", "bucket_start", "count", "result_sum"], query
+            )
+        )
+        return result.rowcount
+
+
+async def operation_summary(
+    db, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Count and mean result per operation, optionally within a time range."""
+    query = select(
+        _table.c.operation,
+        func.sum(_table.c.count).label("count"),
+        func.sum(_table.c.result_sum).label("result_sum"),
+    )
+    if since is not None:
+        query = query.where(_table.c.bucket_start >= bucket_start(since))
+    if until is not None:
+        query = query.where(_table.c.bucket_start < until)
+    query = query.group_by(_table.c.operation).order_by(_table.c.operation)
+    rows = (await db.execute(query)).all()
+    return [
+        {
+            "operation": row.operation,
+            "count": row.count,
+            "mean_result": row.result_sum / row.count if row.count else None,
+        }
+        for row in rows
+    ]
+
+
+async def throughput(
+    db,
+    since: datetime,
+    until: datetime,
+    interval: int = 1,
+    operation: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Requests per ``interval`` minutes between ``since`` and ``until``.
+
+    Intervals without requests are left out.
+    """
+    query = select(_table.c.bucket_start, func.sum(_table.c.count).label("count"))
+    query = query.where(
+        _table.c.bucket_start >= bucket_start(since), _table.c.bucket_start < until
+    )
+    if operation is not None:
+        query = query.where(_table.c.operation == operation)
+    query = query.group_by(_table.c.bucket_start).order_by(_table.c.bucket_start)
+
+    origin = bucket_start(since)
+    step = timedelta(minutes=interval)
+    counts: Dict[datetime, int] = {}
+    for row in await db.execute(query):
+        bucket = origin + step * ((row.bucket_start - origin) // step)
+        counts[bucket] = counts.get(bucket, 0) + row.count
+    return [
+        {"bucket_start": bucket, "count": count} for bucket, count in counts.items()
+    ]
+
+
+# Shared recorder used by everything that stores calculations.
+rollup_recorder = RollupRecorder.from_env(async_engine)
+
+
+def main() -> None:
+    """Rebuild the analytics rollups from the calculation history."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="only rebuild buckets from this UTC time on (ISO format)",
+    )
+    args = parser.parse_args()
+
+    from .connection import engine
+
+    start = rebuild_start(args.since)
+    rows = rebuild_rollups(engine, args.since)
+    if start is not None and start != args.since:
+        print(f"Kept the rollups of archived days, before {start.isoformat()}")
+    print(f"Rebuilt {rows} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Creation of the database schema outside the API process.
+
+The API creates missing tables at startup unless ``CALCULATOR_CREATE_SCHEMA``
+is off. With several workers or frequent restarts, run this once per deploy
+instead and switch startup creation off::
+
+    create-schema
+"""
+
+from ..models.calculation import Calculation, CalculationRollup  # noqa: F401
+from .connection import Base
+
+
+def create_schema(engine) -> None:
+    """Create all missing tables and indexes with a sync ``engine``."""
+    Base.metadata.create_all(bind=engine)
+
+
+def main() -> None:
+    """Create the calculator tables in ``DATABASE_URL``."""
+    from .connection import engine
+
+    create_schema(engine)
+    print(f"Schema ready in {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main()
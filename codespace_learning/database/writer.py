@@ -0,0 +1,406 @@
+"""
+Write-behind persistence of calculation history.
+
+By default every calculation is committed (and re-read) before the API
+responds, so database latency is part of every request. With write-behind
+enabled, :class:`CalculationWriter` assigns the row an ID from a pre-allocated
+block, queues it and lets a background task insert queued rows in batches,
+either when ``flush_size`` rows are waiting or ``flush_interval`` seconds after
+the first one arrived.
+
+The durability level decides when a request gets its response:
+
+- ``commit`` (default): after the batch containing the row is committed. One
+  commit is shared by every request in the batch (group commit).
+- ``memory``: as soon as the row is queued. Rows still queued when the process
+  dies are lost; failed batches are only logged.
+
+With result reuse (:mod:`codespace_learning.database.reuse`), a queued row
+can carry the ``result_key`` of a row stored after the request looked for it.
+Such a row is stored without the key (``lookup``), or counted as a hit of the
+stored row (``collapse``, where its own ID is then never stored).
+
+Environment variables:
+
+- ``CALCULATOR_WRITE_BEHIND``: ``1`` to enable (default off)
+- ``CALCULATOR_WRITE_DURABILITY``: ``commit`` or ``memory``
+- ``CALCULATOR_WRITE_FLUSH_SIZE``: rows per batch insert (default 500)
+- ``CALCULATOR_WRITE_FLUSH_INTERVAL``: seconds before a partial batch is
+  written (default 0.05)
+- ``CALCULATOR_WRITE_QUEUE_SIZE``: queued rows above which new writes wait
+  (default 10,000)
+- ``CALCULATOR_WRITE_ID_BLOCK``: IDs reserved per database round-trip
+  (default 1000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, Table, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..models.calculation import Calculation
+from .connection import async_engine
+from .reuse import ResultReuse, result_reuse
+from .rollups import RollupRecorder, rollup_recorder
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_LEVELS = ("commit", "memory")
+
+
+class IdAllocator:
+    """Hands out primary keys for a table in blocks.
+
+    On PostgreSQL the block is drawn from the table's own ``SERIAL`` sequence,
+    so IDs never collide with rows inserted elsewhere. Other databases have no
+    sequences; there the block starts after the highest ID used so far, which is
+    only safe while this process is the table's sole writer (as for the SQLite
+    development setup).
+    """
+
+    def __init__(self, engine: AsyncEngine, table: Table, block_size: int = 1000):
+        if block_size < 1:
+            raise ValueError("ID block size must be at least 1")
+        self.engine = engine
+        self.table = table
+        self.block_size = block_size
+        self._ids: Deque[int] = deque()
+        self._last_id: Optional[int] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def allocate(self, count: int) -> List[int]:
+        """Return ``count`` unused IDs."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        async with self._lock:
+            if len(self._ids) < count:
+                self._ids.extend(
+                    await self._reserve(max(count - len(self._ids), self.block_size))
+                )
+            return [self._ids.popleft() for _ in range(count)]
+
+    async def _reserve(self, count: int) -> List[int]:
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name == "postgresql":
+                result = await conn.execute(
+                    text(
+                        "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                        "FROM generate_series(1, :count)"
+                    ),
+                    {"table": self.table.name, "count": count},
+                )
+                return list(result.scalars())
+            if self._last_id is None:
+                self._last_id = (
+                    await conn.scalar(select(func.max(self.table.c.id))) or 0
+                )
+                if self.engine.dialect.name == "sqlite" and await conn.scalar(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")
+                ):
+                    # AUTOINCREMENT remembers ids of deleted (archived) rows.
+                    sequence = await conn.scalar(
+                        text("SELECT seq FROM sqlite_sequence WHERE name = :table"),
+                        {"table": self.table.name},
+                    )
+                    self._last_id = max(self._last_id, sequence or 0)
+        first = self._last_id + 1
+        self._last_id += count
+        return list(range(first, first + count))
+
+
+class CalculationWriter:
+    """Queues calculation rows and batch-inserts them in the background."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        enabled: bool = False,
+        durability: str = "commit",
+        flush_size: int = 500,
+        flush_interval: float = 0.05,
+        max_pending: int = 10_000,
+        id_block_size: int = 1000,
+        reuse: Optional[ResultReuse] = None,
+        rollups: Optional[RollupRecorder] = None,
+    ) -> None:
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {durability!r}")
+        if flush_size < 1 or max_pending < 1:
+            raise ValueError("Flush size and queue size must be at least 1")
+        self.engine = engine
+        self.enabled = enabled
+        self.durability = durability
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.reuse = reuse
+        self.rollups = rollups
+        self.table: Table = Calculation.__table__
+        self.ids = IdAllocator(engine, self.table, id_block_size)
+        self.written_rows = 0
+        self.failed_rows = 0
+        self.batches = 0
+        self._float_columns = [
+            column.key
+            for column in self.table.columns
+            if isinstance(column.type, Float)
+        ]
+        self._scalar_defaults = [
+            column
+            for column in self.table.columns
+            if column.default is not None and column.default.is_scalar
+        ]
+        self._insert = self._insert_statement()
+        self._groups: Deque[Tuple[List[Dict[str, Any]], Optional[asyncio.Future]]] = (
+            deque()
+        )
+        self._pending_rows = 0
+        self._closing = False
+        self._flushing = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+
+    @classmethod
+    def from_env(cls, engine: AsyncEngine) -> CalculationWriter:
+        """Build a writer configured from ``CALCULATOR_WRITE_*`` variables."""
+        return cls(
+            engine,
+            enabled=os.getenv("CALCULATOR_WRITE_BEHIND", "").lower()
+            in ("1", "true", "yes", "on"),
+            durability=os.getenv("CALCULATOR_WRITE_DURABILITY", "commit"),
+            flush_size=int(os.getenv("CALCULATOR_WRITE_FLUSH_SIZE", "500")),
+            flush_interval=float(os.getenv("CALCULATOR_WRITE_FLUSH_INTERVAL", "0.05")),
+            max_pending=int(os.getenv("CALCULATOR_WRITE_QUEUE_SIZE", "10000")),
+            id_block_size=int(os.getenv("CALCULATOR_WRITE_ID_BLOCK", "1000")),
+            reuse=result_reuse,
+            rollups=rollup_recorder,
+        )
+
+    async def submit(self, row: Calculation) -> Calculation:
+        """Queue one calculation; see :meth:`submit_many`."""
+        return (await self.submit_many([row]))[0]
+
+    async def submit_many(self, rows: Sequence[Calculation]) -> List[Calculation]:
+        """Assign IDs to ``rows`` and queue them for insertion.
+
+        The rows are returned with ``id`` and ``created_at`` filled in and
+        their float columns converted the way the database would store them.
+        All rows of one call are written in the same batch.
+
+        Raises
+        ------
+        ValueError
+            If a value cannot be stored as a float.
+        Exception
+            With ``commit`` durability, whatever the batch insert raised.
+        """
+        if not rows:
+            return []
+        values = [self._values(row) for row in rows]
+        for row, row_id, row_values in zip(
+            rows, await self.ids.allocate(len(rows)), values
+        ):
+            row_values["id"] = row_id
+            for key, value in row_values.items():
+                setattr(row, key, value)
+
+        self._start()
+        async with self._space:
+            await self._space.wait_for(lambda: self._pending_rows < self.max_pending)
+        future = (
+            asyncio.get_running_loop().create_future()
+            if self.durability == "commit"
+            else None
+        )
+        if not self._groups:
+            self._wakeup.set()
+        self._groups.append((values, future))
+        self._pending_rows += len(values)
+        if self._pending_rows >= self.flush_size:
+            self._wakeup.set()
+        if future is not None:
+            await future
+        return list(rows)
+
+    def _values(self, row: Calculation) -> Dict[str, Any]:
+        values = {
+            column.key: getattr(row, column.key)
+            for column in self.table.columns
+            if column.key != "id"
+        }
+        if values.get("created_at") is None:
+            values["created_at"] = datetime.utcnow()
+        for column in self._scalar_defaults:
+            if values[column.key] is None:
+                values[column.key] = column.default.arg
+        for key in self._float_columns:
+            if values[key] is not None:
+                try:
+                    values[key] = float(values[key])
+                except OverflowError:
+                    raise ValueError(f"{key} is too large to store") from None
+        return values
+
+    def _insert_statement(self):
+        # Rows repeating a stored result_key are skipped and returned by
+        # _resolve_conflicts; any other conflict fails the batch.
+        dialect = getattr(self.engine, "dialect", None)
+        if dialect is not None and dialect.name in ("postgresql", "sqlite"):
+            module = postgresql if dialect.name == "postgresql" else sqlite
+            return (
+                module.insert(self.table)
+                .on_conflict_do_nothing(index_elements=[self.table.c.result_key])
+                .returning(self.table.c.id)
+            )
+        return insert(self.table)
+
+    async def _insert_rows(
+        self, conn, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Insert ``rows`` and return those stored or counted as hits."""
+        result = await conn.execute(self._insert, rows)
+        if not result.returns_rows:
+            return rows
+        inserted = set(result.scalars())
+        if len(inserted) == len(rows):
+            return rows
+        written = [row for row in rows if row["id"] in inserted]
+        skipped = [row for row in rows if row["id"] not in inserted]
+        return written + await self._resolve_conflicts(conn, skipped)
+
+    async def _resolve_conflicts(
+        self, conn, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Store rows whose ``result_key`` is taken; return those written."""
+        if self.reuse is None or not self.reuse.collapse:
+            await conn.execute(
+                insert(self.table), [{**row, "result_key": None} for row in rows]
+            )
+            return rows
+        hits = Counter()
+        for row in rows:
+            hits[row["result_key"]] += row["hit_count"]
+        counted = set()
+        for key, count in sorted(hits.items()):
+            updated = await conn.execute(
+                update(self.table)
+                .where(self.table.c.result_key == key)
+                .values(hit_count=self.table.c.hit_count + count)
+            )
+            if updated.rowcount:
+                counted.add(key)
+        return [row for row in rows if row["result_key"] in counted]
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (tests): the old task is gone.
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._groups or not self._closing:
+            if not self._groups:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            if not (
+                self._pending_rows >= self.flush_size or self._closing or self._flushing
+            ):
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._write_batch()
+
+    async def _write_batch(self) -> None:
+        rows: List[Dict[str, Any]] = []
+        futures: List[asyncio.Future] = []
+        while self._groups and (not rows or len(rows) < self.flush_size):
+            values, future = self._groups.popleft()
+            rows.extend(values)
+            if future is not None:
+                futures.append(future)
+        try:
+            async with self.engine.begin() as conn:
+                written = await self._insert_rows(conn, rows)
+                entries = [
+                    (row["operation"], row["created_at"], row["result"])
+                    for row in written
+                ]
+                if self.rollups is not None:
+                    await self.rollups.in_transaction(conn, entries)
+        except Exception as e:
+            self.failed_rows += len(rows)
+            logger.error(f"Failed to write {len(rows)} calculations: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.written_rows += len(rows)
+            self.batches += 1
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+            if self.rollups is not None:
+                await self.rollups.after_commit(entries)
+        self._pending_rows -= len(rows)
+        async with self._space:
+            self._space.notify_all()
+
+    async def flush(self) -> None:
+        """Write everything queued so far and wait for it."""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._flushing += 1
+        try:
+            self._wakeup.set()
+            async with self._space:
+                await self._space.wait_for(lambda: self._pending_rows == 0)
+        finally:
+            self._flushing -= 1
+
+    async def close(self) -> None:
+        """Drain the queue and stop the background task."""
+        task = self._task
+        if task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._closing = True
+        self._wakeup.set()
+        await task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return configuration, queue length and write counters."""
+        return {
+            "enabled": self.enabled,
+            "durability": self.durability,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+            "pending_rows": self._pending_rows,
+            "written_rows": self.written_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+        }
+
+
+# Shared writer used by the API endpoints.
+calculation_writer = CalculationWriter.from_env(async_engine)
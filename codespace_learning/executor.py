@@ -0,0 +1,258 @@
+"""
+Cost-aware execution of calculator functions from async endpoints.
+
+All endpoints are ``async def``; a large ``factorial`` or ``power`` called
+inline holds the event loop, and with it every other request on the worker.
+:class:`OperationExecutor` estimates the cost of a call from its arguments,
+runs cheap calls inline and sends expensive ones to a process (or thread)
+pool. Big-integer arithmetic holds the GIL, so only a process pool keeps the
+event loop responsive; a thread pool is mostly useful for tests. Expensive
+list summaries always run on threads: pickling a list over to a worker
+process takes about as long as summarising it.
+
+Environment variables:
+
+- ``CALCULATOR_POOL_KIND``: ``process`` (default) or ``thread``
+- ``CALCULATOR_POOL_SIZE``: number of workers (default: CPU count)
+- ``CALCULATOR_OFFLOAD_THRESHOLD``: estimated cost (roughly the size in bits
+  of a big-integer result, see :func:`estimate_cost`) above which calls are
+  offloaded (default 100,000, about 3 ms of work: ``factorial(8000)``, the
+  median of 50,000 numbers or the average of 500,000)
+
+Every call is also checked against the budgets of an
+:class:`~codespace_learning.admission.AdmissionController` before it runs:
+over the per-request limit it is rejected, and offloaded calls hold part of
+the worker budget while they run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from math import log2
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from . import calculator
+from .admission import AdmissionController, admission_controller
+from .cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _factorial_cost(n: Any) -> float:
+    n = int(n) if isinstance(n, (int, float)) else 0
+    return n * log2(n) if n > 1 else 0.0
+
+
+def _power_cost(base: Any, exponent: Any) -> float:
+    # Float powers are a single libm call; integer powers build big integers
+    # of roughly exponent * bit_length(base) bits, unless the base is 0 or 1.
+    if (
+        isinstance(base, int)
+        and isinstance(exponent, int)
+        and exponent > 0
+        and abs(base) > 1
+    ):
+        return float(exponent * abs(base).bit_length())
+    return 1.0
+
+
+# Cost per number of the list summaries. Near the offload threshold one unit
+# of big-integer cost is about 30 ns; summing takes about 6 ns per number and
+# selecting a median or percentiles (introselect, O(n)) about 60 ns.
+_SUM_COST = 0.2
+_SELECTION_COST = 2.0
+
+
+def _sum_cost(numbers: Any) -> float:
+    return _SUM_COST * len(numbers)
+
+
+def _selection_cost(numbers: Any, *rest: Any) -> float:
+    return _SELECTION_COST * len(numbers)
+
+
+_COST_ESTIMATORS: Dict[Callable[..., Any], Callable[..., float]] = {
+    calculator.factorial: _factorial_cost,
+    calculator.power: _power_cost,
+    calculator.calculate_average: _sum_cost,
+    calculator.calculate_median: _selection_cost,
+    calculator.calculate_percentiles: _selection_cost,
+}
+
+# Functions offloaded to threads whatever the pool kind: their arguments are
+# large lists, which cost about as much to pickle as to summarise, and
+# numpy's selection releases the GIL while it runs.
+_THREADED = frozenset(
+    (
+        calculator.calculate_average,
+        calculator.calculate_median,
+        calculator.calculate_percentiles,
+    )
+)
+
+
+def estimate_cost(func: Callable[..., Any], *args: Any) -> float:
+    """Estimate the work needed for ``func(*args)``.
+
+    The unit is roughly "bits of big-integer result": the factorial of ``n``
+    has about ``n * log2(n)`` bits and ``b ** e`` about ``e * bit_length(b)``
+    bits. List summaries are weighted by their CPU time per number: the
+    average of ``n`` numbers costs ``0.2 * n`` and the median or percentiles
+    ``2 * n``. Functions without an estimator cost ``1``.
+    """
+    estimator = _COST_ESTIMATORS.get(func)
+    if estimator is None:
+        return 1.0
+    try:
+        return estimator(*args)
+    except (TypeError, ValueError, OverflowError):
+        # Let the calculator function itself report invalid arguments.
+        return 1.0
+
+
+class OperationExecutor:
+    """Runs calculator calls inline or in a worker pool depending on cost."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        offload_threshold: float = 100_000,
+        kind: str = "process",
+        admission: Optional[AdmissionController] = None,
+    ) -> None:
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown pool kind: {kind!r}")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.offload_threshold = offload_threshold
+        self.kind = kind
+        self.admission = admission
+        self.inline_calls = 0
+        self.offloaded_calls = 0
+        self.queue_depth = 0
+        self._pool: Optional[Executor] = None
+        self._thread_pool: Optional[Executor] = None
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> OperationExecutor:
+        """Build an executor configured from ``CALCULATOR_POOL_*`` variables."""
+        size = os.getenv("CALCULATOR_POOL_SIZE")
+        return cls(
+            max_workers=int(size) if size else None,
+            offload_threshold=float(
+                os.getenv("CALCULATOR_OFFLOAD_THRESHOLD", "100000")
+            ),
+            kind=os.getenv("CALCULATOR_POOL_KIND", "process"),
+            admission=admission_controller,
+        )
+
+    def _get_pool(self, func: Callable[..., Any]) -> Executor:
+        if func in _THREADED and self.kind == "process":
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="calculator",
+                    )
+                return self._thread_pool
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="calculator",
+                    )
+                logger.info(f"Started {self.kind} pool with {self.max_workers} workers")
+            return self._pool
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        cache: Optional[ResultCache] = None,
+        cost: Optional[float] = None,
+    ) -> T:
+        """Return ``func(*args)``, offloading it when it is expensive.
+
+        When ``cache`` is given it is consulted before anything runs and
+        updated with the result afterwards. ``cost`` overrides
+        :func:`estimate_cost` for calls whose cost the arguments don't show.
+
+        Raises
+        ------
+        CostLimitExceeded
+            If the call is over the per-request cost limit.
+        Overloaded
+            If an offloaded call does not fit in the worker budget in time.
+        """
+        if cache is not None:
+            found, value = cache.lookup(func, args)
+            if found:
+                return value
+        if cost is None:
+            cost = estimate_cost(func, *args)
+        name = getattr(func, "__name__", "operation")
+        if self.admission is not None:
+            self.admission.check(name, cost)
+        if cost < self.offload_threshold:
+            self.inline_calls += 1
+            result = func(*args)
+        elif self.admission is not None:
+            async with self.admission.reserve(name, cost):
+                result = await self._offload(func, *args)
+        else:
+            result = await self._offload(func, *args)
+        if cache is not None:
+            cache.store(func, args, result)
+        return result
+
+    async def _offload(self, func: Callable[..., T], *args: Any) -> T:
+        self.offloaded_calls += 1
+        self.queue_depth += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool(func)
+            return await loop.run_in_executor(pool, partial(func, *args))
+        finally:
+            self.queue_depth -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool configuration and call counters.
+
+        ``queue_depth`` is the number of offloaded calls currently waiting for
+        or running on a worker; ``admission`` holds the admission budgets and
+        counters.
+        """
+        stats = {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "offload_threshold": self.offload_threshold,
+            "queue_depth": self.queue_depth,
+            "inline_calls": self.inline_calls,
+            "offloaded_calls": self.offloaded_calls,
+        }
+        if self.admission is not None:
+            stats["admission"] = self.admission.stats()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pools (they are recreated on the next offloaded call)."""
+        with self._lock:
+            pools = (self._pool, self._thread_pool)
+            self._pool = self._thread_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+# Shared executor used by the API endpoints.
+operation_executor = OperationExecutor.from_env()
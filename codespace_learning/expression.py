@@ -0,0 +1,219 @@
+"""
+Safe arithmetic expression evaluation on top of the calculator functions.
+
+Expressions use Python syntax restricted to numbers, variable names, the
+operators ``+ - * / % **`` and calls to a fixed set of calculator functions:
+
+    >>> compile_expression("sqrt(x) * 2 + percentage(25, whole)").evaluate(
+    ...     {"x": 16, "whole": 200}
+    ... )
+    20.5
+
+Parsing happens once per distinct expression text: compiled expressions are
+kept in an LRU cache, so re-evaluating the same formula with different variable
+bindings only walks the pre-built closure tree.
+
+``**`` and ``factorial`` are checked against the per-request cost limit of
+:mod:`codespace_learning.admission` before they run, so a short expression
+such as ``10 ** 10 ** 9`` is rejected instead of computed. The API
+evaluates expressions that use them on the operation executor (see
+:func:`evaluation_cost`), so they don't hold up the event loop.
+"""
+
+from __future__ import annotations
+
+import ast
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Mapping, Union
+
+from . import calculator
+from .admission import admission_controller
+from .executor import estimate_cost, operation_executor
+
+Number = Union[int, float]
+
+# Longer expressions are rejected before parsing.
+MAX_EXPRESSION_LENGTH = 1000
+# Deeper expressions are rejected while compiling; evaluation recurses once
+# per level, so this also bounds the stack depth of evaluate().
+MAX_NESTING_DEPTH = 200
+# Number of compiled expressions kept in the LRU cache.
+EXPRESSION_CACHE_SIZE = 512
+
+
+class InvalidExpression(ValueError):
+    """An expression that cannot be parsed, compiled or bound."""
+
+
+_Node = Callable[[Mapping[str, Number]], Number]
+
+
+def _power(base: Number, exponent: Number) -> Number:
+    admission_controller.check("power", estimate_cost(calculator.power, base, exponent))
+    try:
+        result = calculator.power(base, exponent)
+    except ZeroDivisionError as e:
+        raise calculator.DivisionByZero(f"Invalid power operation: {e}") from e
+    except OverflowError as e:
+        raise calculator.InvalidResult(f"Invalid power operation: {e}") from e
+    if isinstance(result, complex):
+        raise calculator.InvalidResult("Power operation produced a complex number")
+    return result
+
+
+def _factorial(*args: Number) -> int:
+    admission_controller.check("factorial", estimate_cost(calculator.factorial, *args))
+    return calculator.factorial(*args)
+
+
+_BINARY_OPERATORS: Dict[type, Callable[[Number, Number], Number]] = {
+    ast.Add: calculator.add,
+    ast.Sub: calculator.subtract,
+    ast.Mult: calculator.multiply,
+    ast.Div: calculator.divide,
+    ast.Mod: calculator.modulo,
+    ast.Pow: _power,
+}
+
+_FUNCTIONS: Dict[str, Callable[..., Number]] = {
+    "sqrt": calculator.sqrt,
+    "factorial": _factorial,
+    "percentage": calculator.percentage,
+    "average": lambda *numbers: calculator.calculate_average(numbers),
+    "median": lambda *numbers: calculator.calculate_median(numbers),
+}
+
+
+class CompiledExpression:
+    """A parsed, validated expression ready to be evaluated repeatedly."""
+
+    __slots__ = ("text", "variables", "heavy", "_root")
+
+    def __init__(
+        self, text: str, variables: FrozenSet[str], root: _Node, heavy: bool = False
+    ) -> None:
+        self.text = text
+        self.variables = variables
+        # Whether the expression uses ``**`` or ``factorial``.
+        self.heavy = heavy
+        self._root = root
+
+    def evaluate(self, variables: Mapping[str, Number] | None = None) -> Number:
+        """Evaluate the expression with the given variable bindings.
+
+        Raises
+        ------
+        ValueError
+            If a variable is unbound or a calculator operation fails.
+        """
+        bindings = variables or {}
+        missing = self.variables.difference(bindings)
+        if missing:
+            raise InvalidExpression(f"Unbound variables: {', '.join(sorted(missing))}")
+        return self._root(bindings)
+
+    def __repr__(self) -> str:
+        return f"<CompiledExpression({self.text!r})>"
+
+
+def _compile(node: ast.AST, names: set[str], depth: int = 0) -> _Node:
+    """Turn an AST node into a closure, rejecting anything not whitelisted."""
+    if depth > MAX_NESTING_DEPTH:
+        raise InvalidExpression(
+            f"Expression is nested too deeply (more than {MAX_NESTING_DEPTH} levels)"
+        )
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise InvalidExpression(f"Unsupported constant: {value!r}")
+        return lambda _: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        names.add(name)
+        return lambda bindings: bindings[name]
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile(node.operand, names, depth + 1)
+        if isinstance(node.op, ast.USub):
+            return lambda bindings: -operand(bindings)
+        return operand
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        operation = _BINARY_OPERATORS[type(node.op)]
+        left = _compile(node.left, names, depth + 1)
+        right = _compile(node.right, names, depth + 1)
+        return lambda bindings: operation(left(bindings), right(bindings))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise InvalidExpression(f"Unsupported function: {ast.unparse(node.func)}")
+        if node.keywords:
+            raise InvalidExpression("Keyword arguments are not supported")
+        function = _FUNCTIONS[node.func.id]
+        args = [_compile(arg, names, depth + 1) for arg in node.args]
+
+        def call(bindings: Mapping[str, Number]) -> Number:
+            try:
+                return function(*(arg(bindings) for arg in args))
+            except TypeError as e:
+                raise InvalidExpression(str(e)) from e
+
+        return call
+
+    raise InvalidExpression(f"Unsupported syntax: {ast.unparse(node)}")
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """Parse and compile ``text``; results are cached by expression text.
+
+    Raises
+    ------
+    InvalidExpression
+        If the expression is too long, nested too deeply, malformed or uses
+        unsupported syntax.
+    """
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise InvalidExpression(
+            f"Expression longer than {MAX_EXPRESSION_LENGTH} characters"
+        )
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise InvalidExpression(f"Invalid expression: {e.msg}") from e
+    except (RecursionError, MemoryError) as e:
+        raise InvalidExpression("Expression is nested too deeply") from e
+    names: set[str] = set()
+    root = _compile(tree.body, names)
+    heavy = any(
+        isinstance(node, ast.BinOp)
+        and isinstance(node.op, ast.Pow)
+        or isinstance(node, ast.Call)
+        and node.func.id == "factorial"
+        for node in ast.walk(tree)
+    )
+    return CompiledExpression(text, frozenset(names), root, heavy)
+
+
+def evaluate(text: str, variables: Mapping[str, Number] | None = None) -> Number:
+    """Compile (or fetch from cache) and evaluate ``text``."""
+    return compile_expression(text).evaluate(variables)
+
+
+def evaluation_cost(text: str) -> float:
+    """Estimated cost of evaluating ``text``, for the operation executor.
+
+    The operands of ``**`` and ``factorial`` are only known while evaluating,
+    so an expression using them costs the executor's offload threshold and
+    runs off the event loop; each call is still checked against the
+    per-request limit as it runs. Other expressions cost ``1``.
+
+    Raises
+    ------
+    ValueError
+        If the expression does not compile.
+    """
+    if compile_expression(text).heavy:
+        return operation_executor.offload_threshold
+    return 1.0
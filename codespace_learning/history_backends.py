@@ -0,0 +1,346 @@
+"""
+Pluggable storage for the calculation history.
+
+A :class:`HistoryBackend` records calculations and serves them back by ID or
+as keyset-paginated pages, newest first, as plain dicts shaped like
+``CalculationResponse``. Two backends are available:
+
+- :class:`RingBufferHistory`: the most recent ``capacity`` calculations in
+  preallocated arrays, for nodes without a database. Memory use is fixed
+  (about 50 bytes per slot plus expression text), lookups by ID are a single
+  index operation and readers never take a lock.
+- :class:`SQLAlchemyHistory`: the ``calculations`` table, through the same
+  queries as the database-backed API.
+
+The shared :data:`history_backend`, used by the simple API, is picked with
+environment variables:
+
+- ``CALCULATOR_HISTORY_BACKEND``: ``memory`` (default) or ``sqlalchemy``
+- ``CALCULATOR_HISTORY_CAPACITY``: calculations kept in memory (default 10,000)
+"""
+
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from .api.cursors import decode_cursor, encode_cursor
+
+Record = Dict[str, Any]
+Page = Tuple[List[Record], Optional[str]]
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _stored_float(name: str, value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except OverflowError:
+        raise ValueError(f"{name} is too large to store") from None
+
+
+class HistoryBackend(ABC):
+    """Stores calculations and serves them by ID or page."""
+
+    @classmethod
+    def from_env(cls) -> HistoryBackend:
+        """Build the backend named by ``CALCULATOR_HISTORY_BACKEND``.
+
+        Raises
+        ------
+        ValueError
+            If the backend name is unknown.
+        """
+        name = os.getenv("CALCULATOR_HISTORY_BACKEND", "memory").lower()
+        if name == "memory":
+            capacity = int(os.getenv("CALCULATOR_HISTORY_CAPACITY", "10000"))
+            return RingBufferHistory(capacity)
+        if name == "sqlalchemy":
+            return SQLAlchemyHistory()
+        raise ValueError(f"Unknown history backend: {name!r}")
+
+    @abstractmethod
+    async def add(
+        self,
+        operation: str,
+        result: Any,
+        operand1: Any = None,
+        operand2: Any = None,
+        operands_list: Optional[str] = None,
+    ) -> Record:
+        """Store a calculation and return it with ``id`` and ``created_at``.
+
+        Raises
+        ------
+        ValueError
+            If a number cannot be stored as a float.
+        """
+
+    @abstractmethod
+    async def get(self, calculation_id: int) -> Optional[Record]:
+        """Return the calculation with this ID, or ``None``."""
+
+    @abstractmethod
+    async def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        operation: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Page:
+        """Return up to ``limit`` calculations, newest first, and the next cursor.
+
+        Filters and cursors work like
+        :func:`codespace_learning.api.history.history_query`; the cursor is
+        ``None`` on the last page.
+
+        Raises
+        ------
+        ValueError
+            If ``cursor`` is malformed.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the backend name and its counters."""
+        return {"backend": type(self).__name__}
+
+
+class RingBufferHistory(HistoryBackend):
+    """The latest ``capacity`` calculations in fixed-size arrays.
+
+    Calculation ``n`` lives in slot ``(n - 1) % capacity`` until calculation
+    ``n + capacity`` overwrites it. Writers serialise on a short lock; a slot's
+    ID is cleared while it is rewritten and re-checked after every read, so
+    readers never see a half-written calculation. ``created_at`` never
+    decreases with the ID, which keeps ID order and history order the same.
+    """
+
+    def __init__(self, capacity: int = 10_000) -> None:
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+        self.capacity = capacity
+        self._ids = array("q", bytes(8 * capacity))
+        self._operations = array("B", bytes(capacity))
+        self._operand1 = array("d", bytes(8 * capacity))
+        self._operand2 = array("d", bytes(8 * capacity))
+        self._results = array("d", bytes(8 * capacity))
+        # Bit 0: operand1 present, bit 1: operand2 present.
+        self._present = array("B", bytes(capacity))
+        self._created_at = array("q", bytes(8 * capacity))
+        self._texts: List[Optional[str]] = [None] * capacity
+        self._names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._last_id = 0
+        self._last_created_at = 0
+        self._lock = Lock()
+
+    def _code(self, operation: str) -> int:
+        code = self._codes.get(operation)
+        if code is None:
+            if len(self._names) == 256:
+                raise ValueError("Too many distinct operations to store")
+            code = self._codes[operation] = len(self._names)
+            self._names.append(operation)
+        return code
+
+    def _store(
+        self,
+        operation: str,
+        result: Any,
+        operand1: Any,
+        operand2: Any,
+        operands_list: Optional[str],
+    ) -> int:
+        result = _stored_float("result", result)
+        operand1 = _stored_float("operand1", operand1)
+        operand2 = _stored_float("operand2", operand2)
+        now = (datetime.utcnow() - _EPOCH) // _MICROSECOND
+        with self._lock:
+            code = self._code(operation)
+            calculation_id = self._last_id + 1
+            slot = (calculation_id - 1) % self.capacity
+            self._ids[slot] = 0
+            self._operations[slot] = code
+            self._operand1[slot] = 0.0 if operand1 is None else operand1
+            self._operand2[slot] = 0.0 if operand2 is None else operand2
+            self._present[slot] = (operand1 is not None) | ((operand2 is not None) << 1)
+            self._results[slot] = result
+            self._last_created_at = max(now, self._last_created_at)
+            self._created_at[slot] = self._last_created_at
+            self._texts[slot] = operands_list
+            self._ids[slot] = self._last_id = calculation_id
+        return calculation_id
+
+    def _read(self, calculation_id: int) -> Optional[Record]:
+        if not 0 < calculation_id <= self._last_id:
+            return None
+        slot = (calculation_id - 1) % self.capacity
+        if self._ids[slot] != calculation_id:
+            return None
+        present = self._present[slot]
+        record = {
+            "id": calculation_id,
+            "operation": self._names[self._operations[slot]],
+            "operand1": self._operand1[slot] if present & 1 else None,
+            "operand2": self._operand2[slot] if present & 2 else None,
+            "operands_list": self._texts[slot],
+            "result": self._results[slot],
+            "created_at": _EPOCH + self._created_at[slot] * _MICROSECOND,
+            "hit_count": 1,
+        }
+        # Overwritten while we were reading: the calculation is gone.
+        if self._ids[slot] != calculation_id:
+            return None
+        return record
+
+    async def add(
+        self,
+        operation: str,
+        result: Any,
+        operand1: Any = None,
+        operand2: Any = None,
+        operands_list: Optional[str] = None,
+    ) -> Record:
+        calculation_id = self._store(
+            operation, result, operand1, operand2, operands_list
+        )
+        record = self._read(calculation_id)
+        if record is None:
+            # Only possible when ``capacity`` newer calculations raced past.
+            raise ValueError("History buffer overwritten before the read back")
+        return record
+
+    async def get(self, calculation_id: int) -> Optional[Record]:
+        return self._read(calculation_id)
+
+    async def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        operation: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Page:
+        newest = self._last_id
+        if cursor is not None:
+            before_id = decode_cursor(cursor)[1]
+            newest = min(newest, before_id - 1)
+        oldest = max(self._last_id - self.capacity + 1, 1)
+        records: List[Record] = []
+        for calculation_id in range(newest, oldest - 1, -1):
+            record = self._read(calculation_id)
+            if record is None:
+                continue
+            if since is not None and record["created_at"] < since:
+                break
+            if (until is not None and record["created_at"] >= until) or (
+                operation is not None and record["operation"] != operation
+            ):
+                continue
+            if len(records) == limit:
+                last = records[-1]
+                return records, encode_cursor(last["created_at"], last["id"])
+            records.append(record)
+        return records, None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "capacity": self.capacity,
+            "size": min(self._last_id, self.capacity),
+            "last_id": self._last_id,
+            "evicted": max(self._last_id - self.capacity, 0),
+        }
+
+
+class SQLAlchemyHistory(HistoryBackend):
+    """The ``calculations`` table, through an async session factory.
+
+    Database modules are imported on first use, so choosing another backend
+    never needs SQLAlchemy or a database driver.
+    """
+
+    def __init__(self, session_factory=None) -> None:
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from .database.connection import AsyncSessionLocal
+
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def add(
+        self,
+        operation: str,
+        result: Any,
+        operand1: Any = None,
+        operand2: Any = None,
+        operands_list: Optional[str] = None,
+    ) -> Record:
+        from .api.history import history_records
+        from .database.rollups import rollup_recorder
+        from .models.calculation import Calculation
+
+        calculation = Calculation(
+            operation=operation,
+            operand1=_stored_float("operand1", operand1),
+            operand2=_stored_float("operand2", operand2),
+            operands_list=operands_list,
+            result=_stored_float("result", result),
+        )
+        entries = [(operation, None, calculation.result)]
+        async with self._session() as db:
+            db.add(calculation)
+            await rollup_recorder.in_transaction(db, entries)
+            await db.commit()
+            await db.refresh(calculation)
+        await rollup_recorder.after_commit(entries)
+        return history_records([calculation])[0]
+
+    async def get(self, calculation_id: int) -> Optional[Record]:
+        from sqlalchemy import select
+
+        from .api.history import HISTORY_COLUMNS, history_records
+        from .models.calculation import Calculation
+
+        async with self._session() as db:
+            row = (
+                await db.execute(
+                    select(*HISTORY_COLUMNS).where(Calculation.id == calculation_id)
+                )
+            ).first()
+        return None if row is None else history_records([row])[0]
+
+    async def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        operation: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Page:
+        from .api.history import history_query, history_records
+
+        query = history_query(limit + 1, cursor, operation, since, until)
+        async with self._session() as db:
+            rows = (await db.execute(query)).all()
+        if len(rows) <= limit:
+            return history_records(rows), None
+        last = rows[limit - 1]
+        return history_records(rows[:limit]), encode_cursor(last.created_at, last.id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlalchemy"}
+
+
+# Shared history used by the simple API.
+history_backend = HistoryBackend.from_env()
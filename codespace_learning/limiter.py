@@ -0,0 +1,369 @@
+"""
+Adaptive concurrency limiting and load shedding.
+
+Under a burst, every accepted request competes for the same event loop,
+worker pool and database sessions, and latency climbs for all of them until
+clients time out. :class:`ConcurrencyLimitMiddleware` caps the requests in
+flight at an adaptive limit and queues the rest:
+
+- The limit follows latency (AIMD). Each completed request is compared with
+  the usual latency of its route, a baseline that drops straight to fast
+  responses and rises slowly. While responses stay within ``tolerance``
+  times their baseline (smoothed over recent requests) and the limit is in
+  use, it grows by one per ``limit`` requests. Once they are slower it
+  shrinks by 10%, at most every 100 ms.
+- Requests over the limit wait in a bounded queue for up to
+  ``queue_timeout`` seconds. A full queue, or a request still waiting at its
+  deadline, is answered at once with ``503 Service Unavailable`` and a
+  ``Retry-After`` header.
+- Routes have priorities. ``/health``, ``/health/ready`` and ``/metrics``
+  bypass the limiter. Heavy routes (``power``, ``factorial``, the list
+  statistics, ``evaluate``, ``batch`` and the history export) may use only
+  ``heavy_share`` of the limit; everything else, such as ``add`` or a
+  history page, is served first from the queue and takes the place of a
+  queued heavy request when the queue is full.
+
+Environment variables:
+
+- ``CALCULATOR_LIMITER_ENABLED``: ``0``/``false`` to accept every request
+  (default true)
+- ``CALCULATOR_CONCURRENCY_LIMIT``: initial limit (default 20)
+- ``CALCULATOR_MAX_CONCURRENCY``: the highest limit (default 200)
+- ``CALCULATOR_LATENCY_TOLERANCE``: slowdown over the baseline at which the
+  limit shrinks (default 2.0)
+- ``CALCULATOR_HEAVY_SHARE``: fraction of the limit heavy routes may use
+  (default 0.5)
+- ``CALCULATOR_HEAVY_ROUTES``: comma-separated path prefixes of heavy routes
+- ``CALCULATOR_QUEUE_SIZE``: requests allowed to wait (default 100)
+- ``CALCULATOR_QUEUE_TIMEOUT``: seconds a request may wait (default 2)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from bisect import insort
+from itertools import count
+from math import ceil
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from .metrics import metrics
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+# Request priorities; lower values are served first.
+CHEAP = 0
+HEAVY = 1
+PRIORITY_NAMES = ("cheap", "heavy")
+
+EXEMPT_PATHS = ("/health", "/health/ready", "/metrics")
+HEAVY_ROUTES = (
+    "/calculator/power",
+    "/calculator/factorial",
+    "/calculator/average",
+    "/calculator/median",
+    "/calculator/evaluate",
+    "/calculator/batch",
+    "/calculator/history/export",
+)
+
+MIN_LIMIT = 1
+# Multiplicative decrease, and the shortest time between two decreases.
+BACKOFF = 0.9
+DECREASE_INTERVAL = 0.1
+# Smoothing of the latency ratio, and how fast route baselines follow
+# faster and slower responses.
+RATIO_SMOOTHING = 0.1
+BASELINE_DOWN = 0.2
+BASELINE_UP = 0.01
+# Routes with their own baseline; others share one.
+MAX_BASELINES = 500
+
+
+class Shed(Exception):
+    """A request was not admitted; ``reason`` is ``queue_full`` or ``timeout``."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "order", "loop", "future", "state")
+
+    def __init__(self, priority: int, order: int) -> None:
+        self.priority = priority
+        self.order = order
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.state = "waiting"
+
+    def wake(self, state: str) -> None:
+        self.state = state
+        # Waiters may belong to other event loops (e.g. test client portals).
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(_set_done, self.future)
+
+
+def _set_done(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _sort_key(waiter: _Waiter) -> tuple:
+    return (waiter.priority, waiter.order)
+
+
+class ConcurrencyLimiter:
+    """An adaptive limit on requests in flight, with a priority queue."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        initial_limit: int = 20,
+        max_limit: int = 200,
+        tolerance: float = 2.0,
+        heavy_share: float = 0.5,
+        heavy_routes: Sequence[str] = HEAVY_ROUTES,
+        queue_size: int = 100,
+        queue_timeout: float = 2.0,
+    ) -> None:
+        if not MIN_LIMIT <= initial_limit <= max_limit:
+            raise ValueError(
+                f"The initial limit must be between {MIN_LIMIT} and max_limit"
+            )
+        self.enabled = enabled
+        self.limit = float(initial_limit)
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.heavy_share = heavy_share
+        self.heavy_routes = tuple(heavy_routes)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = [0, 0]
+        self.shed = 0
+        self._ratio = 1.0
+        self._last_decrease = 0.0
+        self._baselines: Dict[str, float] = {}
+        self._waiters: List[_Waiter] = []
+        self._order = count()
+        self._lock = Lock()
+        metrics.concurrency_limit.set(int(self.limit))
+
+    @classmethod
+    def from_env(cls) -> ConcurrencyLimiter:
+        """Build a limiter configured from ``CALCULATOR_*`` variables."""
+        enabled = os.getenv("CALCULATOR_LIMITER_ENABLED", "true").lower()
+        routes = os.getenv("CALCULATOR_HEAVY_ROUTES")
+        return cls(
+            enabled=enabled in _TRUE_VALUES,
+            initial_limit=int(os.getenv("CALCULATOR_CONCURRENCY_LIMIT", "20")),
+            max_limit=int(os.getenv("CALCULATOR_MAX_CONCURRENCY", "200")),
+            tolerance=float(os.getenv("CALCULATOR_LATENCY_TOLERANCE", "2.0")),
+            heavy_share=float(os.getenv("CALCULATOR_HEAVY_SHARE", "0.5")),
+            heavy_routes=(
+                [route.strip() for route in routes.split(",") if route.strip()]
+                if routes is not None
+                else HEAVY_ROUTES
+            ),
+            queue_size=int(os.getenv("CALCULATOR_QUEUE_SIZE", "100")),
+            queue_timeout=float(os.getenv("CALCULATOR_QUEUE_TIMEOUT", "2")),
+        )
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds a shed client is asked to wait before retrying."""
+        return max(1, ceil(self.queue_timeout))
+
+    def priority(self, path: str) -> Optional[int]:
+        """Return the priority of ``path``, or ``None`` if it bypasses the limit."""
+        if path in EXEMPT_PATHS:
+            return None
+        for route in self.heavy_routes:
+            if path == route or path.startswith(route + "/"):
+                return HEAVY
+        return CHEAP
+
+    def _fits(self, priority: int) -> bool:
+        limit = int(self.limit)
+        if sum(self.in_flight) >= limit:
+            return False
+        if priority == HEAVY:
+            return self.in_flight[HEAVY] < max(1, int(limit * self.heavy_share))
+        return True
+
+    def _shed(self, priority: int, reason: str) -> Shed:
+        self.shed += 1
+        if metrics.enabled:
+            metrics.shed.inc(PRIORITY_NAMES[priority], reason)
+        return Shed(reason)
+
+    def _queue_changed(self) -> None:
+        if metrics.enabled:
+            for priority, name in enumerate(PRIORITY_NAMES):
+                queued = sum(w.priority == priority for w in self._waiters)
+                metrics.queued.set(queued, name)
+
+    async def acquire(self, priority: int) -> None:
+        """Wait for a slot for a request of ``priority``.
+
+        Raises
+        ------
+        Shed
+            If the queue is full or no slot frees up within ``queue_timeout``.
+        """
+        with self._lock:
+            queued_ahead = any(w.priority <= priority for w in self._waiters)
+            if not queued_ahead and self._fits(priority):
+                self.in_flight[priority] += 1
+                return
+            if len(self._waiters) >= self.queue_size:
+                # Make room by shedding the newest waiter of lower priority.
+                victim = self._waiters[-1] if self._waiters else None
+                if victim is None or victim.priority <= priority:
+                    raise self._shed(priority, "queue_full")
+                self._waiters.pop()
+                self._shed(victim.priority, "queue_full")
+                victim.wake("shed")
+            waiter = _Waiter(priority, next(self._order))
+            insort(self._waiters, waiter, key=_sort_key)
+            self._queue_changed()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Cancelled while queued (e.g. the client went away).
+            with self._lock:
+                if waiter.state == "waiting":
+                    self._waiters.remove(waiter)
+                    self._queue_changed()
+                    waiter.state = "cancelled"
+            if waiter.state == "granted":
+                self.release(priority)
+            raise
+        with self._lock:
+            if waiter.state == "granted":
+                return
+            if waiter.state == "waiting":
+                self._waiters.remove(waiter)
+                self._queue_changed()
+                raise self._shed(priority, "timeout")
+        raise Shed("queue_full")
+
+    def release(
+        self, priority: int, route: Optional[str] = None, latency: float = 0.0
+    ) -> None:
+        """Free the slot of a finished request and adapt the limit.
+
+        ``route`` and ``latency`` describe the request; without a route the
+        limit is left unchanged.
+        """
+        with self._lock:
+            self.in_flight[priority] -= 1
+            if route is not None:
+                self._adapt(route, latency)
+            # Waiters are sorted by priority, so the first that does not fit
+            # leaves no room for the rest.
+            granted = 0
+            while self._waiters and self._fits(self._waiters[0].priority):
+                waiter = self._waiters.pop(0)
+                self.in_flight[waiter.priority] += 1
+                waiter.wake("granted")
+                granted += 1
+            if granted:
+                self._queue_changed()
+
+    def _adapt(self, route: str, latency: float) -> None:
+        if route not in self._baselines and len(self._baselines) >= MAX_BASELINES:
+            route = "other"
+        baseline = self._baselines.get(route)
+        if baseline is None or baseline <= 0:
+            self._baselines[route] = latency
+            return
+        ratio = latency / baseline
+        rate = BASELINE_DOWN if latency < baseline else BASELINE_UP
+        self._baselines[route] = baseline + (latency - baseline) * rate
+        self._ratio += (ratio - self._ratio) * RATIO_SMOOTHING
+
+        now = monotonic()
+        if self._ratio > self.tolerance:
+            if now - self._last_decrease >= DECREASE_INTERVAL:
+                self._last_decrease = now
+                self.limit = max(float(MIN_LIMIT), self.limit * BACKOFF)
+        elif (sum(self.in_flight) + 1) * 2 >= self.limit:
+            # Grow only while the limit is in use.
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+        metrics.concurrency_limit.set(int(self.limit))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, queue and counters."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "limit": int(self.limit),
+                "in_flight": sum(self.in_flight),
+                "heavy_in_flight": self.in_flight[HEAVY],
+                "queued": len(self._waiters),
+                "queue_size": self.queue_size,
+                "shed": self.shed,
+                "latency_ratio": round(self._ratio, 3),
+            }
+
+
+class ConcurrencyLimitMiddleware:
+    """ASGI middleware admitting HTTP requests through a :class:`ConcurrencyLimiter`.
+
+    Requests that are not admitted get a JSON 503 with ``Retry-After``.
+    """
+
+    def __init__(self, app, limiter: Optional[ConcurrencyLimiter] = None) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send) -> None:
+        limiter = self.limiter or concurrency_limiter
+        priority = (
+            limiter.priority(scope["path"])
+            if scope["type"] == "http" and limiter.enabled
+            else None
+        )
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire(priority)
+        except Shed:
+            await _send_busy(send, limiter.retry_after)
+            return
+        route = None
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+            route = getattr(scope.get("route"), "path", "unmatched")
+        finally:
+            # Failed requests say nothing reliable about latency.
+            limiter.release(priority, route, perf_counter() - start)
+
+
+async def _send_busy(send, retry_after: int) -> None:
+    body = json.dumps({"detail": "Server is busy, try again later"}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# Shared limiter used by both apps.
+concurrency_limiter = ConcurrencyLimiter.from_env()
@@ -0,0 +1,345 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Both apps serve :meth:`Metrics.render` from ``/metrics``. The shared
+:data:`metrics` records:
+
+- ``calculator_http_requests_in_flight``: requests being handled
+- ``calculator_http_request_duration_seconds{method,route,status}``: latency
+  per route template (``/calculator/history/{calculation_id}``, not the raw
+  path), measured by :class:`MetricsMiddleware`
+- ``calculator_operation_duration_seconds{operation,phase}``: time spent in
+  the calculator function (``compute``, including any wait for the worker
+  pool) and storing the result (``db``)
+- ``calculator_operation_errors_total{operation,error}``: calculator
+  failures by exception class, such as ``DivisionByZero``,
+  ``InvalidOperand``, ``InvalidResult`` or ``CostLimitExceeded`` (messages
+  are left out: they can contain user input such as expression text)
+- ``calculator_db_pool_checkout_seconds``: time to get a connection from the
+  pool, including opening a new one
+- ``calculator_concurrency_limit``, ``calculator_requests_queued{priority}``
+  and ``calculator_requests_shed_total{priority,reason}``: the state of the
+  :mod:`codespace_learning.limiter`
+
+An observation is a dictionary lookup, a binary search over the buckets and
+an increment under a lock, about a microsecond; ``python -m
+benchmarks.bench_metrics`` measures the overhead per request. Each metric
+keeps at most ``max_series`` label combinations; further ones are counted
+under ``other``, so user input in a label cannot grow memory without bound.
+
+Environment variables:
+
+- ``CALCULATOR_METRICS_ENABLED``: ``0``/``false`` to stop recording
+  (default true); ``/metrics`` then only shows what was recorded before
+"""
+
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+# Seconds; from 100 µs (inline arithmetic) to 10 s (large offloaded work).
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 2**53:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = 500,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self._series: Dict[Labels, Any] = {}
+        self._other: Labels = ("other",) * len(self.labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Labels) -> Labels:
+        # Called with the lock held.
+        if labels in self._series or len(self._series) < self.max_series:
+            return labels
+        return self._other
+
+    def _label_text(self, labels: Labels, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(str(value))}"'
+            for name, value in zip(self.labelnames, labels)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Return the sample lines of every series."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A count that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        if not self.labelnames:
+            self._series[()] = 0.0
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._series.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [
+            f"{self.name}{self._label_text(labels)} {_format_value(value)}"
+            for labels, value in series
+        ]
+
+
+class Gauge(Counter):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._series[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    """Counts of observations per bucket, with their sum."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        max_series: int = 500,
+    ) -> None:
+        super().__init__(name, help, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum.
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return 0 if series is None else sum(series[:-1])
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(s)) for labels, s in self._series.items())
+        lines = []
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for labels, counts in series:
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                le = self._label_text(labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {total}")
+            text = self._label_text(labels)
+            lines.append(f"{self.name}_sum{text} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{text} {total}")
+        return lines
+
+
+class _OperationTimer:
+    """Times a block into ``calculator_operation_duration_seconds``."""
+
+    __slots__ = ("metrics", "operation", "phase", "start")
+
+    def __init__(self, metrics: Metrics, operation: str, phase: str) -> None:
+        self.metrics = metrics
+        self.operation = operation
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self.metrics.enabled:
+            return
+        self.metrics.operations.observe(
+            perf_counter() - self.start, self.operation, self.phase
+        )
+        if exc is not None and self.phase == "compute":
+            self.metrics.errors.inc(self.operation, exc_type.__name__)
+
+
+class Metrics:
+    """The metrics recorded by the API."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.in_flight = Gauge(
+            "calculator_http_requests_in_flight", "HTTP requests being handled."
+        )
+        self.requests = Histogram(
+            "calculator_http_request_duration_seconds",
+            "HTTP request latency by route template.",
+            ("method", "route", "status"),
+        )
+        self.operations = Histogram(
+            "calculator_operation_duration_seconds",
+            "Time in the calculator (compute) and storing results (db).",
+            ("operation", "phase"),
+        )
+        self.errors = Counter(
+            "calculator_operation_errors_total",
+            "Calculator failures by exception type.",
+            ("operation", "error"),
+        )
+        self.pool_checkout = Histogram(
+            "calculator_db_pool_checkout_seconds",
+            "Time to get a database connection from the pool.",
+        )
+        self.concurrency_limit = Gauge(
+            "calculator_concurrency_limit", "Adaptive limit on requests in flight."
+        )
+        self.queued = Gauge(
+            "calculator_requests_queued",
+            "Requests waiting for the concurrency limit.",
+            ("priority",),
+        )
+        self.shed = Counter(
+            "calculator_requests_shed_total",
+            "Requests answered 503 by the concurrency limiter.",
+            ("priority", "reason"),
+        )
+
+    @classmethod
+    def from_env(cls) -> Metrics:
+        """Build metrics configured from ``CALCULATOR_METRICS_ENABLED``."""
+        enabled = os.getenv("CALCULATOR_METRICS_ENABLED", "true").lower()
+        return cls(enabled=enabled in _TRUE_VALUES)
+
+    def operation(self, operation: str, phase: str) -> _OperationTimer:
+        """Context manager timing ``phase`` (``compute`` or ``db``) of ``operation``.
+
+        Exceptions raised in the ``compute`` phase are counted as errors.
+        """
+        return _OperationTimer(self, operation, phase)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        metrics = (
+            self.in_flight,
+            self.requests,
+            self.operations,
+            self.errors,
+            self.pool_checkout,
+            self.concurrency_limit,
+            self.queued,
+            self.shed,
+        )
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests and latency per route.
+
+    The route is the template of the matched route, read from the scope after
+    the app has handled the request; unmatched paths count as ``unmatched``.
+    """
+
+    def __init__(self, app, metrics: Optional[Metrics] = None) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send) -> None:
+        recorder = self.metrics or metrics
+        if scope["type"] != "http" or not recorder.enabled:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        recorder.in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            recorder.in_flight.dec()
+            route = scope.get("route")
+            recorder.requests.observe(
+                perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+
+
+# Shared metrics used by the API.
+metrics = Metrics.from_env()
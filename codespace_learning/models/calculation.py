@@ -1,7 +1,7 @@
 """Database models for calculations."""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, LargeBinary
 from ..database.connection import Base
 
 
@@ -9,14 +9,48 @@ class Calculation(Base):
     """Database model for storing calculation history."""
     
     __tablename__ = "calculations"
+    __table_args__ = (
+        # Keyset pagination of the history, optionally filtered by operation.
+        Index("ix_calculations_created_at_id", "created_at", "id"),
+        Index("ix_calculations_operation_created_at_id", "operation", "created_at", "id"),
+        # Result reuse: one stored row per distinct calculation.
+        Index("ix_calculations_result_key", "result_key", unique=True),
+        # Never reuse the ids of archived rows (see database/retention.py).
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     operation = Column(String, index=True)
     operand1 = Column(Float)
     operand2 = Column(Float, nullable=True)  # Some operations only need one operand
-    operands_list = Column(String, nullable=True)  # For operations like average/median
+    operands_list = Column(String, nullable=True)  # Expression text; list operands before packing
+    operands_blob = Column(LargeBinary, nullable=True)  # Packed float64 list (see operands.py)
     result = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Hash of operation and operands, set when result reuse is enabled.
+    result_key = Column(String(64), nullable=True)
+    hit_count = Column(Integer, nullable=False, default=1, server_default="1")
 
     def __repr__(self):
-        return f"<Calculation(id={self.id}, operation='{self.operation}', result={self.result})>"
\ No newline at end of file
+        return f"<Calculation(id={self.id}, operation='{self.operation}', result={self.result})>"
+
+
+class CalculationRollup(Base):
+    """Per-operation, per-minute aggregates of the calculation history.
+
+    Kept up to date on every write so dashboards never scan ``calculations``.
+    """
+
+    __tablename__ = "calculation_rollups"
+    __table_args__ = (Index("ix_calculation_rollups_bucket_start", "bucket_start"),)
+
+    operation = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # Start of the minute
+    count = Column(Integer, nullable=False, default=0)
+    result_sum = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return (
+            f"<CalculationRollup(operation='{self.operation}', "
+            f"bucket_start={self.bucket_start}, count={self.count})>"
+        )
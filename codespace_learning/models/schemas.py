@@ -1,8 +1,8 @@
 """Pydantic schemas for API requests and responses."""
 
 from datetime import datetime
-from typing import List, Optional, Union
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field
 
 Number = Union[int, float]
 
@@ -34,6 +34,12 @@ class ListOperationRequest(CalculationRequest):
     numbers: List[Number]
 
 
+class ExpressionRequest(CalculationRequest):
+    """Request for evaluating an arithmetic expression (evaluate)."""
+    expression: str
+    variables: Dict[str, Number] = {}
+
+
 class CalculationResponse(BaseModel):
     """Response for calculation results."""
     id: int
@@ -43,11 +49,59 @@ class CalculationResponse(BaseModel):
     operands_list: Optional[str] = None
     result: Number
     created_at: datetime
+    hit_count: int = 1
 
     class Config:
         from_attributes = True
 
 
+class StreamMedianResponse(CalculationResponse):
+    """Response for a streamed median.
+
+    ``approximate`` is true when the sketch had to compact values, in which
+    case the calculation is stored as ``median_approx``.
+    """
+    count: int
+    approximate: bool
+
+
+class BatchRequest(BaseModel):
+    """Request for running many operations at once.
+
+    Each item has the same shape as the request body of its operation's
+    endpoint, e.g. ``{"operation": "sqrt", "operand": 16}``.
+    """
+    operations: List[Dict[str, Any]] = Field(max_length=10_000)
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of a single batch item: either a calculation or an error."""
+    index: int
+    operation: Optional[str] = None
+    calculation: Optional[CalculationResponse] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """Response for a batch of calculations, in request order."""
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+
+class OperationSummary(BaseModel):
+    """Request count and mean result of one operation."""
+    operation: str
+    count: int
+    mean_result: Optional[float] = None
+
+
+class ThroughputPoint(BaseModel):
+    """Number of requests in one time interval."""
+    bucket_start: datetime
+    count: int
+
+
 class ErrorResponse(BaseModel):
     """Error response model."""
     error: str
@@ -0,0 +1,136 @@
+"""
+Compact binary encoding of list operands.
+
+Average and median calculations store their numbers in the
+``Calculation.operands_blob`` column as packed little-endian float64 values
+behind a one-byte header naming the codec:
+
+- ``F``: raw float64 values, 8 bytes per number
+- ``Z``: the same values compressed with zlib
+
+Uncompressed blobs can be read without copying through :func:`decode_operands`
+(a ``memoryview``) or :func:`operands_array` (``numpy.frombuffer``). Integers
+are stored as float64 like every other numeric column, so values beyond
+``2**53`` lose precision.
+
+Environment variables:
+
+- ``CALCULATOR_OPERANDS_COMPRESSION``: ``zlib`` to compress operand lists of
+  at least ``CALCULATOR_OPERANDS_COMPRESS_MIN_BYTES`` (default 4096); a blob
+  is only stored compressed when that makes it smaller (default ``none``)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import zlib
+from array import array
+from typing import Iterable, Optional, Union
+
+try:
+    import numpy as _np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    _np = None
+
+Number = Union[int, float]
+
+RAW = b"F"
+ZLIB = b"Z"
+
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _compression_from_env() -> Optional[str]:
+    codec = os.getenv("CALCULATOR_OPERANDS_COMPRESSION", "none").lower()
+    return None if codec == "none" else codec
+
+
+COMPRESSION = _compression_from_env()
+COMPRESS_MIN_BYTES = int(os.getenv("CALCULATOR_OPERANDS_COMPRESS_MIN_BYTES", "4096"))
+
+
+def pack_operands(
+    numbers: Iterable[Number],
+    compression: Optional[str] = COMPRESSION,
+    min_bytes: int = COMPRESS_MIN_BYTES,
+) -> bytes:
+    """Pack numbers into a float64 blob, compressing it if worthwhile.
+
+    Raises
+    ------
+    ValueError
+        If a number does not fit in a float64 or the codec is unknown.
+    """
+    if compression not in (None, "zlib"):
+        raise ValueError(f"Unknown operands compression: {compression!r}")
+    try:
+        values = array("d", numbers)
+    except OverflowError:
+        raise ValueError("Operand is too large to store") from None
+    if _BIG_ENDIAN:
+        values.byteswap()
+    payload = values.tobytes()
+    if compression == "zlib" and len(payload) >= min_bytes:
+        compressed = zlib.compress(payload)
+        if len(compressed) < len(payload):
+            return ZLIB + compressed
+    return RAW + payload
+
+
+def operands_bytes(blob: bytes) -> memoryview:
+    """Return the raw little-endian float64 values of a blob.
+
+    A view into ``blob`` unless it is compressed.
+
+    Raises
+    ------
+    ValueError
+        If ``blob`` is not a valid operands blob.
+    """
+    view = memoryview(blob)
+    codec = bytes(view[:1])
+    if codec == RAW:
+        payload = view[1:]
+    elif codec == ZLIB:
+        payload = memoryview(zlib.decompress(view[1:]))
+    else:
+        raise ValueError("Unknown operands encoding")
+    if len(payload) % 8:
+        raise ValueError("Truncated operands blob")
+    return payload
+
+
+def decode_operands(blob: bytes) -> Union[memoryview, array]:
+    """Decode a blob into a sequence of floats.
+
+    Returns a ``memoryview`` of format ``"d"`` that shares memory with
+    ``blob`` (or with the decompressed data). On big-endian machines the
+    values are byte-swapped into a new ``array``.
+
+    Raises
+    ------
+    ValueError
+        If ``blob`` is not a valid operands blob.
+    """
+    payload = operands_bytes(blob)
+    if _BIG_ENDIAN:
+        values = array("d", payload)
+        values.byteswap()
+        return values
+    return payload.cast("d")
+
+
+def operands_array(blob: bytes):
+    """Decode a blob into a read-only float64 NumPy array without copying.
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not installed.
+    ValueError
+        If ``blob`` is not a valid operands blob.
+    """
+    if _np is None:
+        raise ImportError("operands_array requires numpy (install the 'fast' extra)")
+    return _np.frombuffer(operands_bytes(blob), dtype="<f8")
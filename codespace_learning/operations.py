@@ -0,0 +1,240 @@
+"""
+Registry of calculator operations by name.
+
+Maps each operation name used by the API (``"add"``, ``"sqrt"``, ``"median"``
+...) to its request schema, the calculator call and the operand columns stored
+in the calculation history. Used wherever an operation arrives as data rather
+than through its own endpoint, such as ``POST /calculator/batch``.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from pydantic import ValidationError
+
+from . import calculator
+from .admission import admission_controller
+from .cache import result_cache
+from .executor import estimate_cost, operation_executor
+from .operands import pack_operands
+from .models.schemas import (
+    BasicOperationRequest,
+    CalculationRequest,
+    ListOperationRequest,
+    PercentageRequest,
+    SingleOperandRequest,
+)
+
+Number = Union[int, float]
+Call = Tuple[Callable[..., Number], Tuple[Any, ...]]
+
+
+class InvalidRequest(ValueError):
+    """An unknown operation or a payload that does not match its schema."""
+
+
+class Operation(NamedTuple):
+    """How to validate, compute and store one kind of calculation."""
+
+    name: str
+    request_model: Type[CalculationRequest]
+    # The calculator function and its arguments for a validated request.
+    call: Callable[[Any], Call]
+    operands: Callable[[Any], Dict[str, Any]]
+    # Whether results go through the shared result cache.
+    cached: bool = False
+
+    def cost(self, request: Any) -> float:
+        """Estimated cost of the call, see :func:`executor.estimate_cost`."""
+        func, args = self.call(request)
+        return estimate_cost(func, *args)
+
+    def compute(self, request: Any) -> Number:
+        """Run the call inline."""
+        func, args = self.call(request)
+        if self.cached:
+            return result_cache.call(func, *args)
+        return func(*args)
+
+
+def _binary_operands(request: BasicOperationRequest) -> Dict[str, Any]:
+    return {"operand1": request.operand1, "operand2": request.operand2}
+
+
+def _single_operand(request: SingleOperandRequest) -> Dict[str, Any]:
+    return {"operand1": request.operand}
+
+
+def _percentage_operands(request: PercentageRequest) -> Dict[str, Any]:
+    return {"operand1": request.part, "operand2": request.whole}
+
+
+def _list_operands(request: ListOperationRequest) -> Dict[str, Any]:
+    return {"operands_blob": pack_operands(request.numbers)}
+
+
+OPERATIONS: Dict[str, Operation] = {
+    operation.name: operation
+    for operation in (
+        Operation(
+            "add",
+            BasicOperationRequest,
+            lambda r: (calculator.add, (r.operand1, r.operand2)),
+            _binary_operands,
+        ),
+        Operation(
+            "subtract",
+            BasicOperationRequest,
+            lambda r: (calculator.subtract, (r.operand1, r.operand2)),
+            _binary_operands,
+        ),
+        Operation(
+            "multiply",
+            BasicOperationRequest,
+            lambda r: (calculator.multiply, (r.operand1, r.operand2)),
+            _binary_operands,
+        ),
+        Operation(
+            "divide",
+            BasicOperationRequest,
+            lambda r: (calculator.divide, (r.operand1, r.operand2)),
+            _binary_operands,
+        ),
+        Operation(
+            "power",
+            BasicOperationRequest,
+            lambda r: (calculator.power, (r.operand1, r.operand2)),
+            _binary_operands,
+            cached=True,
+        ),
+        Operation(
+            "modulo",
+            BasicOperationRequest,
+            lambda r: (calculator.modulo, (int(r.operand1), int(r.operand2))),
+            _binary_operands,
+        ),
+        Operation(
+            "sqrt",
+            SingleOperandRequest,
+            lambda r: (calculator.sqrt, (r.operand,)),
+            _single_operand,
+            cached=True,
+        ),
+        Operation(
+            "factorial",
+            SingleOperandRequest,
+            lambda r: (calculator.factorial, (int(r.operand),)),
+            _single_operand,
+            cached=True,
+        ),
+        Operation(
+            "percentage",
+            PercentageRequest,
+            lambda r: (calculator.percentage, (r.part, r.whole)),
+            _percentage_operands,
+            cached=True,
+        ),
+        Operation(
+            "average",
+            ListOperationRequest,
+            lambda r: (calculator.calculate_average, (r.numbers,)),
+            _list_operands,
+        ),
+        Operation(
+            "median",
+            ListOperationRequest,
+            lambda r: (calculator.calculate_median, (r.numbers,)),
+            _list_operands,
+        ),
+    )
+}
+
+
+def parse_operation(payload: Mapping[str, Any]) -> Tuple[Operation, Any]:
+    """Look up ``payload["operation"]`` and validate the payload against it.
+
+    Raises
+    ------
+    InvalidRequest
+        If the operation is unknown or the payload does not match its schema.
+    """
+    name = payload.get("operation")
+    operation = OPERATIONS.get(name) if isinstance(name, str) else None
+    if operation is None:
+        raise InvalidRequest(f"Unknown operation: {name!r}")
+    try:
+        request = operation.request_model.model_validate(payload)
+    except ValidationError as e:
+        fields = ", ".join(
+            ".".join(str(part) for part in error["loc"]) or "body"
+            for error in e.errors()
+        )
+        raise InvalidRequest(f"Invalid {name} request: check {fields}") from e
+    return operation, request
+
+
+def run_operation(
+    payload: Mapping[str, Any], max_cost: Optional[float] = None
+) -> Tuple[Operation, Any, Number]:
+    """Validate and compute a single operation given as a plain mapping.
+
+    Returns the operation, the validated request and the result. When
+    ``max_cost`` is given, an operation estimated to cost more is rejected
+    before it runs.
+
+    Raises
+    ------
+    ValueError
+        If the payload is invalid, over ``max_cost`` (``CostLimitExceeded``)
+        or the calculation fails.
+    """
+    operation, request = parse_operation(payload)
+    if max_cost is not None:
+        admission_controller.check(operation.name, operation.cost(request), max_cost)
+    try:
+        result = operation.compute(request)
+    except ZeroDivisionError as e:
+        raise calculator.DivisionByZero(str(e)) from e
+    except OverflowError as e:
+        raise calculator.InvalidResult(str(e)) from e
+    return operation, request, result
+
+
+async def execute_operation(
+    payload: Mapping[str, Any], max_cost: Optional[float] = None
+) -> Tuple[Operation, Any, Number]:
+    """Like :func:`run_operation`, but compute on the operation executor.
+
+    Expensive calls are offloaded instead of running on the event loop.
+
+    Raises
+    ------
+    ValueError
+        If the payload is invalid, over ``max_cost`` (``CostLimitExceeded``)
+        or the calculation fails.
+    Overloaded
+        If an offloaded call does not fit in the worker budget in time.
+    """
+    operation, request = parse_operation(payload)
+    func, args = operation.call(request)
+    if max_cost is not None:
+        admission_controller.check(operation.name, estimate_cost(func, *args), max_cost)
+    cache = result_cache if operation.cached else None
+    try:
+        result = await operation_executor.run(func, *args, cache=cache)
+    except ZeroDivisionError as e:
+        raise calculator.DivisionByZero(str(e)) from e
+    except OverflowError as e:
+        raise calculator.InvalidResult(str(e)) from e
+    return operation, request, result
@@ -0,0 +1,332 @@
+"""
+Streaming, mergeable statistics accumulators.
+
+The list functions in :mod:`codespace_learning.calculator` need the whole
+input in memory. The accumulators in this module take values in chunks of any
+size, can be merged with accumulators built elsewhere (another process, another
+machine) and serialise to a few bytes so partial aggregates can be shipped
+around cheaply:
+
+    >>> left, right = RunningStats(), RunningStats()
+    >>> left.update([1, 2, 3])
+    >>> right.update([4, 5])
+    >>> RunningStats.from_bytes(right.to_bytes()).merge(left).mean
+    3.0
+
+:class:`RunningStats` is exact (Welford / Chan et al.). :class:`QuantileSketch`
+is a KLL sketch: memory is bounded by its ``k`` parameter, and quantiles are
+approximate with a rank error of roughly ``1.7 / k`` (about 1% for the default
+``k=200``).
+"""
+
+from __future__ import annotations
+
+import random
+import struct
+from bisect import bisect_left
+from itertools import accumulate
+from math import ceil, fsum, inf
+from typing import Iterable, Optional, Union
+
+Number = Union[int, float]
+
+_RUNNING_STATS_MAGIC = b"RS1"
+_RUNNING_STATS_FORMAT = struct.Struct("<3sQdddd")
+_SKETCH_MAGIC = b"KL1"
+_SKETCH_HEADER = struct.Struct("<3sHQddH")
+# ``k`` is stored as an unsigned short in the header.
+_SKETCH_MAX_K = 0xFFFF
+
+
+class RunningStats:
+    """Exact count, mean, variance, minimum and maximum of a stream."""
+
+    __slots__ = ("count", "_mean", "_m2", "min", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = inf
+        self.max = -inf
+
+    def add(self, value: Number) -> None:
+        """Add a single value (Welford's update)."""
+        value = float(value)
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def update(self, values: Iterable[Number]) -> None:
+        """Add a chunk of values.
+
+        The chunk is summarised in two passes and then merged in, which is
+        considerably faster than calling :meth:`add` per value.
+        """
+        chunk = [float(v) for v in values]
+        if not chunk:
+            return
+        partial = RunningStats()
+        partial.count = len(chunk)
+        partial._mean = fsum(chunk) / len(chunk)
+        partial._m2 = fsum((v - partial._mean) ** 2 for v in chunk)
+        partial.min = min(chunk)
+        partial.max = max(chunk)
+        self.merge(partial)
+
+    def merge(self, other: RunningStats) -> RunningStats:
+        """Fold ``other`` into this accumulator and return ``self``."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self._mean, self._m2 = other.count, other._mean, other._m2
+            self.min, self.max = other.min, other.max
+            return self
+        total = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / total
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        """Arithmetic mean.
+
+        Raises
+        ------
+        ValueError
+            If no values have been added.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot calculate average of empty stream")
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """Population variance (``0.0`` for a single value)."""
+        if self.count == 0:
+            raise ValueError("Cannot calculate variance of empty stream")
+        return self._m2 / self.count
+
+    @property
+    def sample_variance(self) -> float:
+        """Sample (Bessel-corrected) variance.
+
+        Raises
+        ------
+        ValueError
+            If fewer than two values have been added.
+        """
+        if self.count < 2:
+            raise ValueError("Sample variance needs at least two values")
+        return self._m2 / (self.count - 1)
+
+    @property
+    def stddev(self) -> float:
+        """Population standard deviation."""
+        return self.variance**0.5
+
+    def to_bytes(self) -> bytes:
+        """Serialise to a fixed 43-byte record."""
+        return _RUNNING_STATS_FORMAT.pack(
+            _RUNNING_STATS_MAGIC, self.count, self._mean, self._m2, self.min, self.max
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> RunningStats:
+        """Rebuild an accumulator serialised with :meth:`to_bytes`.
+
+        Raises
+        ------
+        ValueError
+            If ``data`` is not a serialised ``RunningStats``.
+        """
+        try:
+            magic, count, mean, m2, low, high = _RUNNING_STATS_FORMAT.unpack(data)
+        except struct.error as e:
+            raise ValueError(f"Invalid RunningStats data: {e}") from e
+        if magic != _RUNNING_STATS_MAGIC:
+            raise ValueError("Invalid RunningStats data: bad header")
+        stats = cls()
+        stats.count, stats._mean, stats._m2, stats.min, stats.max = (
+            count,
+            mean,
+            m2,
+            low,
+            high,
+        )
+        return stats
+
+    def __repr__(self) -> str:
+        return f"<RunningStats(count={self.count}, mean={self._mean})>"
+
+
+class QuantileSketch:
+    """Mergeable approximate quantiles in bounded memory (KLL sketch).
+
+    Values are kept in a hierarchy of compactors. When a level fills up it is
+    sorted and every other value is promoted to the next level with twice the
+    weight, so the sketch holds ``O(k)`` values regardless of stream length.
+    The exact minimum and maximum are tracked separately.
+    """
+
+    _C = 2.0 / 3.0
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None) -> None:
+        if not 8 <= k <= _SKETCH_MAX_K:
+            raise ValueError(f"QuantileSketch k must be between 8 and {_SKETCH_MAX_K}")
+        self.k = k
+        self.count = 0
+        self.min = inf
+        self.max = -inf
+        self._levels: list[list[float]] = [[]]
+        self._random = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, ceil(self.k * self._C**depth))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self._levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self._levels)))
+
+    def add(self, value: Number) -> None:
+        """Add a single value."""
+        self.update((value,))
+
+    def update(self, values: Iterable[Number]) -> None:
+        """Add a chunk of values.
+
+        The chunk is appended to the lowest level and compacted once, so
+        feeding large chunks is much cheaper than adding values one by one.
+        """
+        chunk = [float(v) for v in values]
+        if not chunk:
+            return
+        self.count += len(chunk)
+        self.min = min(self.min, min(chunk))
+        self.max = max(self.max, max(chunk))
+        self._levels[0].extend(chunk)
+        self._compress()
+
+    def _compress(self) -> None:
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self._levels):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self._levels):
+                        self._levels.append([])
+                    items.sort()
+                    # Keep one value behind when the level has an odd length.
+                    keep = [items.pop()] if len(items) % 2 else []
+                    offset = self._random.randint(0, 1)
+                    self._levels[level + 1].extend(items[offset::2])
+                    self._levels[level] = keep
+                    break
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        """Fold ``other`` into this sketch and return ``self``."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> list[float]:
+        """Return approximate quantiles for each ``q`` in ``[0, 1]``.
+
+        Raises
+        ------
+        ValueError
+            If the sketch is empty or a quantile is outside ``[0, 1]``.
+        """
+        qs = list(qs)
+        if self.count == 0:
+            raise ValueError("Cannot calculate quantiles of empty stream")
+        if any(not 0.0 <= q <= 1.0 for q in qs):
+            raise ValueError("Quantiles must be between 0 and 1")
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self._levels)
+            for value in items
+        )
+        values = [value for value, _ in weighted]
+        cumulative = list(accumulate(weight for _, weight in weighted))
+        total = cumulative[-1]
+        results = []
+        for q in qs:
+            if q == 0.0:
+                results.append(self.min)
+            elif q == 1.0:
+                results.append(self.max)
+            else:
+                index = bisect_left(cumulative, q * total)
+                results.append(values[min(index, len(values) - 1)])
+        return results
+
+    def quantile(self, q: float) -> float:
+        """Return a single approximate quantile (``q`` in ``[0, 1]``)."""
+        return self.quantiles((q,))[0]
+
+    @property
+    def median(self) -> float:
+        """Approximate median."""
+        return self.quantile(0.5)
+
+    @property
+    def exact(self) -> bool:
+        """Whether nothing has been compacted yet, so quantiles are exact."""
+        return len(self._levels) == 1
+
+    def to_bytes(self) -> bytes:
+        """Serialise the sketch (header plus the retained float64 values)."""
+        header = _SKETCH_HEADER.pack(
+            _SKETCH_MAGIC, self.k, self.count, self.min, self.max, len(self._levels)
+        )
+        lengths = struct.pack(f"<{len(self._levels)}I", *map(len, self._levels))
+        items = [value for level in self._levels for value in level]
+        return header + lengths + struct.pack(f"<{len(items)}d", *items)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, seed: Optional[int] = None) -> QuantileSketch:
+        """Rebuild a sketch serialised with :meth:`to_bytes`.
+
+        Raises
+        ------
+        ValueError
+            If ``data`` is not a serialised ``QuantileSketch``.
+        """
+        try:
+            magic, k, count, low, high, depth = _SKETCH_HEADER.unpack_from(data)
+            offset = _SKETCH_HEADER.size
+            lengths = struct.unpack_from(f"<{depth}I", data, offset)
+            offset += 4 * depth
+            items = struct.unpack_from(f"<{sum(lengths)}d", data, offset)
+        except struct.error as e:
+            raise ValueError(f"Invalid QuantileSketch data: {e}") from e
+        if magic != _SKETCH_MAGIC:
+            raise ValueError("Invalid QuantileSketch data: bad header")
+        sketch = cls(k, seed=seed)
+        sketch.count, sketch.min, sketch.max = count, low, high
+        sketch._levels = []
+        start = 0
+        for length in lengths:
+            sketch._levels.append(list(items[start : start + length]))
+            start += length
+        return sketch
+
+    def __repr__(self) -> str:
+        return f"<QuantileSketch(k={self.k}, count={self.count})>"
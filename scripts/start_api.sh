@@ -55,26 +55,17 @@ if command -v python >/dev/null 2>&1; then
     PYTHON_CMD="python"
 fi
 
-# Run database migrations (create tables) - only if PostgreSQL is available
+# Create the database tables once, before the server starts, so workers skip
+# schema creation at startup - only if PostgreSQL is available
 echo "🔧 Setting up database tables..."
+RUN_CMD=""
 if command -v uv >/dev/null 2>&1; then
-    uv run python -c "try:
-        from codespace_learning.database.connection import engine, Base
-        Base.metadata.create_all(bind=engine)
-        print('✅ Database tables created')
-    except Exception as e:
-        print(f'⚠️  Database setup skipped: {e}')
-        print('   API will work without database features')
-    " 2>/dev/null || echo "⚠️  Database setup skipped - API will work without database features"
+    RUN_CMD="uv run"
+fi
+if $RUN_CMD create-schema 2>/dev/null; then
+    export CALCULATOR_CREATE_SCHEMA=off
 else
-    python -c "try:
-        from codespace_learning.database.connection import engine, Base
-        Base.metadata.create_all(bind=engine)
-        print('✅ Database tables created')
-    except Exception as e:
-        print(f'⚠️  Database setup skipped: {e}')
-        print('   API will work without database features')
-    " 2>/dev/null || echo "⚠️  Database setup skipped - API will work without database features"
+    echo "⚠️  Database setup skipped - API will work without database features"
 fi
 
 # Start the API server
@@ -0,0 +1,122 @@
+"""
+Unit tests for cost-based admission control
+"""
+
+import asyncio
+import unittest
+
+from codespace_learning import calculator, expression
+from codespace_learning.admission import (
+    AdmissionController,
+    CostLimitExceeded,
+    Overloaded,
+)
+from codespace_learning.executor import OperationExecutor, estimate_cost
+from codespace_learning.operations import run_operation
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_request_limit(self) -> None:
+        admission = AdmissionController(max_cost=1000)
+        self.assertEqual(admission.check("power", 1000), 1000)
+        with self.assertRaisesRegex(CostLimitExceeded, "power is too expensive"):
+            admission.check("power", 1001)
+        with self.assertRaises(ValueError):
+            admission.check("power", 50, limit=10)
+        self.assertEqual(admission.stats()["rejected"], 2)
+
+    def test_default_limit_scales_with_cpu_time(self) -> None:
+        admission = AdmissionController()
+        # Lists far cheaper than factorial(300000) fit.
+        median = estimate_cost(calculator.calculate_median, range(2_000_000))
+        average = estimate_cost(calculator.calculate_average, range(20_000_000))
+        self.assertEqual(admission.check("median", median), median)
+        self.assertEqual(admission.check("average", average), average)
+        with self.assertRaises(CostLimitExceeded):
+            admission.check("factorial", estimate_cost(calculator.factorial, 400_000))
+
+    def test_worker_budget_must_fit_a_request(self) -> None:
+        self.assertEqual(AdmissionController(max_cost=10).worker_budget, 20)
+        with self.assertRaises(ValueError):
+            AdmissionController(max_cost=10, worker_budget=5)
+
+    def test_calls_wait_for_the_worker_budget(self) -> None:
+        admission = AdmissionController(max_cost=10, worker_budget=10, max_wait=5)
+        order = []
+
+        async def call(name: str, cost: float) -> None:
+            async with admission.reserve(name, cost):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def main() -> None:
+            await asyncio.gather(call("first", 8), call("second", 5))
+
+        asyncio.run(main())
+        self.assertEqual(order, ["first", "second"])
+        stats = admission.stats()
+        self.assertEqual((stats["admitted"], stats["deferred"]), (2, 1))
+        self.assertEqual(stats["in_flight_cost"], 0)
+
+    def test_overloaded_after_max_wait(self) -> None:
+        admission = AdmissionController(max_cost=10, worker_budget=10, max_wait=0)
+
+        async def main() -> None:
+            async with admission.reserve("first", 10):
+                async with admission.reserve("second", 1):
+                    pass
+
+        with self.assertRaises(Overloaded) as raised:
+            asyncio.run(main())
+        self.assertEqual(raised.exception.retry_after, 1)
+        self.assertEqual(admission.stats()["overloaded"], 1)
+        self.assertEqual(admission.stats()["in_flight_cost"], 0)
+
+
+class TestAdmissionInUse(unittest.TestCase):
+
+    def test_executor_rejects_before_computing(self) -> None:
+        admission = AdmissionController(max_cost=1000)
+        executor = OperationExecutor(
+            kind="thread", offload_threshold=100, admission=admission
+        )
+        try:
+            with self.assertRaises(CostLimitExceeded):
+                asyncio.run(executor.run(calculator.power, 10, 10**9))
+            self.assertEqual(executor.stats()["inline_calls"], 0)
+            self.assertEqual(
+                asyncio.run(executor.run(calculator.power, 3, 200)), 3**200
+            )
+            stats = executor.stats()
+            self.assertEqual(stats["offloaded_calls"], 1)
+            self.assertEqual(stats["admission"]["admitted"], 1)
+        finally:
+            executor.shutdown()
+
+    def test_cheap_calls_skip_the_worker_budget(self) -> None:
+        admission = AdmissionController(max_cost=1000, max_wait=0)
+        admission.in_flight = admission.worker_budget
+        executor = OperationExecutor(
+            kind="thread", offload_threshold=100, admission=admission
+        )
+        self.assertEqual(asyncio.run(executor.run(calculator.add, 2, 3)), 5)
+        with self.assertRaises(Overloaded):
+            asyncio.run(executor.run(calculator.factorial, 50))
+
+    def test_expressions_and_operations(self) -> None:
+        with self.assertRaises(CostLimitExceeded):
+            expression.evaluate("10 ** 10 ** 9")
+        with self.assertRaises(CostLimitExceeded):
+            expression.evaluate("factorial(10000000)")
+        self.assertEqual(expression.evaluate("factorial(5) + 2 ** 3"), 128)
+        payload = {"operation": "factorial", "operand": 100}
+        self.assertEqual(
+            run_operation(payload, max_cost=1000)[2], calculator.factorial(100)
+        )
+        with self.assertRaises(CostLimitExceeded):
+            run_operation(payload, max_cost=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
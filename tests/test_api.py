@@ -2,6 +2,13 @@
 Tests for the Calculator API
 """
 
+import gzip
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
 from codespace_learning.app import app
@@ -26,6 +33,57 @@ def test_health_endpoint():
     assert data["status"] == "healthy"
 
 
+def test_import_does_not_load_the_database():
+    """Test importing the app leaves SQLAlchemy and the router unloaded."""
+    code = (
+        "import sys, codespace_learning.app; "
+        "print('sqlalchemy' in sys.modules, "
+        "'codespace_learning.api.calculator_endpoints' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert output.stdout.split() == ["False", "False"]
+
+
+def test_readiness_after_pool_warm_up():
+    """Test /health/ready reports ready once the startup work is done."""
+    with TestClient(app) as started:
+        for _ in range(100):
+            response = started.get("/health/ready")
+            if response.status_code == 200:
+                break
+            assert response.status_code == 503
+            assert response.json()["status"] == "starting"
+            time.sleep(0.05)
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["database"] in ("ready", "disabled")
+
+
+def test_metrics_split_compute_and_db_time():
+    """Test /metrics reports compute and database time per operation."""
+    client.post(
+        "/calculator/divide",
+        json={"operation": "divide", "operand1": 1, "operand2": 4}
+    )
+    client.post(
+        "/calculator/divide",
+        json={"operation": "divide", "operand1": 1, "operand2": 0}
+    )
+    text = client.get("/metrics").text
+    for phase in ("compute", "db"):
+        assert (
+            f'calculator_operation_duration_seconds_count{{operation="divide",'
+            f'phase="{phase}"}}'
+        ) in text
+    assert (
+        'calculator_operation_errors_total{operation="divide",error="DivisionByZero"}'
+    ) in text
+    assert "calculator_db_pool_checkout_seconds_count" in text
+    assert 'route="/calculator/divide",status="400"' in text
+
+
 def test_add_endpoint():
     """Test the add operation endpoint."""
     response = client.post(
@@ -63,6 +121,41 @@ def test_divide_by_zero():
     assert "Cannot divide by zero" in response.json()["detail"]
 
 
+def test_overflowing_results_are_rejected():
+    """Test that inf results are a 400 and are not stored."""
+    payload = {"operation": "multiply", "operand1": 1e308, "operand2": 10}
+    response = client.post("/calculator/multiply", json=payload)
+    assert response.status_code == 400
+    assert "not a finite number" in response.json()["detail"]
+
+    response = client.post("/calculator/batch", json={"operations": [payload]})
+    data = response.json()
+    assert (data["succeeded"], data["failed"]) == (0, 1)
+    assert "not a finite number" in data["results"][0]["error"]
+
+
+def test_results_beyond_the_float_column_are_rejected():
+    """Test that huge integers and complex results are a clean 400."""
+    requests = [
+        ("/calculator/factorial", {"operation": "factorial", "operand": 200}),
+        ("/calculator/power", {"operation": "power", "operand1": -8, "operand2": 0.5}),
+        (
+            "/calculator/evaluate",
+            {"operation": "evaluate", "expression": "factorial(200)"},
+        ),
+    ]
+    for url, payload in requests:
+        response = client.post(url, json=payload)
+        assert response.status_code == 400
+        detail = response.json()["detail"]
+        assert "SQL" not in detail and "INSERT" not in detail
+
+    response = client.post("/calculator/factorial", json=requests[0][1])
+    assert "too large to store" in response.json()["detail"]
+    response = client.post("/calculator/power", json=requests[1][1])
+    assert "not a real number" in response.json()["detail"]
+
+
 def test_average_endpoint():
     """Test the average calculation endpoint."""
     response = client.post(
@@ -88,4 +181,279 @@ def test_history_endpoint():
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
-    assert len(data) > 0
\ No newline at end of file
+    assert len(data) > 0
+
+def test_evaluate_endpoint():
+    """Test evaluating an expression in a single request."""
+    response = client.post(
+        "/calculator/evaluate",
+        json={
+            "operation": "evaluate",
+            "expression": "sqrt(x) * 2 + y",
+            "variables": {"x": 16, "y": 1},
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["result"] == 9.0
+    assert data["operation"] == "evaluate"
+
+    response = client.post(
+        "/calculator/evaluate",
+        json={"operation": "evaluate", "expression": "1 / 0"},
+    )
+    assert response.status_code == 400
+    assert "Cannot divide by zero" in response.json()["detail"]
+
+
+def test_batch_endpoint():
+    """Test running several operations in one request."""
+    response = client.post(
+        "/calculator/batch",
+        json={
+            "operations": [
+                {"operation": "add", "operand1": 2, "operand2": 3},
+                {"operation": "divide", "operand1": 1, "operand2": 0},
+                {"operation": "sqrt", "operand": 16},
+                {"operation": "percentage", "part": 25, "whole": 200},
+                {"operation": "median", "numbers": [3, 1, 2]},
+                {"operation": "add", "operand1": 1},
+                {"operation": "unknown"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 4
+    assert data["failed"] == 3
+    results = data["results"]
+    assert [item["index"] for item in results] == list(range(7))
+    assert results[0]["calculation"]["result"] == 5
+    assert "Cannot divide by zero" in results[1]["error"]
+    assert results[2]["calculation"]["operand1"] == 16
+    assert results[3]["calculation"]["result"] == 12.5
+    assert results[4]["calculation"]["result"] == 2.0
+    assert results[5]["error"] is not None
+    assert "Unknown operation" in results[6]["error"]
+    ids = [item["calculation"]["id"] for item in results if item["calculation"]]
+    assert len(set(ids)) == 4
+
+
+def test_cost_limits(monkeypatch):
+    """Test that over-budget requests are rejected before computing"""
+    response = client.post(
+        "/calculator/power",
+        json={"operation": "power", "operand1": 10, "operand2": 10**9},
+    )
+    assert response.status_code == 400
+    assert "too expensive" in response.json()["detail"]
+
+    from codespace_learning.admission import admission_controller
+
+    # 664 + 664 fits a budget of 1500, a third factorial(100) does not.
+    monkeypatch.setattr(admission_controller, "max_cost", 1500)
+    item = {"operation": "factorial", "operand": 100}
+    response = client.post("/calculator/batch", json={"operations": [item] * 3})
+    data = response.json()
+    assert (data["succeeded"], data["failed"]) == (2, 1)
+    assert "too expensive" in data["results"][2]["error"]
+
+
+def test_average_stream_endpoint():
+    """Test averaging a streamed NDJSON body."""
+    response = client.post(
+        "/calculator/average/stream",
+        content=b"".join(f"{n}\n".encode() for n in range(1, 101)),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["result"] == 50.5
+    assert data["operation"] == "average"
+
+    response = client.post("/calculator/average/stream", content=b"1\nfoo\n")
+    assert response.status_code == 400
+
+
+def test_median_stream_endpoint():
+    """Test the median of a streamed JSON array."""
+    response = client.post("/calculator/median/stream", content=b"[9, 1, 5, 3, 7]")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["result"] == 5.0
+    assert data["operation"] == "median"
+    assert data["count"] == 5
+    assert data["approximate"] is False
+
+    # Longer streams are compacted and recorded as approximate medians
+    body = "\n".join(str(i) for i in range(1001)).encode()
+    response = client.post("/calculator/median/stream?k=8", content=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["operation"] == "median_approx"
+    assert data["count"] == 1001
+    assert data["approximate"] is True
+    assert client.get(f"/calculator/history/{data['id']}").json()["operation"] == "median_approx"
+
+
+def test_history_pagination():
+    """Test paging through history with a cursor and filters."""
+    response = client.post(
+        "/calculator/batch",
+        json={
+            "operations": [
+                {"operation": "subtract", "operand1": i, "operand2": 1}
+                for i in range(5)
+            ]
+        },
+    )
+    created = response.json()["results"]
+    ids = sorted((item["calculation"]["id"] for item in created), reverse=True)
+    params = {
+        "limit": 2,
+        "operation": "subtract",
+        "since": created[0]["calculation"]["created_at"],
+    }
+
+    seen = []
+    cursor = None
+    for _ in range(3):
+        page_params = dict(params, cursor=cursor) if cursor else params
+        response = client.get("/calculator/history", params=page_params)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    assert seen == ids
+    assert cursor is None
+
+    response = client.get("/calculator/history", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_calculation_operands_endpoint():
+    """Test reading back the stored operands of a median calculation."""
+    response = client.post(
+        "/calculator/median", json={"operation": "median", "numbers": [3, 1.5, 2]}
+    )
+    calculation_id = response.json()["id"]
+
+    response = client.get(f"/calculator/history/{calculation_id}/operands")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": calculation_id,
+        "count": 3,
+        "operands": [3.0, 1.5, 2.0],
+    }
+
+    response = client.get(
+        f"/calculator/history/{calculation_id}/operands", params={"format": "binary"}
+    )
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert len(response.content) == 24
+
+    response = client.post(
+        "/calculator/add", json={"operation": "add", "operand1": 1, "operand2": 2}
+    )
+    response = client.get(f"/calculator/history/{response.json()['id']}/operands")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("mode", ["lookup", "collapse"])
+def test_result_reuse(monkeypatch, mode):
+    """Test answering repeated requests from stored calculations."""
+    from codespace_learning.database.reuse import result_reuse
+
+    monkeypatch.setattr(result_reuse, "mode", mode)
+    payload = {"operation": "factorial", "operand": 17 if mode == "lookup" else 18}
+    first = client.post("/calculator/factorial", json=payload).json()
+    second = client.post("/calculator/factorial", json=payload).json()
+    assert second["result"] == first["result"]
+    if mode == "lookup":
+        assert second["id"] != first["id"]
+        assert second["hit_count"] == 1
+    else:
+        assert second["id"] == first["id"]
+        assert (first["hit_count"], second["hit_count"]) == (1, 2)
+
+
+def test_analytics_endpoints():
+    """Test per-operation and per-minute analytics from the rollups."""
+    before = {
+        item["operation"]: item
+        for item in client.get("/calculator/analytics/operations").json()
+    }
+    for operand1, operand2 in ((6, 7), (2, 3)):
+        client.post(
+            "/calculator/multiply",
+            json={"operation": "multiply", "operand1": operand1, "operand2": operand2},
+        )
+
+    after = {
+        item["operation"]: item
+        for item in client.get("/calculator/analytics/operations").json()
+    }
+    old = before.get("multiply", {"count": 0, "mean_result": 0})
+    assert after["multiply"]["count"] == old["count"] + 2
+    total = after["multiply"]["mean_result"] * after["multiply"]["count"]
+    assert total == pytest.approx(old["mean_result"] * old["count"] + 48)
+
+    response = client.get(
+        "/calculator/analytics/throughput",
+        params={"operation": "multiply", "interval": 60},
+    )
+    assert response.status_code == 200
+    points = response.json()
+    assert sum(point["count"] for point in points) >= 2
+
+
+def test_history_include_archived(monkeypatch, tmp_path):
+    """Test continuing the history into archived calculations."""
+    from codespace_learning.database import retention
+
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", tmp_path)
+    created_at = datetime(2000, 1, 1, 12, 0)
+    with gzip.open(tmp_path / "calculations-2000-01-01.ndjson.gz", "wt") as archive:
+        archive.write(
+            json.dumps(
+                {
+                    "id": 10**9,
+                    "operation": "divide",
+                    "operand1": 1.0,
+                    "operand2": 4.0,
+                    "result": 0.25,
+                    "created_at": created_at.isoformat(),
+                }
+            )
+            + "\n"
+        )
+
+    params = {"operation": "divide", "until": "2000-01-02T00:00:00"}
+    assert client.get("/calculator/history", params=params).json() == []
+    response = client.get(
+        "/calculator/history", params=dict(params, include_archived=True)
+    )
+    assert [item["id"] for item in response.json()] == [10**9]
+
+
+def test_history_export():
+    """Test streaming the history as NDJSON and CSV"""
+    created = client.post(
+        "/calculator/modulo", json={"operation": "modulo", "operand1": 17, "operand2": 5}
+    ).json()
+
+    response = client.get(
+        "/calculator/history/export", params={"format": "ndjson", "operation": "modulo"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1]["id"] == created["id"]
+    assert records[-1]["result"] == 2
+
+    response = client.get("/calculator/history/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.startswith("id,operation,")
+
+    response = client.get("/calculator/history/export", params={"format": "xml"})
+    assert response.status_code == 422
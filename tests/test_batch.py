@@ -0,0 +1,80 @@
+"""
+Unit tests for the vectorised batch calculator functions
+"""
+
+import math
+import unittest
+from array import array
+
+from codespace_learning import calculator
+
+try:
+    import numpy as np
+    from codespace_learning import batch
+except ImportError:  # pragma: no cover
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestBatch(unittest.TestCase):
+
+    def assert_matches_scalar(self, batch_func, scalar_func, *columns) -> None:
+        result = batch_func(*columns)
+        for i, args in enumerate(zip(*columns)):
+            try:
+                expected = scalar_func(*args)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                self.assertTrue(result.errors[i], f"{args} should be flagged")
+                self.assertTrue(math.isnan(result.values[i]))
+                continue
+            self.assertFalse(result.errors[i], f"{args} should not be flagged")
+            if isinstance(expected, complex):
+                self.fail(f"{args} produced a complex result")
+            self.assertEqual(result.values[i], expected, args)
+
+    def test_binary_operations_match_scalar(self) -> None:
+        a = [10, -7.5, 0, 3, 1e300, -4]
+        b = [3, 2, 5, -0.5, 1e10, 3]
+        for name in ("add", "subtract", "multiply", "divide", "modulo"):
+            with self.subTest(name=name):
+                self.assert_matches_scalar(
+                    getattr(batch, name), getattr(calculator, name), a, b
+                )
+
+    def test_zero_divisor_is_flagged(self) -> None:
+        result = batch.divide([1, 2, 3], [1, 0, 3])
+        self.assertEqual(result.errors.tolist(), [False, True, False])
+        self.assertEqual(result.values[2], 1.0)
+        self.assertTrue(batch.modulo([5], [0]).errors[0])
+        self.assertTrue(batch.percentage([5], [0]).errors[0])
+
+    def test_power(self) -> None:
+        base = [2, 5, 10, 0, -8, -2, 10.0, 2.25]
+        exponent = [3, 0, 2, -1, 0.5, 3, 400, 0.5]
+        result = batch.power(base, exponent)
+        self.assertEqual(
+            result.errors.tolist(),
+            [False, False, False, True, True, False, True, False],
+        )
+        self.assertEqual(result.values[0], 8)
+        self.assertEqual(result.values[5], -8)
+        self.assertEqual(result.values[7], 1.5)
+
+    def test_sqrt(self) -> None:
+        self.assert_matches_scalar(batch.sqrt, calculator.sqrt, [16, 2.25, 0, -1, 2])
+
+    def test_percentage(self) -> None:
+        self.assert_matches_scalar(
+            batch.percentage, calculator.percentage, [25, 1, 3], [200, 4, 7]
+        )
+
+    def test_accepts_buffer_protocol_and_broadcasting(self) -> None:
+        values = array("d", [2.0, 4.0, 6.0])
+        result = batch.divide(memoryview(values), 2)
+        self.assertEqual(result.values.tolist(), [1.0, 2.0, 3.0])
+        self.assertFalse(result.errors.any())
+        self.assertIsInstance(result.values, np.ndarray)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit tests for the benchmark suite's baseline comparison
+"""
+
+import unittest
+
+from benchmarks.suite import compare, parse_thresholds
+
+
+def results(**values):
+    return {
+        "results": {
+            name.replace("__", "/"): {"value": value, "unit": unit, "better": better}
+            for name, (value, unit, better) in values.items()
+        }
+    }
+
+
+class TestParseThresholds(unittest.TestCase):
+
+    def test_default_and_patterns(self) -> None:
+        self.assertEqual(
+            parse_thresholds(["0.2", "load/*=0.5"]), (0.2, [("load/*", 0.5)])
+        )
+        self.assertEqual(parse_thresholds([]), (0.10, []))
+
+    def test_invalid_value(self) -> None:
+        with self.assertRaises(ValueError):
+            parse_thresholds(["load/*=fast"])
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_slower_times_and_lower_throughput_regress(self) -> None:
+        baseline = results(
+            micro__add=(1.0, "s", "lower"),
+            load__throughput=(100.0, "req/s", "higher"),
+            load__errors=(0, "requests", "lower"),
+        )
+        current = results(
+            micro__add=(1.05, "s", "lower"),
+            load__throughput=(80.0, "req/s", "higher"),
+            load__errors=(3, "requests", "lower"),
+            micro__new=(1.0, "s", "lower"),
+        )
+        comparisons = {
+            item.name: item for item in compare(baseline, current, (0.10, []))
+        }
+        self.assertEqual(
+            set(comparisons), {"micro/add", "load/throughput", "load/errors"}
+        )
+        self.assertFalse(comparisons["micro/add"].regressed)
+        self.assertAlmostEqual(comparisons["load/throughput"].change, 0.25)
+        self.assertTrue(comparisons["load/throughput"].regressed)
+        self.assertTrue(comparisons["load/errors"].regressed)
+
+    def test_last_matching_pattern_wins(self) -> None:
+        baseline = results(load__p99=(1.0, "s", "lower"))
+        current = results(load__p99=(1.4, "s", "lower"))
+        thresholds = parse_thresholds(["load/*=0.2", "load/p99=0.5"])
+        (comparison,) = compare(baseline, current, thresholds)
+        self.assertEqual(comparison.threshold, 0.5)
+        self.assertFalse(comparison.regressed)
+
+
+if __name__ == "__main__":
+    unittest.main()
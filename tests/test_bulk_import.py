@@ -0,0 +1,183 @@
+"""
+Unit tests for bulk import of calculation workloads
+"""
+
+import asyncio
+import io
+import json
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from codespace_learning.database.bulk_import import (
+    Checkpoint,
+    compute_chunk,
+    import_file,
+)
+from codespace_learning.database.connection import Base
+from codespace_learning.models.calculation import Calculation, CalculationRollup
+from codespace_learning.operands import decode_operands
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestComputeChunk(unittest.TestCase):
+
+    def test_rows_and_rejected_lines(self) -> None:
+        lines = [
+            b'{"operation": "add", "operand1": 1, "operand2": 2}\n',
+            b'{"operation": "divide", "operand1": 1, "operand2": 0}\n',
+            b"\n",
+            b'{"operation": "median", "numbers": [3, 1, 2],'
+            b' "created_at": "2024-05-10T12:00:00"}\n',
+            b"not json\n",
+        ]
+        rows, rejected = compute_chunk(lines, 10)
+        self.assertEqual([row["result"] for row in rows], [3.0, 2.0])
+        self.assertEqual(rows[1]["created_at"].isoformat(), "2024-05-10T12:00:00")
+        self.assertEqual(list(decode_operands(rows[1]["operands_blob"])), [3, 1, 2])
+        self.assertEqual([number for number, _ in rejected], [11, 14])
+        # Every row has every column, as required by executemany.
+        self.assertEqual(len({frozenset(row) for row in rows}), 1)
+
+
+class TestImportFile(unittest.TestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.database = self.directory / "calculations.db"
+        self.input = self.directory / "workload.ndjson"
+        with open(self.input, "w") as workload:
+            for i in range(25):
+                payload = {"operation": "multiply", "operand1": i, "operand2": 2}
+                if i == 13:
+                    payload["operand2"] = "x"
+                workload.write(json.dumps(payload) + "\n")
+        self.checkpoint_path = self.directory / "workload.checkpoint"
+
+    def run_import(self, checkpoint=None, **options):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.database}")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                return await import_file(
+                    engine,
+                    self.input,
+                    checkpoint or Checkpoint.load(self.checkpoint_path, self.input),
+                    chunk_size=4,
+                    **options,
+                )
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    def stored(self):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.database}")
+            try:
+                async with engine.connect() as conn:
+                    results = (
+                        await conn.scalars(
+                            select(Calculation.operand1).order_by(Calculation.id)
+                        )
+                    ).all()
+                    rollup_count = await conn.scalar(
+                        select(func.sum(CalculationRollup.count))
+                    )
+                return results, rollup_count
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    def test_import_with_worker_processes(self) -> None:
+        errors = io.StringIO()
+        with ProcessPoolExecutor(1) as executor:
+            checkpoint = self.run_import(executor=executor, errors=errors)
+        self.assertTrue(checkpoint.complete)
+        self.assertEqual((checkpoint.imported, checkpoint.rejected), (24, 1))
+        operands, rollup_count = self.stored()
+        self.assertEqual(operands, [i for i in range(25) if i != 13])
+        self.assertEqual(rollup_count, 24)
+        self.assertEqual(json.loads(errors.getvalue())["line"], 14)
+
+    def test_resume_after_interruption(self) -> None:
+        calls = []
+
+        def progress(checkpoint):
+            calls.append(checkpoint.line)
+            if len(calls) == 2:
+                raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            self.run_import(progress=progress)
+        saved = Checkpoint.load(self.checkpoint_path, self.input)
+        self.assertEqual((saved.line, saved.imported), (9, 8))
+
+        checkpoint = self.run_import()
+        self.assertEqual(checkpoint.imported, 24)
+        self.assertEqual(self.stored()[0], [i for i in range(25) if i != 13])
+
+        # A finished import is not repeated.
+        self.assertEqual(self.run_import().imported, 24)
+        self.assertEqual(len(self.stored()[0]), 24)
+
+    def test_chunk_committed_before_checkpoint_is_not_repeated(self) -> None:
+        class CrashAfterCommit(Checkpoint):
+            commits = 0
+
+            def commit_pending(self):
+                CrashAfterCommit.commits += 1
+                if CrashAfterCommit.commits == 3:
+                    raise Interrupted
+                super().commit_pending()
+
+        crashing = CrashAfterCommit(self.checkpoint_path, self.input)
+        with self.assertRaises(Interrupted):
+            self.run_import(checkpoint=crashing)
+        self.assertIsNotNone(Checkpoint.load(self.checkpoint_path, self.input).pending)
+
+        checkpoint = self.run_import()
+        self.assertEqual(checkpoint.imported, 24)
+        operands, rollup_count = self.stored()
+        self.assertEqual(operands, [i for i in range(25) if i != 13])
+        self.assertEqual(rollup_count, 24)
+
+    def test_rejected_lines_are_not_written_twice_on_resume(self) -> None:
+        class CrashBeforeInsert(Checkpoint):
+            def save(self):
+                # Line 14 is rejected in the chunk that ends before line 17.
+                if self.pending is not None and self.pending["line"] == 17:
+                    raise Interrupted
+                super().save()
+
+        errors_path = self.directory / "rejected.ndjson"
+        errors_path.write_text('{"line": 3, "error": "from an earlier import"}\n')
+        crashing = CrashBeforeInsert(self.checkpoint_path, self.input)
+        with open(errors_path, "a") as errors:
+            with self.assertRaises(Interrupted):
+                self.run_import(checkpoint=crashing, errors=errors)
+        with open(errors_path, "a") as errors:
+            checkpoint = self.run_import(errors=errors)
+        self.assertEqual((checkpoint.imported, checkpoint.rejected), (24, 1))
+        lines = [json.loads(line)["line"] for line in open(errors_path)]
+        self.assertEqual(lines, [3, 14])
+
+    def test_checkpoint_of_another_input_is_rejected(self) -> None:
+        Checkpoint(self.checkpoint_path, self.directory / "other.ndjson").save()
+        with self.assertRaises(ValueError):
+            Checkpoint.load(self.checkpoint_path, self.input)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for the calculator result cache
+"""
+
+import unittest
+from unittest import mock
+
+from codespace_learning import calculator
+from codespace_learning.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_hits_and_misses(self) -> None:
+        cache = ResultCache()
+        self.assertEqual(cache.call(calculator.power, 2, 10), 1024)
+        self.assertEqual(cache.call(calculator.power, 2, 10), 1024)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["entries"], 1)
+
+    def test_argument_types_are_part_of_the_key(self) -> None:
+        cache = ResultCache()
+        self.assertIsInstance(cache.call(calculator.power, 2, 3), int)
+        self.assertIsInstance(cache.call(calculator.power, 2.0, 3), float)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_errors_are_not_cached(self) -> None:
+        cache = ResultCache()
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cache.call(calculator.sqrt, -1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_lru_eviction(self) -> None:
+        cache = ResultCache(max_entries=2)
+        cache.call(calculator.sqrt, 1)
+        cache.call(calculator.sqrt, 4)
+        cache.call(calculator.sqrt, 1)
+        cache.call(calculator.sqrt, 9)  # evicts sqrt(4)
+        cache.call(calculator.sqrt, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["evictions"]), (2, 1))
+        cache.call(calculator.sqrt, 4)
+        self.assertEqual(cache.stats()["misses"], 4)
+
+    def test_ttl_expiry(self) -> None:
+        cache = ResultCache(ttl=10)
+        with mock.patch("codespace_learning.cache.time.monotonic", return_value=0.0):
+            cache.call(calculator.sqrt, 16)
+        with mock.patch("codespace_learning.cache.time.monotonic", return_value=5.0):
+            cache.call(calculator.sqrt, 16)
+        with mock.patch("codespace_learning.cache.time.monotonic", return_value=11.0):
+            cache.call(calculator.sqrt, 16)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_memory_budget(self) -> None:
+        cache = ResultCache(max_bytes=4096)
+        cache.call(calculator.factorial, 2000)  # ~2.4 KB result
+        cache.call(calculator.factorial, 2100)
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 1)
+        self.assertLessEqual(stats["bytes"], 4096)
+        cache.call(calculator.factorial, 10_000)  # larger than the budget
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_disabled_cache_passes_through(self) -> None:
+        cache = ResultCache(enabled=False)
+        self.assertEqual(cache.call(calculator.add, 1, 2), 3)
+        self.assertEqual(cache.call(calculator.add, 1, 2), 3)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
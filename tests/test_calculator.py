@@ -2,6 +2,7 @@
 Unit tests for calculator functions
 """
 
+import math
 import unittest
 from codespace_learning.calculator import (
     add,
@@ -15,7 +16,10 @@ from codespace_learning.calculator import (
     percentage,
     calculate_average,
     calculate_median,
+    calculate_percentiles,
+    clear_factorial_cache,
 )
+from codespace_learning import calculator
 
 
 class TestCalculator(unittest.TestCase):
@@ -74,6 +78,16 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             factorial(3.5)  # type: ignore[arg-type]
 
+    def test_factorial_large_uses_checkpoints(self) -> None:
+        clear_factorial_cache()
+        self.assertEqual(factorial(2000), math.factorial(2000))
+        # Resumes from the cached 2000! checkpoint.
+        self.assertEqual(factorial(2300), math.factorial(2300))
+        # Too far above any checkpoint: computed from scratch.
+        self.assertEqual(factorial(9000), math.factorial(9000))
+        self.assertEqual(factorial(1999), math.factorial(1999))
+        clear_factorial_cache()
+
     def test_percentage(self) -> None:
         self.assertAlmostEqual(percentage(25, 200), 12.5)
         self.assertAlmostEqual(percentage(1, 4), 25.0)
@@ -86,6 +100,30 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             calculate_median([])
 
+    def test_median_selection_path(self) -> None:
+        numbers = [7, 1, 3.5, 9, 2, 8, 6, 4]
+        original = calculator._SELECTION_THRESHOLD
+        calculator._SELECTION_THRESHOLD = 1
+        try:
+            self.assertEqual(calculate_median(numbers), 5.0)
+            self.assertEqual(calculate_median(numbers[:-1]), 6.0)
+            self.assertEqual(
+                calculate_percentiles(numbers, [0, 25, 100]), [1.0, 3.125, 9.0]
+            )
+        finally:
+            calculator._SELECTION_THRESHOLD = original
+
+    def test_percentiles(self) -> None:
+        self.assertEqual(calculate_percentiles([1, 2, 3, 4], [50, 100]), [2.5, 4.0])
+        self.assertEqual(calculate_percentiles([5], [0, 99.9]), [5.0, 5.0])
+        self.assertEqual(
+            calculate_percentiles([10, 0, 20, 30, 40], [10, 90]), [4.0, 36.0]
+        )
+        with self.assertRaises(ValueError):
+            calculate_percentiles([], [50])
+        with self.assertRaises(ValueError):
+            calculate_percentiles([1, 2], [101])
+
 
 if __name__ == "__main__":
     unittest.main()
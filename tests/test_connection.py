@@ -0,0 +1,121 @@
+"""
+Unit tests for database connection settings
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from codespace_learning.database.connection import (
+    async_database_url,
+    pool_options,
+    warm_pool,
+)
+
+
+class TestAsyncDatabaseUrl(unittest.TestCase):
+
+    def test_postgres_drivers_use_async_psycopg(self) -> None:
+        for url in (
+            "postgresql://postgres@db/calculator_db",
+            "postgresql+psycopg2://postgres@db/calculator_db",
+            "postgresql+psycopg://postgres@db/calculator_db",
+        ):
+            self.assertEqual(
+                async_database_url(url),
+                "postgresql+psycopg://postgres@db/calculator_db",
+            )
+
+    def test_sqlite_uses_aiosqlite(self) -> None:
+        self.assertEqual(
+            async_database_url("sqlite:////tmp/calculator.db"),
+            "sqlite+aiosqlite:////tmp/calculator.db",
+        )
+
+    def test_unknown_driver_is_kept(self) -> None:
+        url = "postgresql+asyncpg://postgres@db/calculator_db"
+        self.assertEqual(async_database_url(url), url)
+
+
+class TestPoolOptions(unittest.TestCase):
+
+    def test_defaults(self) -> None:
+        with mock.patch.dict(os.environ, clear=True):
+            options = pool_options("postgresql+psycopg://db/calculator_db")
+        self.assertEqual(
+            options,
+            {
+                "pool_size": 5,
+                "max_overflow": 10,
+                "pool_timeout": 30.0,
+                "pool_recycle": -1,
+                "pool_pre_ping": True,
+            },
+        )
+
+    def test_environment_overrides(self) -> None:
+        env = {
+            "DB_POOL_SIZE": "20",
+            "DB_MAX_OVERFLOW": "0",
+            "DB_POOL_RECYCLE": "1800",
+            "DB_POOL_PRE_PING": "false",
+        }
+        with mock.patch.dict(os.environ, env, clear=True):
+            options = pool_options("postgresql+psycopg://db/calculator_db")
+        self.assertEqual(options["pool_size"], 20)
+        self.assertEqual(options["max_overflow"], 0)
+        self.assertEqual(options["pool_recycle"], 1800)
+        self.assertFalse(options["pool_pre_ping"])
+
+    def test_sqlite_has_no_pool_sizing(self) -> None:
+        self.assertEqual(pool_options("sqlite+aiosqlite:///:memory:"), {})
+
+
+class TestWarmPool(unittest.TestCase):
+
+    def test_connections_are_returned_to_the_pool(self) -> None:
+        async def main():
+            with tempfile.TemporaryDirectory() as directory:
+                engine = create_async_engine(
+                    f"sqlite+aiosqlite:///{directory}/warm.db",
+                    pool_size=3,
+                    max_overflow=0,
+                )
+                try:
+                    await warm_pool(engine, 3)
+                    pool = engine.pool
+                    return pool.checkedin(), pool.checkedout()
+                finally:
+                    await engine.dispose()
+
+        self.assertEqual(asyncio.run(main()), (3, 0))
+
+    def test_connection_errors_are_raised(self) -> None:
+        async def main():
+            with tempfile.TemporaryDirectory() as directory:
+                engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/warm.db")
+                connects = []
+
+                @event.listens_for(engine.sync_engine, "connect")
+                def fail_second(dbapi_connection, record):
+                    connects.append(dbapi_connection)
+                    if len(connects) == 2:
+                        raise ConnectionError("database unavailable")
+
+                try:
+                    with self.assertRaises(ConnectionError):
+                        await warm_pool(engine, 3)
+                    self.assertEqual(engine.pool.checkedout(), 0)
+                finally:
+                    await engine.dispose()
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
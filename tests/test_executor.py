@@ -0,0 +1,90 @@
+"""
+Unit tests for the cost-aware operation executor
+"""
+
+import asyncio
+import math
+import unittest
+
+from codespace_learning import calculator
+from codespace_learning.cache import ResultCache
+from codespace_learning.executor import OperationExecutor, estimate_cost
+
+
+class TestEstimateCost(unittest.TestCase):
+
+    def test_estimates(self) -> None:
+        self.assertEqual(estimate_cost(calculator.add, 1, 2), 1.0)
+        self.assertEqual(estimate_cost(calculator.power, 2.0, 1000), 1.0)
+        self.assertEqual(estimate_cost(calculator.power, 3, 1000), 2000.0)
+        self.assertAlmostEqual(estimate_cost(calculator.factorial, 1024), 1024 * 10.0)
+        self.assertEqual(estimate_cost(calculator.factorial, -5), 0.0)
+        self.assertEqual(estimate_cost(calculator.calculate_median, [1] * 10), 20)
+        self.assertEqual(estimate_cost(calculator.calculate_average, [1] * 10), 2)
+
+
+class TestOperationExecutor(unittest.TestCase):
+
+    def test_cheap_calls_run_inline(self) -> None:
+        executor = OperationExecutor(kind="thread", offload_threshold=1000)
+        self.assertEqual(asyncio.run(executor.run(calculator.power, 2, 10)), 1024)
+        stats = executor.stats()
+        self.assertEqual((stats["inline_calls"], stats["offloaded_calls"]), (1, 0))
+        self.assertIsNone(executor._pool)
+
+    def test_expensive_calls_are_offloaded(self) -> None:
+        executor = OperationExecutor(kind="thread", offload_threshold=1000)
+        try:
+            result = asyncio.run(executor.run(calculator.factorial, 500))
+            self.assertEqual(result, math.factorial(500))
+            stats = executor.stats()
+            self.assertEqual((stats["offloaded_calls"], stats["queue_depth"]), (1, 0))
+        finally:
+            executor.shutdown()
+
+    def test_process_pool(self) -> None:
+        executor = OperationExecutor(max_workers=1, offload_threshold=0)
+        try:
+            result = asyncio.run(executor.run(calculator.power, 3, 200))
+            self.assertEqual(result, 3**200)
+            with self.assertRaises(ValueError):
+                asyncio.run(executor.run(calculator.factorial, -1))
+        finally:
+            executor.shutdown()
+
+    def test_lists_are_offloaded_to_threads(self) -> None:
+        executor = OperationExecutor(max_workers=1, offload_threshold=0)
+        try:
+            result = asyncio.run(executor.run(calculator.calculate_median, [3, 1, 2]))
+            self.assertEqual(result, 2.0)
+            self.assertIsNone(executor._pool)
+            self.assertIsNotNone(executor._thread_pool)
+        finally:
+            executor.shutdown()
+
+    def test_cost_override(self) -> None:
+        executor = OperationExecutor(kind="thread", offload_threshold=1000)
+        try:
+            asyncio.run(executor.run(calculator.add, 1, 2, cost=1000))
+            self.assertEqual(executor.stats()["offloaded_calls"], 1)
+        finally:
+            executor.shutdown()
+
+    def test_cache_is_consulted_first(self) -> None:
+        executor = OperationExecutor(kind="thread", offload_threshold=0)
+        cache = ResultCache()
+        try:
+            for _ in range(3):
+                asyncio.run(executor.run(calculator.factorial, 50, cache=cache))
+            self.assertEqual(executor.stats()["offloaded_calls"], 1)
+            self.assertEqual(cache.stats()["hits"], 2)
+        finally:
+            executor.shutdown()
+
+    def test_invalid_kind(self) -> None:
+        with self.assertRaises(ValueError):
+            OperationExecutor(kind="fiber")
+
+
+if __name__ == "__main__":
+    unittest.main()
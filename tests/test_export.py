@@ -0,0 +1,112 @@
+"""
+Unit tests for the streaming history export
+"""
+
+import csv
+import io
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+from codespace_learning.api.export import (
+    EXPORT_COLUMNS,
+    _pa,
+    ExportEncoder,
+    export_query,
+    write_export,
+)
+from codespace_learning.database.connection import Base
+from codespace_learning.models.calculation import Calculation
+from codespace_learning.operands import pack_operands
+
+START = datetime(2024, 5, 10, 12, 0)
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.engine = create_engine(f"sqlite:///{directory.name}/calculations.db")
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine)
+        rows = [
+            {
+                "operation": "add",
+                "operand1": float(i),
+                "operand2": 1.0,
+                "operands_blob": None,
+                "result": i + 1.0,
+                "created_at": START + timedelta(minutes=i),
+            }
+            for i in range(7)
+        ]
+        rows.append(
+            {
+                "operation": "median",
+                "operand1": None,
+                "operand2": None,
+                "operands_blob": pack_operands([3, 1, 2]),
+                "result": 2.0,
+                "created_at": START + timedelta(minutes=7),
+            }
+        )
+        with self.engine.begin() as conn:
+            conn.execute(insert(Calculation.__table__), rows)
+
+    def export(self, format: str, **filters) -> bytes:
+        output = io.BytesIO()
+        query = export_query(**filters)
+        write_export(self.engine, ExportEncoder(format), query, output, fetch_size=3)
+        return output.getvalue()
+
+    def test_ndjson_has_one_record_per_row(self) -> None:
+        lines = self.export("ndjson").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r["id"] for r in records], list(range(1, 9)))
+        self.assertEqual(records[0]["created_at"], START.isoformat())
+        self.assertEqual(records[-1]["operands"], [3.0, 1.0, 2.0])
+        self.assertIsNone(records[0]["operands"])
+
+    def test_csv_has_header_and_json_operands(self) -> None:
+        rows = list(csv.reader(io.StringIO(self.export("csv").decode())))
+        self.assertEqual(tuple(rows[0]), EXPORT_COLUMNS)
+        self.assertEqual(len(rows), 9)
+        last = dict(zip(rows[0], rows[-1]))
+        self.assertEqual(last["operation"], "median")
+        self.assertEqual(json.loads(last["operands"]), [3.0, 1.0, 2.0])
+        self.assertEqual(last["operand1"], "")
+
+    def test_filters(self) -> None:
+        lines = self.export(
+            "ndjson",
+            operation="add",
+            since=START + timedelta(minutes=2),
+            until=START + timedelta(minutes=5),
+        ).splitlines()
+        self.assertEqual([json.loads(line)["operand1"] for line in lines], [2, 3, 4])
+
+    def test_rows_are_encoded_batch_by_batch(self) -> None:
+        batches = []
+        encoder = ExportEncoder("ndjson")
+        encode = encoder.encode
+        encoder.encode = lambda rows: batches.append(len(rows)) or encode(rows)
+        write_export(self.engine, encoder, export_query(), io.BytesIO(), fetch_size=3)
+        self.assertEqual(batches, [3, 3, 2])
+
+    def test_unknown_format_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            ExportEncoder("xml")
+
+    @unittest.skipIf(_pa is None, "pyarrow is not installed")
+    def test_arrow_stream(self) -> None:
+        table = _pa.ipc.open_stream(self.export("arrow")).read_all()
+        self.assertEqual(table.num_rows, 8)
+        self.assertEqual(table.column("operands")[7].as_py(), [3.0, 1.0, 2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Unit tests for expression compilation and evaluation
+"""
+
+import unittest
+
+from codespace_learning.executor import operation_executor
+from codespace_learning.expression import (
+    compile_expression,
+    evaluate,
+    evaluation_cost,
+)
+
+
+class TestExpression(unittest.TestCase):
+
+    def test_arithmetic(self) -> None:
+        self.assertEqual(evaluate("1 + 2 * 3"), 7)
+        self.assertEqual(evaluate("(1 + 2) * 3"), 9)
+        self.assertEqual(evaluate("-2 ** 2"), -4)
+        self.assertEqual(evaluate("10 % 3 + 7 / 2"), 4.5)
+
+    def test_functions(self) -> None:
+        self.assertEqual(evaluate("sqrt(16) + factorial(3)"), 10.0)
+        self.assertEqual(evaluate("percentage(25, 200)"), 12.5)
+        self.assertEqual(evaluate("average(1, 2, 3) * median(4, 1, 9)"), 8.0)
+
+    def test_variables_reuse_compiled_form(self) -> None:
+        compiled = compile_expression("rate * hours + bonus")
+        self.assertEqual(compiled.variables, frozenset({"rate", "hours", "bonus"}))
+        self.assertIs(compile_expression("rate * hours + bonus"), compiled)
+        self.assertEqual(compiled.evaluate({"rate": 10, "hours": 4, "bonus": 5}), 45)
+        self.assertEqual(compiled.evaluate({"rate": 2, "hours": 3, "bonus": 0}), 6)
+        with self.assertRaises(ValueError):
+            compiled.evaluate({"rate": 1})
+
+    def test_calculator_errors(self) -> None:
+        for text in ("1 / 0", "5 % 0", "sqrt(-4)", "0 ** -1", "(-8) ** 0.5"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                evaluate(text)
+
+    def test_rejects_unsafe_syntax(self) -> None:
+        for text in (
+            "__import__('os')",
+            "x.__class__",
+            "[1, 2]",
+            "'a' * 3",
+            "True + 1",
+            "sqrt(x=4)",
+            "1 if x else 2",
+            "1 +",
+            "1" + "+1" * 1000,
+        ):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                evaluate(text, {"x": 1})
+
+    def test_nesting_limit(self) -> None:
+        self.assertEqual(evaluate("1+" * 199 + "1"), 200)
+        for text in ("-" * 999 + "1", "1+" * 400 + "1"):
+            with self.subTest(text=text[:10]):
+                with self.assertRaisesRegex(ValueError, "nested too deeply"):
+                    evaluate(text)
+
+    def test_evaluation_cost(self) -> None:
+        self.assertEqual(evaluation_cost("sqrt(x) * 2 + y"), 1.0)
+        for text in ("2 ** n", "factorial(n) + 1"):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    evaluation_cost(text), operation_executor.offload_threshold
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Unit tests for history pagination helpers
+"""
+
+import unittest
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+
+from codespace_learning.api.history import (
+    HISTORY_FIELDS,
+    decode_cursor,
+    encode_cursor,
+    history_query,
+    history_records,
+)
+from codespace_learning.database.connection import Base
+from codespace_learning.models.calculation import Calculation
+
+
+class TestHistoryCursor(unittest.TestCase):
+
+    def test_round_trip(self) -> None:
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        cursor = encode_cursor(created_at, 42)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), (created_at, 42))
+
+    def test_invalid_cursors(self) -> None:
+        for cursor in ("", "not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1)[:-3]):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_query_uses_keyset_condition(self) -> None:
+        cursor = encode_cursor(datetime(2024, 1, 1), 7)
+        sql = str(history_query(10, cursor=cursor, operation="add"))
+        self.assertIn("(calculations.created_at, calculations.id) <", sql)
+        self.assertIn(
+            "ORDER BY calculations.created_at DESC, calculations.id DESC", sql
+        )
+        self.assertNotIn("OFFSET", sql)
+
+    def test_records_from_rows_and_objects(self) -> None:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        created_at = datetime(2024, 1, 1)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(Calculation.__table__),
+                {"operation": "add", "result": 3.0, "created_at": created_at},
+            )
+            rows = conn.execute(history_query(10)).all()
+        archived = Calculation(
+            id=0, operation="sqrt", result=2.0, created_at=created_at
+        )
+        records = history_records([*rows, archived])
+        self.assertEqual(
+            [list(record) for record in records], [list(HISTORY_FIELDS)] * 2
+        )
+        self.assertEqual(records[0]["result"], 3.0)
+        self.assertEqual(records[1]["operation"], "sqrt")
+
+
+if __name__ == "__main__":
+    unittest.main()
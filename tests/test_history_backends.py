@@ -0,0 +1,133 @@
+"""
+Unit tests for the pluggable history backends
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import codespace_learning.models.calculation  # noqa: F401 - registers the tables
+from codespace_learning.database.connection import Base
+from codespace_learning.history_backends import (
+    HistoryBackend,
+    RingBufferHistory,
+    SQLAlchemyHistory,
+)
+
+
+class BackendTests:
+    """Behaviour shared by every backend; ``run_backend`` runs a test on one."""
+
+    def test_add_and_get(self) -> None:
+        async def test(backend):
+            stored = await backend.add("add", 3, operand1=1, operand2=2)
+            self.assertEqual(await backend.get(stored["id"]), stored)
+            self.assertEqual(stored["operand1"], 1.0)
+            self.assertIsNone(stored["operands_list"])
+            self.assertEqual(stored["hit_count"], 1)
+            self.assertIsNone(await backend.get(stored["id"] + 100))
+
+        self.run_backend(test)
+
+    def test_pages_newest_first_with_filters(self) -> None:
+        async def test(backend):
+            ids = []
+            for i in range(7):
+                operation = "sqrt" if i % 2 else "add"
+                ids.append((await backend.add(operation, i, operand1=i))["id"])
+            page, cursor = await backend.page(2, operation="add")
+            self.assertEqual([r["id"] for r in page], [ids[6], ids[4]])
+            page, cursor = await backend.page(2, cursor, operation="add")
+            self.assertEqual([r["id"] for r in page], [ids[2], ids[0]])
+            self.assertIsNone(cursor)
+            since = (await backend.get(ids[5]))["created_at"]
+            page, _ = await backend.page(10, since=since)
+            self.assertEqual([r["id"] for r in page], [ids[6], ids[5]])
+            page, _ = await backend.page(10, until=since)
+            self.assertNotIn(ids[5], [r["id"] for r in page])
+            with self.assertRaises(ValueError):
+                await backend.page(10, cursor="not-a-cursor")
+
+        self.run_backend(test)
+
+    def test_results_beyond_float_range_are_rejected(self) -> None:
+        async def test(backend):
+            with self.assertRaises(ValueError):
+                await backend.add("factorial", 10**400, operand1=200)
+
+        self.run_backend(test)
+
+
+class TestRingBufferHistory(BackendTests, unittest.TestCase):
+
+    def run_backend(self, test, capacity: int = 100) -> None:
+        asyncio.run(test(RingBufferHistory(capacity)))
+
+    def test_oldest_calculations_are_overwritten(self) -> None:
+        async def test(backend):
+            ids = [(await backend.add("add", i))["id"] for i in range(5)]
+            self.assertIsNone(await backend.get(ids[1]))
+            self.assertEqual((await backend.get(ids[2]))["result"], 2.0)
+            page, cursor = await backend.page(10)
+            self.assertEqual([r["id"] for r in page], ids[:1:-1])
+            self.assertIsNone(cursor)
+            self.assertEqual(backend.stats()["evicted"], 2)
+
+        self.run_backend(test, capacity=3)
+
+    def test_created_at_never_decreases(self) -> None:
+        async def test(backend):
+            first = await backend.add("add", 1)
+            backend._last_created_at += 10**9  # the clock jumped back 1000 s
+            second = await backend.add("add", 2)
+            self.assertGreaterEqual(second["created_at"], first["created_at"])
+
+        self.run_backend(test)
+
+    def test_invalid_capacity(self) -> None:
+        with self.assertRaises(ValueError):
+            RingBufferHistory(0)
+
+
+class TestSQLAlchemyHistory(BackendTests, unittest.TestCase):
+
+    def run_backend(self, test) -> None:
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                await test(SQLAlchemyHistory(async_sessionmaker(engine)))
+            finally:
+                await engine.dispose()
+
+        asyncio.run(main())
+
+
+class TestFromEnv(unittest.TestCase):
+
+    def test_backends_by_name(self) -> None:
+        environ = {"CALCULATOR_HISTORY_CAPACITY": "5"}
+        with mock.patch.dict(os.environ, environ):
+            backend = HistoryBackend.from_env()
+        self.assertIsInstance(backend, RingBufferHistory)
+        self.assertEqual(backend.capacity, 5)
+        environ = {"CALCULATOR_HISTORY_BACKEND": "sqlalchemy"}
+        with mock.patch.dict(os.environ, environ):
+            self.assertIsInstance(HistoryBackend.from_env(), SQLAlchemyHistory)
+        environ = {"CALCULATOR_HISTORY_BACKEND": "redis"}
+        with mock.patch.dict(os.environ, environ):
+            with self.assertRaises(ValueError):
+                HistoryBackend.from_env()
+
+
+if __name__ == "__main__":
+    unittest.main()
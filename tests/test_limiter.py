@@ -0,0 +1,121 @@
+"""
+Unit tests for adaptive concurrency limiting and load shedding
+"""
+
+import asyncio
+import unittest
+
+from codespace_learning.limiter import CHEAP, HEAVY, ConcurrencyLimiter, Shed
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+
+    def test_priorities(self) -> None:
+        limiter = ConcurrencyLimiter()
+        self.assertIsNone(limiter.priority("/health"))
+        self.assertIsNone(limiter.priority("/metrics"))
+        self.assertEqual(limiter.priority("/calculator/add"), CHEAP)
+        self.assertEqual(limiter.priority("/calculator/history"), CHEAP)
+        self.assertEqual(limiter.priority("/calculator/median/stream"), HEAVY)
+        self.assertEqual(limiter.priority("/calculator/powerful"), CHEAP)
+
+    def test_waiters_are_served_by_priority(self) -> None:
+        limiter = ConcurrencyLimiter(initial_limit=2)
+        order = []
+
+        async def request(name: str, priority: int) -> None:
+            await limiter.acquire(priority)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release(priority)
+
+        async def main() -> None:
+            await asyncio.gather(
+                request("first", CHEAP),
+                request("second", CHEAP),
+                request("heavy", HEAVY),
+                request("cheap", CHEAP),
+            )
+
+        asyncio.run(main())
+        self.assertEqual(order, ["first", "second", "cheap", "heavy"])
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    def test_heavy_share(self) -> None:
+        limiter = ConcurrencyLimiter(initial_limit=4, heavy_share=0.5, queue_size=0)
+
+        async def main() -> None:
+            for _ in range(2):
+                await limiter.acquire(HEAVY)
+            with self.assertRaises(Shed):
+                await limiter.acquire(HEAVY)
+            await limiter.acquire(CHEAP)
+
+        asyncio.run(main())
+        self.assertEqual(limiter.stats()["in_flight"], 3)
+
+    def test_full_queue_sheds_heavy_requests_first(self) -> None:
+        limiter = ConcurrencyLimiter(initial_limit=1, queue_size=1)
+        results = {}
+
+        async def request(name: str, priority: int) -> None:
+            try:
+                await limiter.acquire(priority)
+            except Shed as e:
+                results[name] = e.reason
+                return
+            results[name] = "admitted"
+            await asyncio.sleep(0.01)
+            limiter.release(priority)
+
+        async def main() -> None:
+            await limiter.acquire(CHEAP)
+            tasks = [asyncio.create_task(request("heavy", HEAVY))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(request("cheap", CHEAP)))
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(request("late", CHEAP)))
+            await asyncio.sleep(0.01)
+            limiter.release(CHEAP)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(main())
+        self.assertEqual(
+            results, {"heavy": "queue_full", "cheap": "admitted", "late": "queue_full"}
+        )
+        self.assertEqual(limiter.stats()["shed"], 2)
+
+    def test_queue_deadline(self) -> None:
+        limiter = ConcurrencyLimiter(initial_limit=1, queue_timeout=0.01)
+
+        async def main() -> None:
+            await limiter.acquire(CHEAP)
+            with self.assertRaises(Shed) as raised:
+                await limiter.acquire(CHEAP)
+            self.assertEqual(raised.exception.reason, "timeout")
+
+        asyncio.run(main())
+        self.assertEqual(limiter.stats()["queued"], 0)
+        self.assertEqual(limiter.retry_after, 1)
+
+    def test_limit_follows_latency(self) -> None:
+        limiter = ConcurrencyLimiter(initial_limit=10)
+        limiter.in_flight[CHEAP] = 10
+        for _ in range(20):
+            limiter.release(CHEAP, "/calculator/add", 0.001)
+            limiter.in_flight[CHEAP] += 1
+        grown = limiter.limit
+        self.assertGreater(grown, 11)
+        for _ in range(20):
+            limiter.release(CHEAP, "/calculator/add", 0.01)
+            limiter.in_flight[CHEAP] += 1
+            limiter._last_decrease = 0.0
+        self.assertLess(limiter.limit, grown * 0.5)
+
+    def test_invalid_limit(self) -> None:
+        with self.assertRaises(ValueError):
+            ConcurrencyLimiter(initial_limit=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Unit tests for the Prometheus metrics
+"""
+
+import asyncio
+import unittest
+
+from codespace_learning import calculator
+from codespace_learning.admission import CostLimitExceeded
+from codespace_learning.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Metrics,
+    MetricsMiddleware,
+)
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets_are_cumulative(self) -> None:
+        histogram = Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/add")
+        self.assertEqual(
+            histogram.render().splitlines(),
+            [
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{route="/add",le="0.1"} 2',
+                'latency_seconds_bucket{route="/add",le="1"} 3',
+                'latency_seconds_bucket{route="/add",le="+Inf"} 4',
+                'latency_seconds_sum{route="/add"} 3.65',
+                'latency_seconds_count{route="/add"} 4',
+            ],
+        )
+
+    def test_series_beyond_the_limit_are_counted_as_other(self) -> None:
+        histogram = Histogram("h", "H.", ("route",), max_series=2)
+        for route in ("/a", "/b", "/c", "/d", "/a"):
+            histogram.observe(0.001, route)
+        self.assertEqual(histogram.count("/a"), 2)
+        self.assertEqual(histogram.count("other"), 2)
+        self.assertEqual(histogram.count("/c"), 0)
+
+
+class TestCounterAndGauge(unittest.TestCase):
+
+    def test_unlabelled_metrics_start_at_zero(self) -> None:
+        self.assertIn("in_flight 0", Gauge("in_flight", "In flight.").render())
+
+    def test_label_values_are_escaped(self) -> None:
+        counter = Counter("errors_total", "Errors.", ("reason",))
+        counter.inc('bad "input"\n')
+        self.assertIn('errors_total{reason="bad \\"input\\"\\n"} 1', counter.render())
+
+    def test_gauge_goes_down(self) -> None:
+        gauge = Gauge("g", "G.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEqual(gauge.value(), 1)
+
+
+class TestOperationTimer(unittest.TestCase):
+
+    def test_compute_errors_are_counted(self) -> None:
+        metrics = Metrics()
+        with self.assertRaises(ValueError):
+            with metrics.operation("divide", "compute"):
+                raise ValueError("Cannot divide by zero")
+        with metrics.operation("divide", "db"):
+            pass
+        self.assertEqual(metrics.operations.count("divide", "compute"), 1)
+        self.assertEqual(metrics.operations.count("divide", "db"), 1)
+        self.assertEqual(metrics.errors.value("divide", "ValueError"), 1)
+
+    def test_error_kinds_are_told_apart(self) -> None:
+        metrics = Metrics()
+        for error in (
+            lambda: calculator.divide(1, 0),
+            lambda: calculator.sqrt(-1),
+            lambda: calculator.calculate_average([]),
+        ):
+            with self.assertRaises(ValueError):
+                with metrics.operation("evaluate", "compute"):
+                    error()
+        with self.assertRaises(ValueError):
+            with metrics.operation("evaluate", "compute"):
+                raise CostLimitExceeded("too expensive")
+        self.assertEqual(metrics.errors.value("evaluate", "DivisionByZero"), 1)
+        self.assertEqual(metrics.errors.value("evaluate", "InvalidOperand"), 2)
+        self.assertEqual(metrics.errors.value("evaluate", "CostLimitExceeded"), 1)
+
+    def test_error_messages_are_not_labels(self) -> None:
+        metrics = Metrics()
+        for i in range(1000):
+            with self.assertRaises(ValueError):
+                with metrics.operation("evaluate", "compute"):
+                    raise ValueError(f"Unbound variables: x{i}")
+        self.assertEqual(metrics.errors.value("evaluate", "ValueError"), 1000)
+        self.assertNotIn("Unbound", metrics.errors.render())
+
+    def test_disabled_metrics_record_nothing(self) -> None:
+        metrics = Metrics(enabled=False)
+        with metrics.operation("add", "compute"):
+            pass
+        self.assertEqual(metrics.operations.count("add", "compute"), 0)
+
+
+class TestMetricsMiddleware(unittest.TestCase):
+
+    def test_status_route_and_in_flight(self) -> None:
+        metrics = Metrics()
+        in_flight = []
+
+        class Route:
+            path = "/calculator/history/{calculation_id}"
+
+        async def app(scope, receive, send):
+            in_flight.append(metrics.in_flight.value())
+            scope["route"] = Route()
+            await send({"type": "http.response.start", "status": 404})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        middleware = MetricsMiddleware(app, metrics)
+        scope = {"type": "http", "method": "GET", "path": "/calculator/history/7"}
+        asyncio.run(middleware(scope, None, send))
+        self.assertEqual(in_flight, [1])
+        self.assertEqual(metrics.in_flight.value(), 0)
+        self.assertEqual(
+            metrics.requests.count(
+                "GET", "/calculator/history/{calculation_id}", "404"
+            ),
+            1,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
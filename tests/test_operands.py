@@ -0,0 +1,66 @@
+"""
+Unit tests for the packed list operand encoding
+"""
+
+import unittest
+
+from codespace_learning.operands import (
+    decode_operands,
+    operands_array,
+    operands_bytes,
+    pack_operands,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    np = None
+
+
+class TestOperands(unittest.TestCase):
+
+    def test_round_trip(self) -> None:
+        numbers = [1, 2.5, -3, 1e300, 0.1]
+        blob = pack_operands(numbers, compression=None)
+        self.assertEqual(len(blob), 1 + 8 * len(numbers))
+        self.assertEqual(decode_operands(blob).tolist(), [float(n) for n in numbers])
+
+    def test_empty_list(self) -> None:
+        self.assertEqual(list(decode_operands(pack_operands([]))), [])
+
+    def test_uncompressed_decode_does_not_copy(self) -> None:
+        blob = bytearray(pack_operands([1.0, 2.0], compression=None))
+        values = decode_operands(blob)
+        blob[1:9] = pack_operands([7.0], compression=None)[1:]
+        self.assertEqual(values[0], 7.0)
+
+    def test_compression(self) -> None:
+        numbers = list(range(10_000))
+        blob = pack_operands(numbers, compression="zlib")
+        self.assertEqual(blob[:1], b"Z")
+        self.assertLess(len(blob), 8 * len(numbers) // 2)
+        self.assertEqual(decode_operands(blob).tolist(), [float(n) for n in numbers])
+
+    def test_compression_is_skipped_when_not_worthwhile(self) -> None:
+        self.assertEqual(pack_operands([1, 2, 3], compression="zlib")[:1], b"F")
+
+    def test_invalid_input(self) -> None:
+        with self.assertRaises(ValueError):
+            pack_operands([10**400])
+        with self.assertRaises(ValueError):
+            pack_operands([1], compression="lz4")
+        for blob in (b"", b"X" + bytes(8), b"F" + bytes(7)):
+            with self.assertRaises(ValueError):
+                operands_bytes(blob)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy_view(self) -> None:
+        blob = pack_operands([4.0, 5.0, 6.0], compression=None)
+        values = operands_array(blob)
+        self.assertEqual(values.dtype, np.dtype("<f8"))
+        self.assertEqual(values.tolist(), [4.0, 5.0, 6.0])
+        self.assertFalse(values.flags.writeable)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for the operation registry
+"""
+
+import asyncio
+import math
+import unittest
+
+from codespace_learning.operands import decode_operands
+from codespace_learning.operations import OPERATIONS, execute_operation, run_operation
+
+
+class TestOperations(unittest.TestCase):
+
+    def test_every_endpoint_operation_is_registered(self) -> None:
+        self.assertEqual(
+            set(OPERATIONS),
+            {
+                "add",
+                "subtract",
+                "multiply",
+                "divide",
+                "power",
+                "modulo",
+                "sqrt",
+                "factorial",
+                "percentage",
+                "average",
+                "median",
+            },
+        )
+
+    def test_run_operation(self) -> None:
+        operation, request, result = run_operation(
+            {"operation": "percentage", "part": 25, "whole": 200}
+        )
+        self.assertEqual(result, 12.5)
+        self.assertEqual(operation.operands(request), {"operand1": 25, "operand2": 200})
+
+        operation, request, result = run_operation(
+            {"operation": "median", "numbers": [3, 1, 2]}
+        )
+        self.assertEqual(result, 2.0)
+        operands = operation.operands(request)
+        self.assertEqual(list(decode_operands(operands["operands_blob"])), [3, 1, 2])
+
+    def test_execute_operation(self) -> None:
+        operation, request, result = asyncio.run(
+            execute_operation({"operation": "factorial", "operand": 10})
+        )
+        self.assertEqual(result, 3628800)
+        self.assertAlmostEqual(operation.cost(request), 10 * math.log2(10))
+        with self.assertRaises(ValueError):
+            asyncio.run(
+                execute_operation({"operation": "divide", "operand1": 1, "operand2": 0})
+            )
+
+    def test_errors_are_value_errors(self) -> None:
+        for payload in (
+            {"operation": "divide", "operand1": 1, "operand2": 0},
+            {"operation": "power", "operand1": 0, "operand2": -1},
+            {"operation": "sqrt"},
+            {"operation": "cube", "operand": 2},
+            {"operand": 2},
+        ):
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                run_operation(payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Unit tests for fast JSON responses
+"""
+
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from codespace_learning.api import responses
+from codespace_learning.api.responses import FastJSONResponse, dumps
+
+CONTENT = [{"id": 1, "result": 2.5, "created_at": datetime(2024, 5, 1, 12, 30, 15, 5)}]
+
+
+class TestDumps(unittest.TestCase):
+
+    def test_datetimes_are_iso_format(self) -> None:
+        self.assertEqual(
+            json.loads(dumps(CONTENT)),
+            [{"id": 1, "result": 2.5, "created_at": "2024-05-01T12:30:15.000005"}],
+        )
+
+    def test_standard_library_fallback_matches(self) -> None:
+        with mock.patch.object(responses, "_orjson", None):
+            fallback = dumps(CONTENT)
+        self.assertEqual(json.loads(fallback), json.loads(dumps(CONTENT)))
+        self.assertNotIn(b" ", fallback)
+
+    def test_response_body(self) -> None:
+        response = FastJSONResponse({"ok": True})
+        self.assertEqual(response.body, b'{"ok":true}')
+        self.assertEqual(response.media_type, "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests for history retention and archival
+"""
+
+import gzip
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, insert, select
+
+from codespace_learning.database.connection import Base
+from codespace_learning.database.retention import (
+    archived_days,
+    read_archived,
+    run_retention,
+)
+from codespace_learning.models.calculation import Calculation
+from codespace_learning.operands import pack_operands
+
+NOW = datetime(2024, 5, 10, 12, 0)
+
+
+class TestRetention(unittest.TestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_dir = Path(directory.name) / "archive"
+        self.engine = create_engine(f"sqlite:///{directory.name}/calculations.db")
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine)
+
+    def insert(self, *created_at: datetime, **values) -> None:
+        row = {"operation": "add", "result": 1.0, "operands_blob": None}
+        row.update(values)
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(Calculation.__table__),
+                [dict(row, created_at=moment) for moment in created_at],
+            )
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.count()).select_from(Calculation))
+
+    def test_expired_days_are_archived_and_deleted(self) -> None:
+        self.insert(*(NOW - timedelta(days=days, hours=1) for days in range(5)))
+        archived = run_retention(self.engine, 2, self.archive_dir, now=NOW)
+        self.assertEqual(archived, {"2024-05-06": 1, "2024-05-07": 1})
+        self.assertEqual(self.count(), 3)
+        self.assertEqual(
+            archived_days(self.archive_dir),
+            [datetime(2024, 5, 7).date(), datetime(2024, 5, 6).date()],
+        )
+        path = self.archive_dir / "calculations-2024-05-06.ndjson.gz"
+        with gzip.open(path, "rt") as archive:
+            self.assertEqual(len(archive.readlines()), 1)
+
+    def test_nothing_to_archive(self) -> None:
+        self.assertEqual(run_retention(self.engine, 2, self.archive_dir, now=NOW), {})
+        self.insert(NOW)
+        self.assertEqual(run_retention(self.engine, 2, self.archive_dir, now=NOW), {})
+        self.assertEqual(self.count(), 1)
+
+    def test_late_rows_go_to_a_new_part(self) -> None:
+        day = NOW - timedelta(days=7)
+        self.insert(day)
+        run_retention(self.engine, 2, self.archive_dir, now=NOW)
+        self.insert(day + timedelta(minutes=5))
+        run_retention(self.engine, 2, self.archive_dir, now=NOW)
+        self.assertEqual(
+            sorted(path.name for path in self.archive_dir.iterdir()),
+            [
+                "calculations-2024-05-03.1.ndjson.gz",
+                "calculations-2024-05-03.ndjson.gz",
+            ],
+        )
+        self.assertEqual(len(read_archived(10, archive_dir=self.archive_dir)), 2)
+
+    def test_read_archived(self) -> None:
+        start = NOW - timedelta(days=10)
+        self.insert(*(start + timedelta(hours=7 * i) for i in range(20)))
+        self.insert(start, operation="median", operands_blob=pack_operands([1, 2]))
+        run_retention(self.engine, 0, self.archive_dir, now=NOW)
+        self.assertEqual(self.count(), 0)
+
+        first = read_archived(5, archive_dir=self.archive_dir)
+        self.assertEqual([c.id for c in first], [20, 19, 18, 17, 16])
+        self.assertEqual(first[0].created_at, start + timedelta(hours=7 * 19))
+        last = first[-1]
+        second = read_archived(
+            5, (last.created_at, last.id), archive_dir=self.archive_dir
+        )
+        self.assertEqual([c.id for c in second], [15, 14, 13, 12, 11])
+
+        (median,) = read_archived(5, operation="median", archive_dir=self.archive_dir)
+        self.assertEqual(median.operands_blob, pack_operands([1, 2]))
+        window = read_archived(
+            50,
+            since=start + timedelta(days=1),
+            until=start + timedelta(days=2),
+            archive_dir=self.archive_dir,
+        )
+        self.assertEqual([c.id for c in window], [7, 6, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
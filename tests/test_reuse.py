@@ -0,0 +1,50 @@
+"""
+Unit tests for content-addressed result reuse
+"""
+
+import unittest
+
+from codespace_learning.database.reuse import ResultReuse, result_key
+
+
+class TestResultKey(unittest.TestCase):
+
+    def test_numbers_are_canonicalised(self) -> None:
+        self.assertEqual(result_key("power", (2, 3)), result_key("power", (2.0, 3.0)))
+        self.assertEqual(
+            result_key("median", ([1, 2, 3],)), result_key("median", ([1.0, 2.0, 3.0],))
+        )
+        self.assertEqual(len(result_key("add", (1, 2))), 64)
+
+    def test_distinct_calculations_have_distinct_keys(self) -> None:
+        keys = {
+            result_key("add", (1, 2)),
+            result_key("add", (2, 1)),
+            result_key("subtract", (1, 2)),
+            result_key("average", ([1, 2],)),
+            result_key("average", ([1], [2])),
+            result_key("average", ([1, 2, 0],)),
+            result_key("power", (2**60, 2)),
+            result_key("power", (2**60 + 1, 2)),
+            result_key("median", ([2**60, 1],)),
+            result_key("median", ([2**60 + 1, 1],)),
+            result_key("median", ([10**400, 1],)),
+        }
+        self.assertEqual(len(keys), 11)
+
+
+class TestResultReuse(unittest.TestCase):
+
+    def test_modes(self) -> None:
+        self.assertIsNone(ResultReuse("off").key("add", (1, 2)))
+        self.assertEqual(
+            ResultReuse("lookup").key("add", (1, 2)), result_key("add", (1, 2))
+        )
+        self.assertFalse(ResultReuse("lookup").collapse)
+        self.assertTrue(ResultReuse("collapse").collapse)
+        with self.assertRaises(ValueError):
+            ResultReuse("always")
+
+
+if __name__ == "__main__":
+    unittest.main()
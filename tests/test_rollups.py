@@ -0,0 +1,255 @@
+"""
+Unit tests for the analytics rollups
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from codespace_learning.database.connection import Base
+from codespace_learning.database.rollups import (
+    RollupRecorder,
+    apply_rollups,
+    operation_summary,
+    rebuild_rollups,
+    rollup_deltas,
+    throughput,
+)
+from codespace_learning.models.calculation import Calculation, CalculationRollup
+
+
+class TestRollupDeltas(unittest.TestCase):
+
+    def test_entries_are_grouped_per_operation_and_minute(self) -> None:
+        deltas = rollup_deltas(
+            [
+                ("add", datetime(2024, 1, 1, 12, 0, 5), 2),
+                ("add", datetime(2024, 1, 1, 12, 0, 55), 4),
+                ("add", datetime(2024, 1, 1, 12, 1, 0), 8),
+                ("sqrt", datetime(2024, 1, 1, 12, 0, 30), 3),
+            ]
+        )
+        self.assertEqual(
+            sorted(
+                (d["operation"], d["bucket_start"].minute, d["count"], d["result_sum"])
+                for d in deltas
+            ),
+            [("add", 0, 2, 6.0), ("add", 1, 1, 8.0), ("sqrt", 0, 1, 3.0)],
+        )
+
+    def test_deltas_are_sorted_by_key(self) -> None:
+        minute = datetime(2024, 1, 1, 12, 0)
+        deltas = rollup_deltas(
+            [
+                ("sqrt", minute, 1),
+                ("add", minute.replace(minute=1), 1),
+                ("add", minute, 1),
+            ]
+        )
+        self.assertEqual(
+            [(d["operation"], d["bucket_start"].minute) for d in deltas],
+            [("add", 0), ("add", 1), ("sqrt", 0)],
+        )
+
+
+class TestRollupTables(unittest.TestCase):
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(self.engine.dispose)
+        Base.metadata.create_all(self.engine)
+
+    def run_async(self, test):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+            try:
+                async with engine.begin() as conn:
+                    return await test(conn)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    def rollups(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(CalculationRollup.__table__).order_by(
+                    "operation", "bucket_start"
+                )
+            )
+            return [(r.operation, r.bucket_start, r.count, r.result_sum) for r in rows]
+
+    def test_apply_accumulates(self) -> None:
+        minute = datetime(2024, 1, 1, 12, 0)
+        for _ in range(2):
+            self.run_async(
+                lambda conn: apply_rollups(
+                    conn, [("add", minute, 1), ("add", minute, 2)]
+                )
+            )
+        self.assertEqual(self.rollups(), [("add", minute, 4, 6.0)])
+
+    def test_rebuild_matches_writes(self) -> None:
+        rows = [
+            {
+                "operation": "add",
+                "result": 3.0,
+                "created_at": datetime(2024, 1, 1, 12, 0, 10),
+            },
+            {
+                "operation": "add",
+                "result": 5.0,
+                "created_at": datetime(2024, 1, 1, 12, 0, 50),
+            },
+            {
+                "operation": "sqrt",
+                "result": 2.0,
+                "created_at": datetime(2024, 1, 1, 12, 3, 0),
+            },
+            {
+                "operation": "sqrt",
+                "result": 4.0,
+                "created_at": datetime(2024, 1, 1, 12, 3, 1),
+                "hit_count": 3,
+            },
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(Calculation.__table__),
+                [dict({"hit_count": 1}, **row) for row in rows],
+            )
+        self.assertEqual(rebuild_rollups(self.engine), 2)
+        expected = [
+            ("add", datetime(2024, 1, 1, 12, 0), 2, 8.0),
+            ("sqrt", datetime(2024, 1, 1, 12, 3), 4, 14.0),
+        ]
+        self.assertEqual(self.rollups(), expected)
+
+        # Rebuilding a window leaves earlier buckets alone.
+        self.assertEqual(
+            rebuild_rollups(self.engine, since=datetime(2024, 1, 1, 12, 2)), 1
+        )
+        self.assertEqual(self.rollups(), expected)
+
+    def test_rebuild_keeps_archived_days(self) -> None:
+        archived = ("add", datetime(2024, 1, 1, 12, 0), 5, 10.0)
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(CalculationRollup.__table__),
+                [
+                    dict(
+                        zip(
+                            ("operation", "bucket_start", "count", "result_sum"),
+                            archived,
+                        )
+                    )
+                ],
+            )
+            conn.execute(
+                insert(Calculation.__table__),
+                [
+                    {
+                        "operation": "sqrt",
+                        "result": 2.0,
+                        "created_at": datetime(2024, 1, 2, 9, 30),
+                        "hit_count": 1,
+                    }
+                ],
+            )
+        with tempfile.TemporaryDirectory() as archive_dir:
+            (Path(archive_dir) / "calculations-2024-01-01.ndjson.gz").touch()
+            self.assertEqual(
+                rebuild_rollups(self.engine, archive_dir=Path(archive_dir)), 1
+            )
+        self.assertEqual(
+            self.rollups(), [archived, ("sqrt", datetime(2024, 1, 2, 9, 30), 1, 2.0)]
+        )
+
+    def test_recorder_modes(self) -> None:
+        minute = datetime(2024, 1, 1, 12, 0)
+        entries = [("add", minute, 1), ("add", minute, 2)]
+
+        async def record(mode: str, flush: bool) -> None:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+            recorder = RollupRecorder(engine, mode=mode, flush_interval=60)
+            try:
+                async with engine.begin() as conn:
+                    await recorder.in_transaction(conn, entries)
+                await recorder.after_commit(entries)
+                await recorder.after_commit(entries)
+                if flush:
+                    await recorder.flush()
+            finally:
+                await engine.dispose()
+
+        # Buffered deltas are only written when flushed, in one upsert.
+        asyncio.run(record("buffered", flush=False))
+        self.assertEqual(self.rollups(), [])
+        asyncio.run(record("buffered", flush=True))
+        self.assertEqual(self.rollups(), [("add", minute, 4, 6.0)])
+        asyncio.run(record("sync", flush=True))
+        self.assertEqual(self.rollups(), [("add", minute, 6, 9.0)])
+        asyncio.run(record("off", flush=True))
+        self.assertEqual(self.rollups(), [("add", minute, 6, 9.0)])
+        with self.assertRaises(ValueError):
+            RollupRecorder(self.engine, mode="eventually")
+
+    def test_flush_waits_for_a_running_flush(self) -> None:
+        minute = datetime(2024, 1, 1, 12, 0)
+
+        async def main() -> None:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+            recorder = RollupRecorder(engine, mode="buffered", flush_interval=60)
+            try:
+                await recorder.after_commit([("add", minute, 1)])
+                running = asyncio.create_task(recorder.flush())
+                await asyncio.sleep(0)
+                await recorder.after_commit([("add", minute, 2)])
+                await recorder.flush()
+                # Both deltas are committed once the second flush returns.
+                self.assertEqual(self.rollups(), [("add", minute, 2, 3.0)])
+                await running
+            finally:
+                await engine.dispose()
+
+        asyncio.run(main())
+
+    def test_queries(self) -> None:
+        entries = [
+            ("add", datetime(2024, 1, 1, 12, minute), minute) for minute in range(10)
+        ]
+        entries.append(("sqrt", datetime(2024, 1, 1, 12, 5), 3))
+        self.run_async(lambda conn: apply_rollups(conn, entries))
+
+        summary = self.run_async(lambda conn: operation_summary(conn))
+        self.assertEqual(
+            summary,
+            [
+                {"operation": "add", "count": 10, "mean_result": 4.5},
+                {"operation": "sqrt", "count": 1, "mean_result": 3.0},
+            ],
+        )
+        points = self.run_async(
+            lambda conn: throughput(
+                conn,
+                datetime(2024, 1, 1, 12, 0),
+                datetime(2024, 1, 1, 12, 8),
+                interval=5,
+            )
+        )
+        self.assertEqual(
+            [(p["bucket_start"].minute, p["count"]) for p in points], [(0, 5), (5, 4)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
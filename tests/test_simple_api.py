@@ -0,0 +1,126 @@
+"""
+Integration tests for the API without a database
+"""
+
+from fastapi.testclient import TestClient
+from codespace_learning.app_simple import app
+
+client = TestClient(app)
+
+
+def test_calculations_are_kept_in_history():
+    """Test that calculations are served back from the in-memory history"""
+    added = client.post(
+        "/calculator/add", json={"operation": "add", "operand1": 2, "operand2": 3}
+    ).json()
+    assert added["result"] == 5
+    assert added["operand1"] == 2
+
+    response = client.get(f"/calculator/history/{added['id']}")
+    assert response.status_code == 200
+    stored = response.json()
+    assert stored["operation"] == "add"
+    assert stored["result"] == 5
+    assert stored["created_at"] == added["created_at"]
+
+    assert client.get("/calculator/history/999999").status_code == 404
+
+
+def test_history_pagination():
+    """Test keyset pagination of the in-memory history"""
+    ids = [
+        client.post(
+            "/calculator/sqrt", json={"operation": "sqrt", "operand": value}
+        ).json()["id"]
+        for value in (4, 9, 16)
+    ]
+    response = client.get(
+        "/calculator/history", params={"limit": 2, "operation": "sqrt"}
+    )
+    assert [item["id"] for item in response.json()] == ids[:0:-1]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        "/calculator/history",
+        params={"limit": 2, "operation": "sqrt", "cursor": cursor},
+    )
+    assert response.json()[0]["id"] == ids[0]
+
+    response = client.get("/calculator/history", params={"cursor": "bad"})
+    assert response.status_code == 400
+
+
+def test_large_results_are_returned_unstored():
+    """Test that results beyond the float range are still returned"""
+    response = client.post(
+        "/calculator/factorial", json={"operation": "factorial", "operand": 200}
+    )
+    assert response.status_code == 200
+    assert response.json()["result"] > 10**300
+    assert "id" not in response.json()
+
+
+def test_overflowing_results_are_rejected():
+    """Test that inf results are a 400, not a null result"""
+    response = client.post(
+        "/calculator/multiply",
+        json={"operation": "multiply", "operand1": 1e308, "operand2": 10},
+    )
+    assert response.status_code == 400
+    assert "not a finite number" in response.json()["detail"]
+
+
+def test_history_stats():
+    """Test the history backend stats endpoint"""
+    stats = client.get("/calculator/history/stats").json()
+    assert stats["backend"] == "memory"
+    assert stats["last_id"] >= 1
+
+
+def test_metrics_endpoint():
+    """Test that request latencies are exposed in Prometheus format"""
+    client.post(
+        "/calculator/add", json={"operation": "add", "operand1": 1, "operand2": 1}
+    )
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'calculator_http_request_duration_seconds_count{method="POST",'
+        'route="/calculator/add",status="200"}'
+    ) in response.text
+
+
+def test_busy_worker_returns_503(monkeypatch):
+    """Test that expensive calls are shed when the worker budget is used up"""
+    from codespace_learning.admission import admission_controller
+
+    monkeypatch.setattr(admission_controller, "max_wait", 0)
+    monkeypatch.setattr(
+        admission_controller, "in_flight", admission_controller.worker_budget
+    )
+    response = client.post(
+        "/calculator/factorial", json={"operation": "factorial", "operand": 20000}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    cheap = client.post(
+        "/calculator/add", json={"operation": "add", "operand1": 1, "operand2": 1}
+    )
+    assert cheap.status_code == 200
+
+
+def test_load_shedding(monkeypatch):
+    """Test that requests over the concurrency limit get 503 but /health answers"""
+    from codespace_learning.limiter import concurrency_limiter
+
+    monkeypatch.setattr(concurrency_limiter, "queue_size", 0)
+    monkeypatch.setattr(
+        concurrency_limiter, "in_flight", [int(concurrency_limiter.limit), 0]
+    )
+    response = client.post(
+        "/calculator/add", json={"operation": "add", "operand1": 1, "operand2": 1}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+    assert client.get("/health").status_code == 200
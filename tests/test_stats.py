@@ -0,0 +1,119 @@
+"""
+Unit tests for the streaming statistics accumulators
+"""
+
+import random
+import statistics
+import unittest
+
+from codespace_learning.stats import QuantileSketch, RunningStats
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_matches_statistics_module(self) -> None:
+        rng = random.Random(7)
+        values = [rng.uniform(-100, 100) for _ in range(1000)]
+        stats = RunningStats()
+        for start in range(0, len(values), 128):
+            stats.update(values[start : start + 128])
+        self.assertEqual(stats.count, 1000)
+        self.assertAlmostEqual(stats.mean, statistics.fmean(values), places=9)
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(values))
+        self.assertAlmostEqual(stats.sample_variance, statistics.variance(values))
+        self.assertEqual(stats.min, min(values))
+        self.assertEqual(stats.max, max(values))
+
+    def test_add_and_merge(self) -> None:
+        left, right = RunningStats(), RunningStats()
+        for value in (1, 2, 3):
+            left.add(value)
+        right.update([4, 5])
+        merged = left.merge(right)
+        self.assertEqual(merged.mean, 3.0)
+        self.assertEqual(merged.variance, 2.0)
+        self.assertIs(merged.merge(RunningStats()), merged)
+
+    def test_serialisation_round_trip(self) -> None:
+        stats = RunningStats()
+        stats.update([1.5, 2.5, 10])
+        data = stats.to_bytes()
+        self.assertEqual(len(data), 43)
+        restored = RunningStats.from_bytes(data)
+        self.assertEqual(restored.count, 3)
+        self.assertEqual(restored.mean, stats.mean)
+        self.assertEqual(restored.variance, stats.variance)
+        with self.assertRaises(ValueError):
+            RunningStats.from_bytes(b"garbage")
+
+    def test_empty(self) -> None:
+        with self.assertRaises(ValueError):
+            RunningStats().mean
+        with self.assertRaises(ValueError):
+            RunningStats().sample_variance
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def rank_error(self, ordered, value, q) -> float:
+        lo = sum(1 for v in ordered if v < value)
+        hi = sum(1 for v in ordered if v <= value)
+        target = q * len(ordered)
+        if lo <= target <= hi:
+            return 0.0
+        return min(abs(lo - target), abs(hi - target)) / len(ordered)
+
+    def test_small_streams_are_exact(self) -> None:
+        sketch = QuantileSketch(seed=1)
+        sketch.update([5, 1, 4, 2, 3])
+        self.assertEqual(sketch.quantiles([0, 0.5, 1]), [1.0, 3.0, 5.0])
+        self.assertTrue(sketch.exact)
+
+    def test_large_stream_within_error_bound(self) -> None:
+        rng = random.Random(3)
+        values = [rng.gauss(0, 1) for _ in range(50_000)]
+        sketch = QuantileSketch(k=200, seed=1)
+        for start in range(0, len(values), 1000):
+            sketch.update(values[start : start + 1000])
+        self.assertLess(sum(map(len, sketch._levels)), 1000)
+        self.assertFalse(sketch.exact)
+        ordered = sorted(values)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            self.assertLess(self.rank_error(ordered, sketch.quantile(q), q), 0.02)
+
+    def test_merge_and_serialisation(self) -> None:
+        rng = random.Random(5)
+        values = [rng.random() for _ in range(20_000)]
+        left, right = QuantileSketch(seed=1), QuantileSketch(seed=2)
+        left.update(values[:12_000])
+        right.update(values[12_000:])
+        restored = QuantileSketch.from_bytes(right.to_bytes())
+        self.assertEqual(
+            restored.quantiles([0.25, 0.75]), right.quantiles([0.25, 0.75])
+        )
+        merged = left.merge(restored)
+        self.assertEqual(merged.count, 20_000)
+        self.assertEqual(merged.max, max(values))
+        self.assertLess(self.rank_error(sorted(values), merged.median, 0.5), 0.02)
+
+    def test_invalid_input(self) -> None:
+        with self.assertRaises(ValueError):
+            QuantileSketch().median
+        with self.assertRaises(ValueError):
+            QuantileSketch(k=2)
+        with self.assertRaises(ValueError):
+            QuantileSketch(k=65536)
+        # The largest k still fits the serialized header.
+        self.assertEqual(
+            QuantileSketch.from_bytes(QuantileSketch(k=65535).to_bytes()).k, 65535
+        )
+        sketch = QuantileSketch()
+        sketch.add(1)
+        with self.assertRaises(ValueError):
+            sketch.quantile(1.5)
+        with self.assertRaises(ValueError):
+            QuantileSketch.from_bytes(b"nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
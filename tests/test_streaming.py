@@ -0,0 +1,58 @@
+"""
+Unit tests for streamed number parsing
+"""
+
+import asyncio
+import unittest
+
+from codespace_learning.api.streaming import (
+    iter_number_chunks,
+    stream_average,
+    stream_sketch,
+)
+
+
+async def body(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def collect(*parts: bytes, chunk_size: int = 8192):
+    async def run():
+        return [c async for c in iter_number_chunks(body(*parts), chunk_size)]
+
+    return asyncio.run(run())
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_formats(self) -> None:
+        self.assertEqual(collect(b"1\n2.5\n-3\n"), [[1.0, 2.5, -3.0]])
+        self.assertEqual(collect(b"[1, 2]\n[3]\n"), [[1.0, 2.0, 3.0]])
+        self.assertEqual(collect(b"1,2,3"), [[1.0, 2.0, 3.0]])
+        self.assertEqual(collect(b"[1e3, 4]"), [[1000.0, 4.0]])
+
+    def test_numbers_split_across_network_chunks(self) -> None:
+        self.assertEqual(collect(b"12", b"3\n4", b"5", b"", b"\n6"), [[123, 45, 6]])
+
+    def test_chunking(self) -> None:
+        self.assertEqual(
+            collect(b"1 2 3 4 5", chunk_size=2), [[1.0, 2.0], [3.0, 4.0], [5.0]]
+        )
+
+    def test_invalid_input(self) -> None:
+        for parts in ((b"1\nabc\n",), (b"nan",), (b"1" * 100,), (b"1" * 70, b"2")):
+            with self.subTest(parts=parts), self.assertRaises(ValueError):
+                collect(*parts)
+
+    def test_accumulators(self) -> None:
+        stats = asyncio.run(stream_average(body(b"1\n2\n", b"3\n4\n5\n")))
+        self.assertEqual((stats.count, stats.mean), (5, 3.0))
+        sketch = asyncio.run(stream_sketch(body(b"[5, 1, 3]")))
+        self.assertEqual(sketch.median, 3.0)
+        with self.assertRaises(ValueError):
+            asyncio.run(stream_average(body(b"\n")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+"""
+Unit tests for write-behind persistence of calculations
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from codespace_learning.database.connection import Base
+from codespace_learning.database.reuse import ResultReuse
+from codespace_learning.database.rollups import RollupRecorder
+from codespace_learning.database.writer import CalculationWriter, IdAllocator
+from codespace_learning.models.calculation import Calculation, CalculationRollup
+
+
+class WriterTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def run_async(self, test) -> None:
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                await test(engine)
+            finally:
+                await engine.dispose()
+
+        asyncio.run(main())
+
+    @staticmethod
+    async def count_rows(engine) -> int:
+        async with engine.connect() as conn:
+            return await conn.scalar(select(func.count()).select_from(Calculation))
+
+
+class TestIdAllocator(WriterTestCase):
+
+    def test_blocks_continue_after_existing_rows(self) -> None:
+        async def test(engine):
+            async with engine.begin() as conn:
+                await conn.execute(
+                    Calculation.__table__.insert(),
+                    [{"id": 7, "operation": "add", "result": 1.0}],
+                )
+            allocator = IdAllocator(engine, Calculation.__table__, block_size=3)
+            self.assertEqual(await allocator.allocate(2), [8, 9])
+            self.assertEqual(await allocator.allocate(2), [10, 11])
+            self.assertEqual(await allocator.allocate(5), [12, 13, 14, 15, 16])
+
+        self.run_async(test)
+
+    def test_ids_of_deleted_rows_are_not_reused(self) -> None:
+        async def test(engine):
+            async with engine.begin() as conn:
+                await conn.execute(
+                    Calculation.__table__.insert(),
+                    [{"id": 7, "operation": "add", "result": 1.0}],
+                )
+                await conn.execute(Calculation.__table__.delete())
+            allocator = IdAllocator(engine, Calculation.__table__, block_size=3)
+            self.assertEqual(await allocator.allocate(1), [8])
+
+        self.run_async(test)
+
+
+class TestCalculationWriter(WriterTestCase):
+
+    def test_commit_durability_waits_for_the_batch(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(engine, enabled=True, flush_interval=0.01)
+            row = await writer.submit(
+                Calculation(operation="add", operand1=2, operand2=3, result=5)
+            )
+            self.assertEqual(row.id, 1)
+            self.assertIsNotNone(row.created_at)
+            self.assertIsInstance(row.result, float)
+            self.assertEqual(await self.count_rows(engine), 1)
+            await writer.close()
+
+        self.run_async(test)
+
+    def test_concurrent_writes_share_batches(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine, enabled=True, flush_size=50, flush_interval=1.0
+            )
+            rows = await asyncio.gather(
+                *(
+                    writer.submit(Calculation(operation="sqrt", operand1=i, result=i))
+                    for i in range(100)
+                )
+            )
+            self.assertEqual(sorted(row.id for row in rows), list(range(1, 101)))
+            self.assertEqual(await self.count_rows(engine), 100)
+            self.assertEqual(writer.stats()["batches"], 2)
+            await writer.close()
+
+        self.run_async(test)
+
+    def test_memory_durability_is_drained_on_close(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine, enabled=True, durability="memory", flush_interval=60
+            )
+            rows = await writer.submit_many(
+                [Calculation(operation="add", result=i) for i in range(10)]
+            )
+            self.assertEqual([row.id for row in rows], list(range(1, 11)))
+            self.assertEqual(await self.count_rows(engine), 0)
+            await writer.close()
+            self.assertEqual(await self.count_rows(engine), 10)
+            self.assertEqual(writer.stats()["pending_rows"], 0)
+
+        self.run_async(test)
+
+    def test_flush(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine, enabled=True, durability="memory", flush_interval=60
+            )
+            await writer.submit(Calculation(operation="add", result=1))
+            await writer.flush()
+            self.assertEqual(await self.count_rows(engine), 1)
+            await writer.close()
+
+        self.run_async(test)
+
+    def test_queue_limit_applies_backpressure(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine,
+                enabled=True,
+                durability="memory",
+                flush_size=5,
+                flush_interval=60,
+                max_pending=5,
+            )
+            for i in range(20):
+                await writer.submit(Calculation(operation="add", result=i))
+                self.assertLessEqual(writer.stats()["pending_rows"], 5)
+            await writer.close()
+            self.assertEqual(await self.count_rows(engine), 20)
+
+        self.run_async(test)
+
+    def test_failed_batch_is_reported(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(engine, enabled=True, flush_interval=0.01)
+            await writer.submit(Calculation(operation="add", result=1))
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+            with self.assertRaises(Exception):
+                await writer.submit(Calculation(operation="add", result=2))
+            self.assertEqual(writer.stats()["failed_rows"], 1)
+            await writer.close()
+
+        self.run_async(test)
+
+    async def stored(self, engine):
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    select(
+                        Calculation.id, Calculation.result_key, Calculation.hit_count
+                    ).order_by(Calculation.id)
+                )
+            ).all()
+            counted = await conn.scalar(select(func.sum(CalculationRollup.count)))
+        return [tuple(row) for row in rows], counted
+
+    def test_repeated_result_key_is_stored_without_it(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine,
+                enabled=True,
+                reuse=ResultReuse("lookup"),
+                rollups=RollupRecorder(engine, mode="sync"),
+            )
+            first, second = await writer.submit_many(
+                [
+                    Calculation(operation="sqrt", result=4.0, result_key="k"),
+                    Calculation(operation="sqrt", result=4.0, result_key="k"),
+                ]
+            )
+            rows, counted = await self.stored(engine)
+            self.assertEqual(rows, [(first.id, "k", 1), (second.id, None, 1)])
+            self.assertEqual(counted, 2)
+
+        self.run_async(test)
+
+    def test_repeated_result_key_is_collapsed_into_a_hit(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(
+                engine,
+                enabled=True,
+                reuse=ResultReuse("collapse"),
+                rollups=RollupRecorder(engine, mode="sync"),
+            )
+            first = await writer.submit(
+                Calculation(operation="sqrt", result=4.0, result_key="k")
+            )
+            await writer.submit(
+                Calculation(operation="sqrt", result=4.0, result_key="k")
+            )
+            rows, counted = await self.stored(engine)
+            self.assertEqual(rows, [(first.id, "k", 2)])
+            self.assertEqual(counted, 2)
+
+        self.run_async(test)
+
+    def test_id_conflicts_fail_the_batch(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(engine, enabled=True)
+            first = await writer.submit(Calculation(operation="add", result=1))
+            async with engine.begin() as conn:
+                await conn.execute(
+                    Calculation.__table__.insert(),
+                    [{"id": first.id + 1, "operation": "add", "result": 2.0}],
+                )
+            with self.assertRaises(Exception):
+                await writer.submit(Calculation(operation="add", result=3))
+            self.assertEqual(writer.stats()["failed_rows"], 1)
+            await writer.close()
+
+        self.run_async(test)
+
+    def test_unstorable_result_is_rejected_before_queueing(self) -> None:
+        async def test(engine):
+            writer = CalculationWriter(engine, enabled=True)
+            with self.assertRaises(ValueError):
+                await writer.submit(Calculation(operation="factorial", result=10**400))
+            self.assertEqual(writer.stats()["pending_rows"], 0)
+
+        self.run_async(test)
+
+    def test_invalid_durability(self) -> None:
+        with self.assertRaises(ValueError):
+            CalculationWriter(None, durability="eventually")
+
+
+if __name__ == "__main__":
+    unittest.main()